@@ -22,6 +22,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "workflow.profiling.QueryProfilingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -30,6 +31,9 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Per-view query counts and duplicate detection (see workflow/profiling.py).
+WORKFLOW_QUERY_PROFILING = os.getenv("WORKFLOW_QUERY_PROFILING", "1" if DEBUG else "0") == "1"
+
 ROOT_URLCONF = "core.urls"
 
 TEMPLATES = [
@@ -49,6 +53,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "core.wsgi.application"
+ASGI_APPLICATION = "core.asgi.application"
 
 DATABASES = {
     "default": {
@@ -61,6 +66,38 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "DJANGO_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("DJANGO_CACHE_LOCATION", ""),
+    }
+}
+
+# Roles are cached per user id and invalidated on UserProfile save/delete.
+# With the default per-process cache, other processes (e.g. the admin
+# service) only see a role change once this TTL expires; point
+# DJANGO_CACHE_BACKEND at a shared cache to make invalidation immediate.
+WORKFLOW_ROLE_CACHE_TIMEOUT = int(os.getenv("WORKFLOW_ROLE_CACHE_TIMEOUT", "60"))
+
+# Definition endpoints send ETags; clients revalidate after this many seconds
+# (0 = on every use, answered with 304 while nothing changed).
+WORKFLOW_DEFINITION_CACHE_MAX_AGE = int(os.getenv("WORKFLOW_DEFINITION_CACHE_MAX_AGE", "0"))
+
+# Record per-rule evaluation counts, failures and cost in single-entity
+# transitions (see workflow/rule_stats.py).
+WORKFLOW_RULE_STATS = os.getenv("WORKFLOW_RULE_STATS", "0") == "1"
+
+# Audit rows are written synchronously by default; "buffered" batches them in
+# a background thread (see workflow/audit.py for the durability trade-off).
+WORKFLOW_AUDIT_SINK = os.getenv("WORKFLOW_AUDIT_SINK", "sync")
+WORKFLOW_AUDIT_BUFFER = {
+    "max_batch": int(os.getenv("WORKFLOW_AUDIT_MAX_BATCH", "500")),
+    "flush_interval": float(os.getenv("WORKFLOW_AUDIT_FLUSH_INTERVAL", "1.0")),
+    "max_queue": int(os.getenv("WORKFLOW_AUDIT_MAX_QUEUE", "50000")),
+}
+
 AUTH_PASSWORD_VALIDATORS = []
 
 LANGUAGE_CODE = "en-us"
@@ -1,13 +1,22 @@
 from django.contrib import admin
 
 from .models import (
+    AnalyticsWatermark,
     AuditLog,
+    DurationRollup,
     Entity,
+    EntityTombstone,
+    Job,
+    JobChunk,
+    ReplayCheckpoint,
     Rule,
+    RuleStats,
     SchemaField,
     SchemaVersion,
     State,
+    StateCounter,
     Transition,
+    TransitionRollup,
     UserProfile,
     Workflow,
 )
@@ -15,10 +24,19 @@ from .models import (
 
 admin.site.register(Workflow)
 admin.site.register(State)
+admin.site.register(StateCounter)
 admin.site.register(Transition)
 admin.site.register(Rule)
+admin.site.register(RuleStats)
 admin.site.register(SchemaVersion)
 admin.site.register(SchemaField)
 admin.site.register(Entity)
 admin.site.register(AuditLog)
 admin.site.register(UserProfile)
+admin.site.register(Job)
+admin.site.register(JobChunk)
+admin.site.register(ReplayCheckpoint)
+admin.site.register(EntityTombstone)
+admin.site.register(AnalyticsWatermark)
+admin.site.register(TransitionRollup)
+admin.site.register(DurationRollup)
@@ -0,0 +1,423 @@
+"""Cycle-time and throughput rollups folded incrementally from the audit log.
+
+Every ``state_change`` row is one transition taken. Its entity entered
+``from_state`` at its previous state event (or at creation), so the row also
+closes a stay of known length in that state. ``update_rollups`` folds rows
+into per-hour and per-day buckets, keyed by the time the row was written:
+
+* ``TransitionRollup``: number of ``from_state -> to_state`` moves.
+* ``DurationRollup`` ``time_in_state``: stays in the state left.
+* ``DurationRollup`` ``lead_time``: creation to arrival in a dead-end state
+  (one without outgoing transitions), keyed by that state.
+
+Durations are kept as count, sum and a log-scale histogram (``BINS_PER_DOUBLING``
+bins per doubling of seconds), which merge by addition, so percentiles over
+any range of buckets are read from the rollups alone, to within half a bin
+(about 9%).
+
+Rows are folded into hour buckets; a day bucket is the sum of its hours.
+Both are recomputed from scratch for the range a run covers, so folding a
+range again gives the same rollups.
+
+Progress is the ``AnalyticsWatermark`` row: rows created before
+``folded_until`` have been folded. Audit ids and ``created_at`` are set when
+a row is recorded, not when it commits (long bulk transactions, the buffered
+sink and its retries), so neither id order nor time order tells whether an
+earlier row is still to come. A run only folds rows older than
+``rollup_lag()``, which is ``ANALYTICS_LAG`` or the audit sink's longest
+write delay if that is longer, and re-aggregates the hours from one lag
+before the watermark, which picks up rows that committed after the last run.
+Each day of the range is recomputed and the watermark moved in one
+transaction, with the watermark row locked so concurrent runs queue up.
+"""
+import math
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Min, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .audit import get_audit_sink
+from .graph import get_workflow_graph
+from .models import (
+    AnalyticsWatermark,
+    AuditLog,
+    DurationRollup,
+    Granularity,
+    State,
+    TransitionRollup,
+)
+from .replay import STATE_EVENTS
+
+WATERMARK_NAME = "rollups"
+ANALYTICS_LAG = timedelta(seconds=getattr(settings, "WORKFLOW_ANALYTICS_LAG", 300))
+ANALYTICS_CHUNK_SIZE = 5000
+BINS_PER_DOUBLING = 4
+PERCENTILES = (50, 90, 95)
+
+GRANULARITIES = {Granularity.HOUR: timedelta(hours=1), Granularity.DAY: timedelta(days=1)}
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def bucket_start(at: datetime, granularity: str) -> datetime:
+    """Start of the UTC hour or day containing ``at``."""
+    step = GRANULARITIES[granularity]
+    return _EPOCH + (at - _EPOCH) // step * step
+
+
+def duration_bin(seconds: float) -> int:
+    # Bin 0 holds stays under a second; bin b covers [2**((b-1)/k), 2**(b/k)).
+    if seconds < 1:
+        return 0
+    return int(math.log2(seconds) * BINS_PER_DOUBLING) + 1
+
+
+def bin_value(index: int) -> float:
+    if index <= 0:
+        return 0.0
+    return 2 ** ((index - 0.5) / BINS_PER_DOUBLING)
+
+
+class _Durations:
+    __slots__ = ("count", "total", "histogram")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.histogram: Counter = Counter()
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.histogram[duration_bin(seconds)] += 1
+
+    def merge(self, count: int, total: float, histogram: dict) -> None:
+        self.count += count
+        self.total += total
+        self.histogram.update({int(index): n for index, n in histogram.items()})
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_seconds": round(self.total / self.count, 3) if self.count else None,
+            **{f"p{p}_seconds": self.percentile(p) for p in PERCENTILES},
+        }
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(self.count * p / 100))
+        seen = 0
+        for index in sorted(self.histogram):
+            seen += self.histogram[index]
+            if seen >= rank:
+                return round(bin_value(index), 3)
+        return None
+
+
+class _Batch:
+    """Rollup increments for one chunk of audit rows."""
+
+    def __init__(self):
+        self.transitions: Dict[tuple, int] = defaultdict(int)
+        self.durations: Dict[tuple, _Durations] = defaultdict(_Durations)
+
+    def add(self, row: tuple, dead_ends: frozenset) -> None:
+        _, workflow_id, created_at, from_state_id, to_state_id, entered_at, entity_created_at = row[:7]
+        hour, bucket = Granularity.HOUR, bucket_start(created_at, Granularity.HOUR)
+        self.transitions[(workflow_id, hour, bucket, from_state_id, to_state_id)] += 1
+        self.durations[(workflow_id, DurationRollup.Kind.TIME_IN_STATE, hour, bucket, from_state_id)].add(
+            max(0.0, (created_at - entered_at).total_seconds())
+        )
+        if to_state_id in dead_ends:
+            self.durations[(workflow_id, DurationRollup.Kind.LEAD_TIME, hour, bucket, to_state_id)].add(
+                max(0.0, (created_at - entity_created_at).total_seconds())
+            )
+
+    def __bool__(self) -> bool:
+        return bool(self.transitions)
+
+    def save(self) -> None:
+        buckets = {key[2] for key in self.transitions}
+        workflows = {key[0] for key in self.transitions}
+
+        existing = {
+            (r.workflow_id, r.granularity, r.bucket_start, r.from_state_id, r.to_state_id): r
+            for r in TransitionRollup.objects.filter(workflow_id__in=workflows, bucket_start__in=buckets)
+        }
+        changed, created = [], []
+        for key, count in self.transitions.items():
+            row = existing.get(key)
+            if row is None:
+                workflow_id, granularity, bucket, from_state_id, to_state_id = key
+                created.append(
+                    TransitionRollup(
+                        workflow_id=workflow_id,
+                        granularity=granularity,
+                        bucket_start=bucket,
+                        from_state_id=from_state_id,
+                        to_state_id=to_state_id,
+                        count=count,
+                    )
+                )
+            else:
+                row.count += count
+                changed.append(row)
+        TransitionRollup.objects.bulk_create(created)
+        TransitionRollup.objects.bulk_update(changed, ["count"])
+
+        existing = {
+            (r.workflow_id, r.kind, r.granularity, r.bucket_start, r.state_id): r
+            for r in DurationRollup.objects.filter(workflow_id__in=workflows, bucket_start__in=buckets)
+        }
+        changed, created = [], []
+        for key, durations in self.durations.items():
+            row = existing.get(key)
+            if row is None:
+                workflow_id, kind, granularity, bucket, state_id = key
+                row = DurationRollup(
+                    workflow_id=workflow_id, kind=kind, granularity=granularity, bucket_start=bucket, state_id=state_id
+                )
+                created.append(row)
+            else:
+                changed.append(row)
+            durations.merge(row.count, row.total_seconds, row.histogram_json)
+            row.count = durations.count
+            row.total_seconds = durations.total
+            row.histogram_json = {str(index): n for index, n in sorted(durations.histogram.items())}
+        DurationRollup.objects.bulk_create(created)
+        DurationRollup.objects.bulk_update(changed, ["count", "total_seconds", "histogram_json"])
+
+
+def _transition_rows(queryset):
+    """``state_change`` rows with the time their entity entered ``from_state``."""
+    previous = (
+        AuditLog.objects.filter(STATE_EVENTS, entity_id=OuterRef("entity_id"))
+        .filter(Q(created_at__lt=OuterRef("created_at")) | Q(created_at=OuterRef("created_at"), id__lt=OuterRef("id")))
+        .order_by("-created_at", "-id")
+        .values("created_at")[:1]
+    )
+    return (
+        queryset.filter(
+            action_type=AuditLog.ActionType.STATE_CHANGE, from_state__isnull=False, to_state__isnull=False
+        )
+        .annotate(entered_at=Coalesce(Subquery(previous), F("entity__created_at")))
+        .order_by("id")
+        .values_list(
+            "id",
+            "entity__workflow_id",
+            "created_at",
+            "from_state_id",
+            "to_state_id",
+            "entered_at",
+            "entity__created_at",
+            "entity__workflow__definition_revision",
+        )
+    )
+
+
+def _fold(rows: Iterable[tuple]) -> Tuple[_Batch, int]:
+    batch = _Batch()
+    dead_ends: Dict[int, frozenset] = {}
+    count = 0
+    for row in rows:
+        workflow_id, revision = row[1], row[7]
+        if workflow_id not in dead_ends:
+            graph = get_workflow_graph(workflow_id, revision)
+            dead_ends[workflow_id] = frozenset(state.id for state in graph.dead_end_states())
+        batch.add(row, dead_ends[workflow_id])
+        count += 1
+    return batch, count
+
+
+def _roll_up_day(day: datetime, workflow_id: Optional[int] = None) -> None:
+    """Recompute the day buckets starting at ``day`` from their hour buckets."""
+    scope = {"workflow_id": workflow_id} if workflow_id is not None else {}
+    hours = {
+        **scope,
+        "granularity": Granularity.HOUR,
+        "bucket_start__gte": day,
+        "bucket_start__lt": day + GRANULARITIES[Granularity.DAY],
+    }
+    TransitionRollup.objects.filter(**scope, granularity=Granularity.DAY, bucket_start=day).delete()
+    DurationRollup.objects.filter(**scope, granularity=Granularity.DAY, bucket_start=day).delete()
+    batch = _Batch()
+    for row in TransitionRollup.objects.filter(**hours):
+        batch.transitions[(row.workflow_id, Granularity.DAY, day, row.from_state_id, row.to_state_id)] += row.count
+    for row in DurationRollup.objects.filter(**hours):
+        batch.durations[(row.workflow_id, row.kind, Granularity.DAY, day, row.state_id)].merge(
+            row.count, row.total_seconds, row.histogram_json
+        )
+    if batch:
+        batch.save()
+
+
+def _refold(since: datetime, until: datetime, chunk_size: int, workflow_id: Optional[int] = None) -> int:
+    """Recompute rollups for rows created in ``[since, until)``, within one day; returns rows folded.
+
+    ``since`` is the start of an hour. The hour containing ``until`` is
+    rebuilt from the rows before ``until`` and completed by a later run.
+    """
+    scope = {"workflow_id": workflow_id} if workflow_id is not None else {}
+    hours = {**scope, "granularity": Granularity.HOUR, "bucket_start__gte": since, "bucket_start__lt": until}
+    TransitionRollup.objects.filter(**hours).delete()
+    DurationRollup.objects.filter(**hours).delete()
+    rows = AuditLog.objects.filter(created_at__gte=since, created_at__lt=until)
+    if workflow_id is not None:
+        rows = rows.filter(entity__workflow_id=workflow_id)
+    batch, count = _fold(_transition_rows(rows).iterator(chunk_size=chunk_size))
+    if batch:
+        batch.save()
+    _roll_up_day(bucket_start(since, Granularity.DAY), workflow_id)
+    return count
+
+
+def _windows(rows, since: datetime, until: datetime):
+    """Ranges within one day, from hour starts, covering ``rows`` created in ``[since, until)``.
+
+    Stretches without rows are skipped.
+    """
+    start = bucket_start(since, Granularity.HOUR)
+    while True:
+        first = rows.filter(created_at__gte=start, created_at__lt=until).aggregate(first=Min("created_at"))["first"]
+        if first is None:
+            return
+        start = bucket_start(first, Granularity.HOUR)
+        end = min(bucket_start(start, Granularity.DAY) + GRANULARITIES[Granularity.DAY], until)
+        yield start, end
+        start = end
+
+
+def _locked_watermark() -> AnalyticsWatermark:
+    AnalyticsWatermark.objects.get_or_create(name=WATERMARK_NAME)
+    return AnalyticsWatermark.objects.select_for_update().get(name=WATERMARK_NAME)
+
+
+def get_watermark() -> Optional[AnalyticsWatermark]:
+    return AnalyticsWatermark.objects.filter(name=WATERMARK_NAME).first()
+
+
+def rollup_lag() -> timedelta:
+    """How old audit rows must be before they are folded."""
+    return max(ANALYTICS_LAG, timedelta(seconds=get_audit_sink().max_delay()))
+
+
+def update_rollups(now: Optional[datetime] = None, chunk_size: int = ANALYTICS_CHUNK_SIZE) -> int:
+    """Fold audit rows created up to ``rollup_lag()`` ago into the rollups; returns state changes folded."""
+    lag = rollup_lag()
+    cutoff = (now or timezone.now()) - lag
+    watermark = get_watermark()
+    since = _EPOCH
+    if watermark is not None and watermark.folded_until is not None:
+        since = watermark.folded_until - lag
+    processed = 0
+    # The closing (cutoff, cutoff) range moves the watermark over a stretch without rows.
+    for start, end in [*_windows(AuditLog.objects.all(), since, cutoff), (cutoff, cutoff)]:
+        with transaction.atomic():
+            watermark = _locked_watermark()
+            if start < end:
+                processed += _refold(start, end, chunk_size)
+            if watermark.folded_until is None or watermark.folded_until < end:
+                watermark.folded_until = end
+                watermark.save(update_fields=["folded_until", "updated_at"])
+    return processed
+
+
+def rebuild_rollups(workflow_id: Optional[int] = None, chunk_size: int = ANALYTICS_CHUNK_SIZE) -> int:
+    """Recompute rollups from the audit log, for one workflow or all.
+
+    A full rebuild resets the watermark and refolds everything. A workflow
+    rebuild refolds that workflow's rows up to the current watermark, so it
+    lines up with later incremental runs.
+    """
+    if workflow_id is None:
+        with transaction.atomic():
+            watermark = _locked_watermark()
+            TransitionRollup.objects.all().delete()
+            DurationRollup.objects.all().delete()
+            watermark.folded_until = None
+            watermark.save(update_fields=["folded_until", "updated_at"])
+        return update_rollups(chunk_size=chunk_size)
+
+    processed = 0
+    with transaction.atomic():
+        watermark = _locked_watermark()
+        TransitionRollup.objects.filter(workflow_id=workflow_id).delete()
+        DurationRollup.objects.filter(workflow_id=workflow_id).delete()
+        if watermark.folded_until is None:
+            return processed
+        rows = AuditLog.objects.filter(entity__workflow_id=workflow_id)
+        for start, end in _windows(rows, _EPOCH, watermark.folded_until):
+            processed += _refold(start, end, chunk_size, workflow_id)
+    return processed
+
+
+def default_granularity(since: datetime, until: datetime) -> str:
+    return Granularity.DAY if until - since > timedelta(days=7) else Granularity.HOUR
+
+
+def workflow_analytics(workflow_id: int, since: datetime, until: datetime, granularity: str) -> dict:
+    """Time in state, lead time and throughput for buckets starting in ``[since, until)``."""
+    since = bucket_start(since, granularity)
+    buckets = {
+        "workflow_id": workflow_id,
+        "granularity": granularity,
+        "bucket_start__gte": since,
+        "bucket_start__lt": until,
+    }
+    names = dict(State.objects.filter(workflow_id=workflow_id).values_list("id", "name"))
+
+    time_in_state: Dict[int, _Durations] = defaultdict(_Durations)
+    lead_time: Dict[int, _Durations] = defaultdict(_Durations)
+    for kind, state_id, count, total, histogram in DurationRollup.objects.filter(**buckets).values_list(
+        "kind", "state_id", "count", "total_seconds", "histogram_json"
+    ):
+        target = lead_time if kind == DurationRollup.Kind.LEAD_TIME else time_in_state
+        target[state_id].merge(count, total, histogram)
+    overall_lead = _Durations()
+    for durations in lead_time.values():
+        overall_lead.merge(durations.count, durations.total, durations.histogram)
+
+    transitions: Dict[Tuple[int, int], int] = defaultdict(int)
+    throughput: Dict[datetime, int] = defaultdict(int)
+    for bucket, from_state_id, to_state_id, count in TransitionRollup.objects.filter(**buckets).values_list(
+        "bucket_start", "from_state_id", "to_state_id", "count"
+    ):
+        transitions[(from_state_id, to_state_id)] += count
+        throughput[bucket] += count
+
+    watermark = get_watermark()
+    return {
+        "workflow": workflow_id,
+        "since": since,
+        "until": until,
+        "granularity": granularity,
+        "time_in_state": _by_state(time_in_state, names),
+        "lead_time": {**overall_lead.summary(), "by_final_state": _by_state(lead_time, names)},
+        "transitions": [
+            {
+                "from_state": from_state_id,
+                "from_state_name": names.get(from_state_id),
+                "to_state": to_state_id,
+                "to_state_name": names.get(to_state_id),
+                "count": count,
+            }
+            for (from_state_id, to_state_id), count in sorted(transitions.items(), key=lambda item: -item[1])
+        ],
+        "throughput": [{"bucket_start": bucket, "count": count} for bucket, count in sorted(throughput.items())],
+        "watermark": {
+            "folded_until": watermark.folded_until if watermark else None,
+            "updated_at": watermark.updated_at if watermark else None,
+        },
+    }
+
+
+def _by_state(durations: Dict[int, _Durations], names: Dict[int, str]) -> List[dict]:
+    return [
+        {"state": state_id, "name": names.get(state_id), **durations[state_id].summary()}
+        for state_id in sorted(durations)
+    ]
@@ -0,0 +1,164 @@
+"""Async read endpoints for ASGI deployments.
+
+Mounted under ``/api/async/`` next to the DRF viewsets they mirror: entity
+list and retrieve, audit log list and an entity's available transitions.
+Payloads, filters, cursor pagination and role checks are the viewsets' own,
+so a client can switch base paths without other changes. Served by an ASGI
+server (``gunicorn core.asgi:application -k uvicorn.workers.UvicornWorker``)
+a worker keeps accepting requests while others wait on the database or on a
+slow client, instead of blocking on each one.
+
+Lookups use Django's async ORM. Filtering and cursor pagination reuse the
+DRF filter backends and paginator, whose validation queries are synchronous,
+so that step runs in one ``sync_to_async`` call per request. Lists also
+accept ``?stream=ndjson``, streamed with ``aiterator``.
+"""
+import abc
+import base64
+import binascii
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import aauthenticate
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
+from rest_framework.authentication import get_authorization_header
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from .availability import ENTITY_ROW_FIELDS, EntityRow, available_transitions
+from .models import Entity
+from .pagination import CreatedAtCursorPagination
+from .permissions import aget_role, role_allows
+from .views import AuditLogViewSet, EntityViewSet
+
+
+async def authenticate(request):
+    """Session user, else HTTP Basic credentials; ``None`` when neither is valid."""
+    user = await request.auser()
+    if user.is_authenticated:
+        return user
+    auth = get_authorization_header(request).split()
+    if len(auth) != 2 or auth[0].lower() != b"basic":
+        return None
+    try:
+        username, _, password = base64.b64decode(auth[1]).decode("utf-8").partition(":")
+    except (binascii.Error, UnicodeDecodeError):
+        return None
+    user = await aauthenticate(request, username=username, password=password)
+    if user is None or not user.is_active:
+        return None
+    return user
+
+
+def _json(data, status=200):
+    return JsonResponse(data, status=status, safe=False, encoder=JSONEncoder)
+
+
+class AsyncReadView(View, abc.ABC):
+    """Authenticate and authorize like ``viewset_class`` for ``action``, then ``respond``."""
+
+    http_method_names = ["get", "options"]
+    viewset_class = None
+    action = None
+
+    async def get(self, request, *args, **kwargs):
+        user = await authenticate(request)
+        if user is None:
+            response = _json({"detail": "Authentication credentials were not provided."}, status=401)
+            response["WWW-Authenticate"] = 'Basic realm="api"'
+            return response
+        request.user = user
+        role = await aget_role(user)
+        if not role_allows(role, self.viewset_class.role_permissions, self.action, request.method):
+            return _json({"detail": "You do not have permission to perform this action."}, status=403)
+        try:
+            return await self.respond(request, *args, **kwargs)
+        except Entity.DoesNotExist:
+            return _json({"detail": "Not found."}, status=404)
+        except APIException as exc:
+            return self.handle_exception(exc, request)
+
+    def handle_exception(self, exc, request):
+        """Render ``exc`` through DRF's exception handler, as the sync viewsets do."""
+        handler = api_settings.EXCEPTION_HANDLER
+        response = handler(exc, {"view": self, "request": request, "args": (), "kwargs": {}})
+        if response is None:
+            raise exc
+        rendered = _json(response.data, status=response.status_code)
+        for name, value in response.items():
+            if name.lower() != "content-type":
+                rendered[name] = value
+        return rendered
+
+    @abc.abstractmethod
+    async def respond(self, request, *args, **kwargs):
+        """Build the response once the request is authorized."""
+
+    def viewset(self, request):
+        drf_request = Request(request)
+        return self.viewset_class(request=drf_request, action=self.action, format_kwarg=None, kwargs={})
+
+
+class AsyncListView(AsyncReadView):
+    action = "list"
+    stream_chunk_size = 2000
+
+    def _filtered(self, viewset):
+        return viewset.filter_queryset(viewset.get_queryset())
+
+    def _page(self, viewset):
+        queryset = self._filtered(viewset)
+        paginator = CreatedAtCursorPagination()
+        page = paginator.paginate_queryset(queryset, viewset.request, view=viewset)
+        return paginator, page
+
+    async def respond(self, request):
+        viewset = self.viewset(request)
+        serializer_class = viewset.get_serializer_class()
+        if request.GET.get("stream") == "ndjson":
+            queryset = await sync_to_async(self._filtered)(viewset)
+            if not queryset.query.order_by:
+                queryset = queryset.order_by(*CreatedAtCursorPagination.ordering)
+
+            async def rows():
+                async for obj in queryset.aiterator(chunk_size=self.stream_chunk_size):
+                    yield json.dumps(serializer_class(obj).data, cls=JSONEncoder) + "\n"
+
+            return StreamingHttpResponse(rows(), content_type="application/x-ndjson")
+
+        paginator, page = await sync_to_async(self._page)(viewset)
+        data = serializer_class(page, many=True).data
+        return _json(paginator.get_paginated_response(data).data)
+
+
+class AsyncEntityListView(AsyncListView):
+    viewset_class = EntityViewSet
+
+
+class AsyncAuditLogListView(AsyncListView):
+    viewset_class = AuditLogViewSet
+
+
+class AsyncEntityDetailView(AsyncReadView):
+    viewset_class = EntityViewSet
+    action = "retrieve"
+
+    async def respond(self, request, pk):
+        viewset = self.viewset(request)
+        entity = await viewset.get_queryset().aget(pk=pk)
+        return _json(viewset.get_serializer_class()(entity).data)
+
+
+class AsyncAvailableTransitionsView(AsyncReadView):
+    viewset_class = EntityViewSet
+    action = "available_transitions"
+
+    async def respond(self, request, pk):
+        row = EntityRow(*await Entity.objects.values_list(*ENTITY_ROW_FIELDS).aget(pk=pk))
+        # Graph and rule programs are cached per definition revision, so this
+        # only reaches the database on a cold cache.
+        report = await sync_to_async(available_transitions)([row])
+        return _json(report[row.id])
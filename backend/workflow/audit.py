@@ -0,0 +1,244 @@
+"""Pluggable audit log writers.
+
+``WORKFLOW_AUDIT_SINK`` selects how audit rows reach the database:
+
+``"sync"`` (default)
+    Rows are inserted immediately, inside the caller's transaction. An audit
+    row commits or rolls back together with the change it describes.
+
+``"buffered"``
+    Rows are queued in process memory once the caller's transaction commits
+    and a background thread writes them with ``bulk_create`` when
+    ``max_batch`` rows are waiting or ``flush_interval`` seconds have passed.
+    This takes the audit insert off the request path, at a cost: rows still
+    queued when the process dies are lost (at most ``max_queue`` rows, usually
+    about ``flush_interval`` seconds' worth). When the queue is full, rows are
+    written synchronously instead of dropped. ``created_at`` is set when the
+    row is recorded, not when it is flushed.
+
+    If the database is unreachable, a failed batch goes back to the head of
+    the queue and is retried. If a batch is rejected because of its contents
+    (e.g. an entity deleted before the flush), it is bisected so the good rows
+    are written. Rows that still fail go to the back of the queue. After
+    ``MAX_ROW_ATTEMPTS`` failures a row is dropped. The drop is logged and
+    counted in ``dead_letter_rows``.
+"""
+import abc
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+from typing import Iterable, List
+
+from django.conf import settings
+from django.db import DatabaseError, InterfaceError, OperationalError, close_old_connections, transaction
+
+from .models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+BULK_BATCH_SIZE = 1000
+MAX_ROW_ATTEMPTS = 3
+
+
+class AuditSink(abc.ABC):
+    name = "base"
+
+    def record(self, entry: AuditLog) -> None:
+        self.record_many([entry])
+
+    @abc.abstractmethod
+    def record_many(self, entries: Iterable[AuditLog]) -> None:
+        """Persist ``entries``, now or once the current transaction commits."""
+
+    def flush(self) -> None:
+        pass
+
+    def max_delay(self) -> float:
+        """Seconds a row can wait between ``created_at`` and its insert, barring outages."""
+        return 0.0
+
+    def metrics(self) -> dict:
+        return {"sink": self.name}
+
+
+class SyncAuditSink(AuditSink):
+    name = "sync"
+
+    def record(self, entry: AuditLog) -> None:
+        entry.save(force_insert=True)
+
+    def record_many(self, entries: Iterable[AuditLog]) -> None:
+        AuditLog.objects.bulk_create(list(entries), batch_size=BULK_BATCH_SIZE)
+
+
+class BufferedAuditSink(AuditSink):
+    name = "buffered"
+
+    def __init__(self, max_batch=500, flush_interval=1.0, max_queue=50000, autostart=True):
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.autostart = autostart
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._atexit_registered = False
+        self._attempts = {}
+        self._flushes = 0
+        self._flushed_rows = 0
+        self._sync_fallbacks = 0
+        self._failed_flushes = 0
+        self._dead_letters = 0
+        self._last_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    def record_many(self, entries: Iterable[AuditLog]) -> None:
+        entries = list(entries)
+        if entries:
+            transaction.on_commit(lambda: self._enqueue(entries))
+
+    def _enqueue(self, entries: List[AuditLog]) -> None:
+        with self._condition:
+            overflow = len(self._queue) + len(entries) > self.max_queue
+            if overflow:
+                self._sync_fallbacks += len(entries)
+            else:
+                self._queue.extend(entries)
+                if len(self._queue) >= self.max_batch:
+                    self._condition.notify()
+        if overflow:
+            SyncAuditSink().record_many(entries)
+            return
+        self._ensure_thread()
+
+    def _ensure_thread(self) -> None:
+        if not self.autostart or (self._thread is not None and self._thread.is_alive()):
+            return
+        with self._condition:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="audit-sink", daemon=True)
+            self._thread.start()
+            if not self._atexit_registered:
+                atexit.register(self.flush)
+                self._atexit_registered = True
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                if len(self._queue) < self.max_batch:
+                    self._condition.wait(self.flush_interval)
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Audit sink flush failed; rows stay queued for retry")
+                time.sleep(self.flush_interval)
+
+    def flush(self) -> None:
+        """Write the rows queued so far, ``max_batch`` rows per insert.
+
+        Rows requeued by this flush wait for the next one.
+        """
+        with self._flush_lock:
+            with self._condition:
+                remaining = len(self._queue)
+            while remaining > 0:
+                with self._condition:
+                    batch = [self._queue.popleft() for _ in range(min(self.max_batch, remaining, len(self._queue)))]
+                if not batch:
+                    return
+                remaining -= len(batch)
+                started = time.perf_counter()
+                try:
+                    written = self._insert(batch)
+                except (OperationalError, InterfaceError):
+                    # The database is unreachable; the rows are not at fault.
+                    self._failed_flushes += 1
+                    with self._condition:
+                        self._queue.extendleft(reversed(batch))
+                    raise
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                self._flushes += 1
+                self._flushed_rows += written
+                self._last_flush_ms = elapsed_ms
+                self._max_flush_ms = max(self._max_flush_ms, elapsed_ms)
+                self._total_flush_ms += elapsed_ms
+
+    def max_delay(self) -> float:
+        # A flush interval per attempt, plus one for the row to be picked up.
+        return self.flush_interval * (MAX_ROW_ATTEMPTS + 1)
+
+    def _insert(self, batch: List[AuditLog]) -> int:
+        """Insert ``batch``, bisecting around rejected rows; returns rows written."""
+        try:
+            with transaction.atomic():
+                AuditLog.objects.bulk_create(batch)
+        except (OperationalError, InterfaceError):
+            raise
+        except DatabaseError:
+            if len(batch) > 1:
+                middle = len(batch) // 2
+                return self._insert(batch[:middle]) + self._insert(batch[middle:])
+            self._failed_flushes += 1
+            self._reject(batch[0])
+            return 0
+        for entry in batch:
+            self._attempts.pop(id(entry), None)
+        return len(batch)
+
+    def _reject(self, entry: AuditLog) -> None:
+        attempts = self._attempts.pop(id(entry), 0) + 1
+        if attempts < MAX_ROW_ATTEMPTS:
+            self._attempts[id(entry)] = attempts
+            with self._condition:
+                self._queue.append(entry)
+            return
+        self._dead_letters += 1
+        logger.error(
+            "Dropping audit row after %s failed inserts: entity=%s action=%s reason=%r",
+            attempts,
+            entry.entity_id,
+            entry.action_type,
+            entry.reason,
+        )
+
+    def metrics(self) -> dict:
+        return {
+            "sink": self.name,
+            "queue_depth": len(self._queue),
+            "flushes": self._flushes,
+            "flushed_rows": self._flushed_rows,
+            "failed_flushes": self._failed_flushes,
+            "dead_letter_rows": self._dead_letters,
+            "sync_fallback_rows": self._sync_fallbacks,
+            "last_flush_ms": round(self._last_flush_ms, 3),
+            "max_flush_ms": round(self._max_flush_ms, 3),
+            "avg_flush_ms": round(self._total_flush_ms / self._flushes, 3) if self._flushes else 0.0,
+        }
+
+
+_sink = None
+_sink_lock = threading.Lock()
+
+
+def build_audit_sink() -> AuditSink:
+    kind = getattr(settings, "WORKFLOW_AUDIT_SINK", "sync")
+    if kind == "buffered":
+        return BufferedAuditSink(**getattr(settings, "WORKFLOW_AUDIT_BUFFER", {}))
+    if kind == "sync":
+        return SyncAuditSink()
+    raise ValueError(f"Unknown WORKFLOW_AUDIT_SINK: {kind}")
+
+
+def get_audit_sink() -> AuditSink:
+    global _sink
+    if _sink is None:
+        with _sink_lock:
+            if _sink is None:
+                _sink = build_audit_sink()
+    return _sink
@@ -0,0 +1,84 @@
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Sequence
+
+from .batch import evaluate_batch
+from .graph import get_workflow_graph
+from .programs import get_transition_programs
+
+
+class EntityRow(NamedTuple):
+    id: int
+    workflow_id: int
+    revision: int
+    current_state_id: int
+    data_json: dict
+
+
+ENTITY_ROW_FIELDS = (
+    "id",
+    "workflow_id",
+    "workflow__definition_revision",
+    "current_state_id",
+    "data_json",
+)
+
+
+def available_transitions(rows: Sequence[EntityRow]) -> Dict[int, List[dict]]:
+    """Outgoing transitions of each entity with their rule outcome.
+
+    Graphs and rule programs for every workflow involved are fetched up
+    front (cached after the first call), then each transition's program runs
+    once with ``evaluate_batch`` over all entities sitting in its source
+    state. Returns ``{entity_id: [transition, ...]}`` in transition order.
+    """
+    graphs = {}
+    for row in rows:
+        if row.workflow_id not in graphs:
+            graphs[row.workflow_id] = get_workflow_graph(row.workflow_id, row.revision)
+
+    # transition id -> rows currently able to take it
+    candidates: Dict[int, List[EntityRow]] = defaultdict(list)
+    revisions: Dict[int, int] = {}
+    for row in rows:
+        for edge in graphs[row.workflow_id].available(row.current_state_id):
+            candidates[edge.id].append(row)
+            revisions[edge.id] = row.revision
+    programs = get_transition_programs(revisions)
+
+    # (entity id, transition id) -> blocking rule payload or None
+    outcomes: Dict[tuple, dict] = {}
+    for transition_id, members in candidates.items():
+        program = programs[transition_id]
+        payloads = [row.data_json or {} for row in members]
+        result = evaluate_batch(program, payloads)
+        for index, row in enumerate(members):
+            position = int(result.blocking[index])
+            if position < 0:
+                outcomes[(row.id, transition_id)] = None
+                continue
+            rule = program[position]
+            outcomes[(row.id, transition_id)] = {
+                "rule": rule.rule_id,
+                "name": rule.name,
+                "reason": result.reason(program, index, payloads[index]),
+            }
+
+    report: Dict[int, List[dict]] = {}
+    for row in rows:
+        graph = graphs[row.workflow_id]
+        transitions = []
+        for edge in graph.available(row.current_state_id):
+            blocked_by = outcomes[(row.id, edge.id)]
+            transitions.append(
+                {
+                    "id": edge.id,
+                    "name": edge.name,
+                    "from_state": edge.from_state_id,
+                    "to_state": edge.to_state_id,
+                    "to_state_name": graph.states[edge.to_state_id].name,
+                    "allowed": blocked_by is None,
+                    "blocked_by": blocked_by,
+                }
+            )
+        report[row.id] = transitions
+    return report
@@ -0,0 +1,154 @@
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from .programs import CompiledRule, RuleProgram
+
+
+class BatchResult(NamedTuple):
+    passed: np.ndarray
+    blocking: np.ndarray
+
+    def reason(self, program: RuleProgram, index: int, payload: dict) -> str:
+        """Return the blocking rule's reason for one payload ("" if it passed)."""
+        position = int(self.blocking[index])
+        if position < 0:
+            return ""
+        return program[position].check(payload)[1]
+
+
+class _Column:
+    """One data_json field over all payloads, factorized into integer codes.
+
+    Rules evaluate against ``uniques`` once and broadcast the per-unique
+    answer back to every row with ``codes``, so the per-row cost is a single
+    NumPy take rather than a Python comparison.
+    """
+
+    def __init__(self, values: List):
+        lookup: Dict = {}
+        uniques: List = []
+        codes = np.empty(len(values), dtype=np.int64)
+        for i, v in enumerate(values):
+            try:
+                code = lookup.get(v)
+            except TypeError:
+                code = None
+                hashable = False
+            else:
+                hashable = True
+            if code is None:
+                code = len(uniques)
+                uniques.append(v)
+                if hashable:
+                    lookup[v] = code
+            codes[i] = code
+        self.codes = codes
+        self.uniques = uniques
+        self._numbers: Optional[tuple] = None
+
+    def map(self, func, dtype=bool) -> np.ndarray:
+        per_unique = np.fromiter((func(v) for v in self.uniques), dtype=dtype, count=len(self.uniques))
+        return per_unique[self.codes]
+
+    def numbers(self):
+        """Return ``(values, missing, not_number)`` arrays, float-coerced once."""
+        if self._numbers is None:
+            n = len(self.uniques)
+            values = np.full(n, np.nan)
+            missing = np.zeros(n, dtype=bool)
+            not_number = np.zeros(n, dtype=bool)
+            for i, v in enumerate(self.uniques):
+                if v is None:
+                    missing[i] = True
+                    continue
+                try:
+                    values[i] = float(v)
+                except (TypeError, ValueError):
+                    not_number[i] = True
+            self._numbers = (values[self.codes], missing[self.codes], not_number[self.codes])
+        return self._numbers
+
+
+_OPERATORS = {
+    "field_gt": np.greater,
+    "field_gte": np.greater_equal,
+    "field_lt": np.less,
+    "field_lte": np.less_equal,
+}
+
+
+def _rule_mask(rule: CompiledRule, payloads: Sequence[dict], column) -> np.ndarray:
+    params = rule.params
+    field = params.get("field")
+    value = params.get("value")
+    condition_type = rule.condition_type
+
+    if field and condition_type == "field_present":
+        return column(field).map(lambda v: v is not None and v != "")
+
+    if field and condition_type == "field_equals":
+        matches = column(field).map(lambda v: v == value)
+        requires = params.get("requires")
+        if not requires:
+            return matches
+        satisfied = column(requires).map(bool)
+        return ~matches | satisfied
+
+    values = params.get("values") or params.get("options")
+    if field and condition_type == "field_in" and isinstance(values, list):
+        try:
+            lookup = frozenset(values)
+        except TypeError:
+            lookup = values
+
+        def member(v):
+            try:
+                return v in lookup
+            except TypeError:
+                return v in values
+
+        return column(field).map(member)
+
+    if field and condition_type in _OPERATORS:
+        try:
+            threshold = float(value)
+        except (TypeError, ValueError):
+            return np.zeros(len(payloads), dtype=bool)
+        numbers, missing, not_number = column(field).numbers()
+        with np.errstate(invalid="ignore"):
+            compared = _OPERATORS[condition_type](numbers, threshold)
+        return compared & ~missing & ~not_number
+
+    # Anything without a vector kernel (including misconfigured rules) falls
+    # back to the compiled scalar check so results always match.
+    return np.fromiter(
+        (rule.check(payload)[0] for payload in payloads), dtype=bool, count=len(payloads)
+    )
+
+
+def evaluate_batch(program: RuleProgram, payloads: Sequence[dict]) -> BatchResult:
+    """Evaluate a compiled rule program against many ``data_json`` payloads.
+
+    Returns per-payload ``passed`` flags and ``blocking``, the index into
+    ``program`` of the first rule that failed (``-1`` when all passed), with
+    the same first-failure semantics as ``run_program``.
+    """
+    n = len(payloads)
+    blocking = np.full(n, -1, dtype=np.int64)
+    undecided = np.ones(n, dtype=bool)
+    columns: Dict[str, _Column] = {}
+
+    def column(field: str) -> _Column:
+        if field not in columns:
+            columns[field] = _Column([payload.get(field) for payload in payloads])
+        return columns[field]
+
+    for position, rule in enumerate(program):
+        if not undecided.any():
+            break
+        failed = undecided & ~_rule_mask(rule, payloads, column)
+        blocking[failed] = position
+        undecided &= ~failed
+
+    return BatchResult(passed=blocking < 0, blocking=blocking)
@@ -0,0 +1,361 @@
+"""In-process latency benchmarks for the workflow API.
+
+Requests go through the full Django/DRF stack with ``APIClient`` (no
+network), so results isolate application and database cost. Each scenario
+reports latency percentiles, queries per request and throughput; the whole
+run is a JSON document meant to be diffed between releases.
+
+``run_concurrency_benchmark`` is the exception: it drives running servers
+over HTTP to compare the WSGI deployment against the ASGI one serving
+``/api/async/`` at the same worker count.
+"""
+import itertools
+import math
+import platform
+import random
+import statistics
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Sequence
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .audit import get_audit_sink
+from .bulk import LOCK_MODES, transition_entities
+from .counters import adjust_state_counts
+from .models import AuditLog, Entity, Transition, Workflow
+from .programs import get_transition_program, run_program
+
+OPTIMISTIC = "optimistic"
+STRESS_MODES = (OPTIMISTIC,) + LOCK_MODES
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an unsorted list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = math.ceil(pct / 100 * len(ordered))
+    return ordered[min(max(rank, 1), len(ordered)) - 1]
+
+
+def summarize(latencies_ms: List[float], queries: List[int], statuses: Dict[int, int], elapsed: float) -> dict:
+    return {
+        "requests": len(latencies_ms),
+        "latency_ms": {
+            "p50": round(percentile(latencies_ms, 50), 3),
+            "p95": round(percentile(latencies_ms, 95), 3),
+            "p99": round(percentile(latencies_ms, 99), 3),
+            "mean": round(statistics.fmean(latencies_ms), 3) if latencies_ms else 0.0,
+            "max": round(max(latencies_ms), 3) if latencies_ms else 0.0,
+        },
+        "queries_per_request": {
+            "mean": round(statistics.fmean(queries), 2) if queries else 0.0,
+            "max": max(queries) if queries else 0,
+        },
+        "throughput_rps": round(len(latencies_ms) / elapsed, 2) if elapsed else 0.0,
+        "status_codes": {str(code): count for code, count in sorted(statuses.items())},
+    }
+
+
+def measure(request: Callable[[int], object], iterations: int, warmup: int = 3) -> dict:
+    """Call ``request(i)`` ``iterations`` times and summarize the responses."""
+    for i in range(warmup):
+        request(-1 - i)
+    latencies, queries, statuses = [], [], {}
+    started = time.perf_counter()
+    for i in range(iterations):
+        with CaptureQueriesContext(connection) as captured:
+            begin = time.perf_counter()
+            response = request(i)
+            latencies.append((time.perf_counter() - begin) * 1000)
+        queries.append(len(captured))
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    return summarize(latencies, queries, statuses, time.perf_counter() - started)
+
+
+def run_benchmark(user, workflow: Workflow, iterations: int = 200, page_size: int = 100) -> dict:
+    """Benchmark list, retrieve, create and transition endpoints against ``workflow``."""
+    client = APIClient()
+    client.force_authenticate(user)
+
+    entity_ids = list(
+        Entity.objects.filter(workflow=workflow).order_by("-id").values_list("id", flat=True)[:iterations]
+    )
+    if not entity_ids:
+        raise ValueError(f"Workflow {workflow.id} has no entities to benchmark.")
+    transition = (
+        Transition.objects.filter(workflow=workflow, from_state__is_initial=True)
+        .order_by("order_index", "id")
+        .first()
+    )
+    template = Entity.objects.filter(id=entity_ids[0]).values("schema_version_id", "data_json").get()
+    initial_state_id = workflow.states.filter(is_initial=True).values_list("id", flat=True).first()
+
+    entity_list = reverse("entity-list")
+    audit_list = reverse("auditlog-list")
+    scenarios = {
+        "entity_list": lambda i: client.get(entity_list, {"workflow": workflow.id, "page_size": page_size}),
+        "entity_retrieve": lambda i: client.get(
+            reverse("entity-detail", kwargs={"pk": entity_ids[i % len(entity_ids)]})
+        ),
+        "audit_log_list": lambda i: client.get(audit_list, {"page_size": page_size}),
+        "entity_create": lambda i: client.post(
+            entity_list,
+            {
+                "workflow": workflow.id,
+                "current_state": initial_state_id,
+                "schema_version": template["schema_version_id"],
+                "data_json": template["data_json"],
+            },
+            format="json",
+        ),
+    }
+
+    results = {name: measure(request, iterations) for name, request in scenarios.items()}
+
+    if transition is not None:
+        # Fresh entities created above sit in the initial state; move each once.
+        movable = list(
+            Entity.objects.filter(workflow=workflow, current_state_id=transition.from_state_id)
+            .order_by("-id")
+            .values_list("id", flat=True)[: iterations + 3]
+        )
+
+        def transition_request(i):
+            url = reverse("entity-transition", kwargs={"pk": movable[i % len(movable)]})
+            return client.post(url, {"transition": transition.id}, format="json")
+
+        results["entity_transition"] = measure(
+            transition_request, min(iterations, max(len(movable) - 3, 0))
+        )
+
+    return {
+        "generated_at": timezone.now().isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "database": connection.vendor,
+        },
+        "workflow": workflow.id,
+        "volumes": {
+            "entities": Entity.objects.filter(workflow=workflow).count(),
+            "states": workflow.states.count(),
+            "transitions": workflow.transitions.count(),
+        },
+        "iterations": iterations,
+        "scenarios": results,
+    }
+
+
+def prepare_stress_entities(transition: Transition, count: int) -> List[int]:
+    """Create ``count`` entities in the transition's source state that pass its rules."""
+    program = get_transition_program(transition.id, transition.workflow.definition_revision)
+    samples = Entity.objects.filter(
+        workflow_id=transition.workflow_id, current_state_id=transition.from_state_id
+    ).values("schema_version_id", "data_json")[:500]
+    template = next(
+        (row for row in samples if run_program(program, row["data_json"] or {}) is None), None
+    )
+    if template is None:
+        raise ValueError(f"No entity in state {transition.from_state_id} passes transition {transition.id}.")
+    with transaction.atomic():
+        created = Entity.objects.bulk_create(
+            [
+                Entity(
+                    workflow_id=transition.workflow_id,
+                    current_state_id=transition.from_state_id,
+                    schema_version_id=template["schema_version_id"],
+                    data_json=template["data_json"],
+                )
+                for _ in range(count)
+            ],
+            batch_size=1000,
+        )
+        adjust_state_counts(transition.workflow_id, {transition.from_state_id: count})
+    return [entity.id for entity in created]
+
+
+def run_transition_stress(
+    user,
+    transition: Transition,
+    entity_ids: List[int],
+    mode: str = OPTIMISTIC,
+    workers: int = 8,
+    chunk_size: int = 100,
+) -> dict:
+    """Race ``workers`` threads to move the same entities through one transition.
+
+    In ``optimistic`` mode every worker POSTs the transition endpoint for
+    every entity (in its own random order); in the lock modes every worker
+    runs ``transition_entities`` over all ids with that ``lock``. Each entity
+    must end up moved exactly once, which the report checks against entity
+    rows and ``state_change`` audit rows. Needs a database that allows
+    concurrent connections (Postgres).
+    """
+    if mode not in STRESS_MODES:
+        raise ValueError(f"Unknown stress mode: {mode}")
+    start = threading.Barrier(workers)
+    outcomes: Counter = Counter()
+    errors: List[str] = []
+    guard = threading.Lock()
+
+    def work(index: int) -> None:
+        ids = list(entity_ids)
+        random.Random(index).shuffle(ids)
+        local: Counter = Counter()
+        try:
+            start.wait()
+            if mode == OPTIMISTIC:
+                client = APIClient()
+                client.force_authenticate(user)
+                for entity_id in ids:
+                    url = reverse("entity-transition", kwargs={"pk": entity_id})
+                    response = client.post(url, {"transition": transition.id}, format="json")
+                    local[f"http_{response.status_code}"] += 1
+            else:
+                report = transition_entities(
+                    transition, entity_ids=ids, actor=user, chunk_size=chunk_size, lock=mode
+                )
+                local.update(report["counts"])
+        except Exception as exc:
+            with guard:
+                errors.append(repr(exc))
+        finally:
+            connection.close()
+        with guard:
+            outcomes.update(local)
+
+    threads = [threading.Thread(target=work, args=(i,), name=f"stress-{i}") for i in range(workers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    get_audit_sink().flush()
+
+    moved = Entity.objects.filter(id__in=entity_ids, current_state_id=transition.to_state_id).count()
+    audited = list(
+        AuditLog.objects.filter(
+            entity_id__in=entity_ids,
+            action_type=AuditLog.ActionType.STATE_CHANGE,
+            from_state_id=transition.from_state_id,
+            to_state_id=transition.to_state_id,
+        )
+        .values("entity_id")
+        .annotate(rows=Count("id"))
+        .values_list("rows", flat=True)
+    )
+    double_moves = sum(1 for rows in audited if rows > 1)
+    return {
+        "mode": mode,
+        "workers": workers,
+        "entities": len(entity_ids),
+        "elapsed_s": round(elapsed, 3),
+        "transitions_per_s": round(moved / elapsed, 2) if elapsed else 0.0,
+        "attempts": sum(outcomes.values()),
+        "outcomes": dict(sorted(outcomes.items())),
+        "moved": moved,
+        "audited": len(audited),
+        "double_moves": double_moves,
+        "errors": errors,
+        "consistent": not errors
+        and moved == len(entity_ids)
+        and len(audited) == len(entity_ids)
+        and double_moves == 0,
+    }
+
+
+# scenario -> (WSGI path, ASGI path); "{entity}" is filled in per run.
+CONCURRENCY_SCENARIOS = {
+    "entity_list": ("/api/entities/", "/api/async/entities/"),
+    "entity_retrieve": ("/api/entities/{entity}/", "/api/async/entities/{entity}/"),
+    "audit_log_list": ("/api/audit-logs/", "/api/async/audit-logs/"),
+    "available_transitions": (
+        "/api/entities/{entity}/available-transitions/",
+        "/api/async/entities/{entity}/available-transitions/",
+    ),
+}
+
+
+def run_http_load(url: str, concurrency: int, requests: int, headers: Optional[dict] = None, timeout: float = 30.0) -> dict:
+    """GET ``url`` ``requests`` times from ``concurrency`` client threads.
+
+    Connection failures and timeouts are counted under status code 0.
+    """
+    counter = itertools.count()
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    guard = threading.Lock()
+
+    def client() -> None:
+        while next(counter) < requests:
+            begin = time.perf_counter()
+            try:
+                with urlopen(Request(url, headers=headers or {}), timeout=timeout) as response:
+                    response.read()
+                    code = response.status
+            except HTTPError as exc:
+                code = exc.code
+            except (URLError, OSError):
+                code = 0
+            elapsed_ms = (time.perf_counter() - begin) * 1000
+            with guard:
+                latencies.append(elapsed_ms)
+                statuses[code] += 1
+
+    threads = [threading.Thread(target=client, name=f"load-{i}") for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, [], statuses, time.perf_counter() - started)
+
+
+def run_concurrency_benchmark(
+    wsgi_url: Optional[str],
+    asgi_url: Optional[str],
+    entity_id: int,
+    workflow_id: int,
+    levels: Sequence[int] = (1, 16, 64),
+    requests: int = 500,
+    page_size: int = 100,
+    headers: Optional[dict] = None,
+) -> dict:
+    """Load each scenario on both deployments at every concurrency level.
+
+    Start both servers with the same worker count (e.g. ``WEB_CONCURRENCY``)
+    so the report compares the serving model rather than process counts.
+    """
+    targets = {name: url for name, url in (("wsgi", wsgi_url), ("asgi", asgi_url)) if url}
+    query = f"?workflow={workflow_id}&page_size={page_size}"
+    results: Dict[str, dict] = {}
+    for target, base_url in targets.items():
+        results[target] = {}
+        for scenario, paths in CONCURRENCY_SCENARIOS.items():
+            path = paths[target == "asgi"].format(entity=entity_id)
+            if scenario in ("entity_list", "audit_log_list"):
+                path += query if scenario == "entity_list" else f"?page_size={page_size}"
+            results[target][scenario] = {
+                str(level): run_http_load(base_url.rstrip("/") + path, level, requests, headers)
+                for level in levels
+            }
+    return {
+        "generated_at": timezone.now().isoformat(),
+        "environment": {"python": platform.python_version()},
+        "workflow": workflow_id,
+        "entity": entity_id,
+        "requests_per_level": requests,
+        "levels": list(levels),
+        "targets": targets,
+        "results": results,
+    }
@@ -0,0 +1,241 @@
+from typing import Iterable, List, Optional
+
+from django.db import OperationalError, transaction
+from django.db.models import BigIntegerField, Case, F, Value, When
+from django.utils import timezone
+
+from .audit import get_audit_sink
+from .batch import evaluate_batch
+from .counters import move_state_count
+from .eligibility import eligibility_masks
+from .graph import get_workflow_graph
+from .models import AuditLog, Entity, Transition
+from .programs import get_transition_program
+
+BULK_CHUNK_SIZE = 1000
+
+MOVED = "moved"
+BLOCKED = "blocked"
+INVALID_STATE = "invalid_state"
+NOT_FOUND = "not_found"
+CONFLICT = "conflict"
+LOCKED = "locked"
+
+# Row locking used when a chunk is written:
+# "wait" blocks on rows other transactions hold, "skip_locked" leaves them
+# for a later run and "nowait" gives up on the whole chunk instead of waiting.
+LOCK_WAIT = "wait"
+LOCK_SKIP_LOCKED = "skip_locked"
+LOCK_NOWAIT = "nowait"
+LOCK_MODES = (LOCK_WAIT, LOCK_SKIP_LOCKED, LOCK_NOWAIT)
+
+
+def _chunks(queryset, chunk_size: int, entity_ids=None):
+    """Yield ``(id, current_state_id, data_json, version)`` rows in id-keyset chunks."""
+    fields = ("id", "current_state_id", "data_json", "version")
+    if entity_ids is not None:
+        for start in range(0, len(entity_ids), chunk_size):
+            chunk = entity_ids[start : start + chunk_size]
+            yield list(queryset.filter(id__in=chunk).order_by("id").values_list(*fields))
+        return
+
+    last_id = 0
+    while True:
+        rows = list(
+            queryset.filter(id__gt=last_id)
+            .order_by("id")
+            .values_list(*fields)[:chunk_size]
+        )
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def _lock_and_move(transition: Transition, entity_ids, versions, data, lock_options):
+    """Lock candidate rows and move those unchanged since evaluation.
+
+    Moved rows get eligibility bits for the target state, computed from
+    ``data`` (id -> ``data_json``), which the version guard keeps current.
+    Returns ``(moved_ids, {id: current_state_id})`` for the rows that were
+    locked.
+    """
+    locked = (
+        Entity.objects.select_for_update(**lock_options)
+        .filter(id__in=entity_ids)
+        .order_by("id")
+        .values_list("id", "current_state_id", "version")
+    )
+    states = {}
+    moved = set()
+    for entity_id, state_id, version in locked:
+        states[entity_id] = state_id
+        # The state guard prevents double transitions; the version guard
+        # rejects rows whose data changed after the rules were evaluated.
+        if state_id == transition.from_state_id and version == versions[entity_id]:
+            moved.add(entity_id)
+    if moved:
+        revision = transition.workflow.definition_revision
+        graph = get_workflow_graph(transition.workflow_id, revision)
+        ids = sorted(moved)
+        by_mask = {}
+        for entity_id, mask in zip(
+            ids, eligibility_masks(graph, revision, transition.to_state_id, [data[i] for i in ids])
+        ):
+            by_mask.setdefault(mask, []).append(entity_id)
+        Entity.objects.filter(id__in=moved).update(
+            current_state_id=transition.to_state_id,
+            version=F("version") + 1,
+            updated_at=timezone.now(),
+            eligible_transitions=Case(
+                *(When(id__in=mask_ids, then=Value(mask)) for mask, mask_ids in by_mask.items()),
+                output_field=BigIntegerField(),
+            ),
+            eligibility_revision=revision,
+        )
+        move_state_count(
+            transition.workflow_id, transition.from_state_id, transition.to_state_id, len(moved)
+        )
+    return moved, states
+
+
+def transition_entities(
+    transition: Transition,
+    entities=None,
+    entity_ids: Optional[Iterable[int]] = None,
+    actor=None,
+    chunk_size: int = BULK_CHUNK_SIZE,
+    lock: str = LOCK_WAIT,
+) -> dict:
+    """Move many entities through one transition.
+
+    ``entities`` is an ``Entity`` queryset (already filtered by the caller);
+    ``entity_ids`` is an explicit id list. Rules are evaluated a chunk at a
+    time with ``evaluate_batch``, and each chunk is written with one
+    conditional ``UPDATE`` plus one ``bulk_create`` of audit rows. Chunks are
+    committed independently so a failure late in a large batch does not roll
+    back work already reported.
+
+    Rows are locked before writing and only moved if their ``version`` still
+    matches the one the rules were evaluated against; rows changed in
+    between are reported as ``conflict``. ``lock`` selects the locking mode
+    (see ``LOCK_MODES``); rows skipped or refused by ``skip_locked`` and
+    ``nowait`` are reported as ``locked`` so a worker can retry them, and
+    rows deleted before they could be locked as ``not_found``.
+    """
+    if lock not in LOCK_MODES:
+        raise ValueError(f"Unknown lock mode: {lock}")
+    lock_options = {"skip_locked": lock == LOCK_SKIP_LOCKED, "nowait": lock == LOCK_NOWAIT}
+    program = get_transition_program(transition.id, transition.workflow.definition_revision)
+    queryset = Entity.objects.filter(workflow_id=transition.workflow_id)
+    if entities is not None:
+        queryset = entities.filter(workflow_id=transition.workflow_id)
+
+    requested = None
+    if entity_ids is not None:
+        requested = sorted(set(entity_ids))
+
+    counts = {MOVED: 0, BLOCKED: 0, INVALID_STATE: 0, NOT_FOUND: 0, CONFLICT: 0, LOCKED: 0}
+    results: List[dict] = []
+    seen = set()
+    actor_id = actor.pk if actor is not None and actor.is_authenticated else None
+    to_reason = f"Transitioned via {transition.name}"
+
+    for rows in _chunks(queryset, chunk_size, requested):
+        moved_ids = []
+        audit_rows = []
+        candidates = []
+        versions = {}
+        payloads = {}
+        for entity_id, state_id, data, version in rows:
+            seen.add(entity_id)
+            if state_id != transition.from_state_id:
+                counts[INVALID_STATE] += 1
+                results.append({"id": entity_id, "outcome": INVALID_STATE})
+                continue
+            candidates.append((entity_id, data or {}))
+            versions[entity_id] = version
+            payloads[entity_id] = data or {}
+
+        evaluated = evaluate_batch(program, [data for _, data in candidates])
+        for index, (entity_id, data) in enumerate(candidates):
+            if evaluated.passed[index]:
+                moved_ids.append(entity_id)
+                continue
+            rule = program[evaluated.blocking[index]]
+            reason = evaluated.reason(program, index, data) or "Rule blocked transition"
+            counts[BLOCKED] += 1
+            results.append(
+                {"id": entity_id, "outcome": BLOCKED, "rule": rule.rule_id, "reason": reason}
+            )
+            audit_rows.append(
+                AuditLog(
+                    entity_id=entity_id,
+                    actor_id=actor_id,
+                    action_type=AuditLog.ActionType.RULE_BLOCK,
+                    from_state_id=transition.from_state_id,
+                    to_state_id=transition.to_state_id,
+                    rule_id=rule.rule_id,
+                    reason=reason,
+                )
+            )
+
+        try:
+            with transaction.atomic():
+                if moved_ids:
+                    moved, states = _lock_and_move(
+                        transition, moved_ids, versions, payloads, lock_options
+                    )
+                else:
+                    moved, states = set(), {}
+                chunk_audit = list(audit_rows)
+                for entity_id in moved_ids:
+                    if entity_id in moved:
+                        chunk_audit.append(
+                            AuditLog(
+                                entity_id=entity_id,
+                                actor_id=actor_id,
+                                action_type=AuditLog.ActionType.STATE_CHANGE,
+                                from_state_id=transition.from_state_id,
+                                to_state_id=transition.to_state_id,
+                                reason=to_reason,
+                            )
+                        )
+                get_audit_sink().record_many(chunk_audit)
+        except OperationalError:
+            if lock != LOCK_NOWAIT:
+                raise
+            # NOWAIT hit a locked row; nothing in this chunk was written.
+            with transaction.atomic():
+                get_audit_sink().record_many(audit_rows)
+            moved, states = set(), {entity_id: None for entity_id in moved_ids}
+
+        # Rows the lock query did not return were deleted meanwhile or, with
+        # SKIP LOCKED, are held by another transaction; a plain read tells
+        # them apart without waiting on the lock.
+        missing = [entity_id for entity_id in moved_ids if entity_id not in states]
+        held = set()
+        if missing and lock == LOCK_SKIP_LOCKED:
+            held = set(Entity.objects.filter(id__in=missing).values_list("id", flat=True))
+        for entity_id in moved_ids:
+            if entity_id in moved:
+                outcome = MOVED
+            elif entity_id not in states:
+                outcome = LOCKED if entity_id in held else NOT_FOUND
+            elif states[entity_id] is None:
+                outcome = LOCKED
+            elif states[entity_id] != transition.from_state_id:
+                outcome = INVALID_STATE
+            else:
+                outcome = CONFLICT
+            counts[outcome] += 1
+            results.append({"id": entity_id, "outcome": outcome})
+
+    if requested is not None:
+        for entity_id in requested:
+            if entity_id in seen:
+                continue
+            counts[NOT_FOUND] += 1
+            results.append({"id": entity_id, "outcome": NOT_FOUND})
+
+    return {"transition": transition.id, "counts": counts, "results": results}
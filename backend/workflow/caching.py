@@ -0,0 +1,93 @@
+"""Conditional GET for workflow definition endpoints.
+
+Every definition change bumps ``Workflow.definition_revision`` (see
+``signals.bump_definition_revision``), and edits to a workflow's own fields
+move its ``updated_at``. ``DefinitionETagMixin`` derives a strong ETag from
+those columns with one query, before the view touches the objects: a detail
+is keyed by its workflow's revision, a list by a fingerprint of all
+workflows (lists may span workflows, and an object can move between them).
+When ``If-None-Match`` matches, the view answers ``304 Not Modified``
+without loading or serializing anything.
+"""
+import hashlib
+from typing import Optional
+
+from django.conf import settings
+from django.db.models import Count, Max, Sum
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import Workflow
+
+# Seconds a client may reuse a definition response without revalidating.
+DEFINITION_CACHE_MAX_AGE = getattr(settings, "WORKFLOW_DEFINITION_CACHE_MAX_AGE", 0)
+
+
+class DefinitionETagMixin:
+    # Lookup path from the viewset's model to its Workflow ("" for Workflow).
+    workflow_path = "workflow"
+    etag_actions = ("list", "retrieve")
+
+    def _workflow_field(self, name: str) -> str:
+        return f"{self.workflow_path}__{name}" if self.workflow_path else name
+
+    def definition_fingerprint(self) -> Optional[tuple]:
+        lookup = self.lookup_url_kwarg or self.lookup_field
+        if lookup in self.kwargs:
+            try:
+                return (
+                    self.get_queryset()
+                    .model.objects.filter(**{self.lookup_field: self.kwargs[lookup]})
+                    .values_list(self._workflow_field("definition_revision"), self._workflow_field("updated_at"))
+                    .first()
+                )
+            except (TypeError, ValueError):
+                return None
+        totals = Workflow.objects.aggregate(
+            count=Count("id"),
+            last_id=Max("id"),
+            revisions=Sum("definition_revision"),
+            updated=Max("updated_at"),
+        )
+        return tuple(totals.values())
+
+    def definition_etag(self, request) -> Optional[str]:
+        fingerprint = self.definition_fingerprint()
+        if fingerprint is None:
+            return None
+        key = "|".join(
+            [
+                type(self).__name__,
+                self.action,
+                request.get_full_path(),
+                request.accepted_media_type or "",
+                repr(fingerprint),
+            ]
+        )
+        return quote_etag(hashlib.sha1(key.encode()).hexdigest())
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.etag = None
+        if request.method not in ("GET", "HEAD") or self.action not in self.etag_actions:
+            return
+        self.etag = self.definition_etag(request)
+        if self.etag is None:
+            return
+        etags = parse_etags(request.headers.get("If-None-Match", ""))
+        if self.etag in etags or "*" in etags:
+            # Swap the bound action handler so the response is answered here.
+            setattr(self, request.method.lower(), self.not_modified)
+
+    def not_modified(self, request, *args, **kwargs):
+        return Response(status=status.HTTP_304_NOT_MODIFIED)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, "etag", None) and response.status_code in (200, 304):
+            response["ETag"] = self.etag
+            patch_cache_control(response, private=True, max_age=DEFINITION_CACHE_MAX_AGE, must_revalidate=True)
+            patch_vary_headers(response, ["Accept", "Authorization", "Cookie"])
+        return response
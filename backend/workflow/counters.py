@@ -0,0 +1,71 @@
+from typing import Dict, Iterable, Optional
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import Entity, State, StateCounter
+
+
+def adjust_state_counts(workflow_id: int, deltas: Dict[int, int]) -> None:
+    """Apply ``{state_id: delta}`` to the counters of one workflow.
+
+    Rows are updated in state id order so concurrent writers always take the
+    counter row locks in the same order.
+    """
+    for state_id in sorted(deltas):
+        delta = deltas[state_id]
+        if not delta:
+            continue
+        updated = StateCounter.objects.filter(state_id=state_id).update(count=F("count") + delta)
+        if not updated:
+            StateCounter.objects.get_or_create(
+                state_id=state_id, defaults={"workflow_id": workflow_id}
+            )
+            StateCounter.objects.filter(state_id=state_id).update(count=F("count") + delta)
+
+
+def move_state_count(workflow_id: int, from_state_id: int, to_state_id: int, amount: int = 1) -> None:
+    if from_state_id == to_state_id or not amount:
+        return
+    adjust_state_counts(workflow_id, {from_state_id: -amount, to_state_id: amount})
+
+
+def rebuild_state_counters(workflow_ids: Optional[Iterable[int]] = None) -> int:
+    """Recompute counters from ``Entity`` rows; returns the number of states written.
+
+    Counter rows are locked before entities are counted, so transitions that
+    commit while the rebuild runs wait and then apply their delta on top of
+    the rebuilt value instead of being lost.
+    """
+    states = State.objects.all()
+    if workflow_ids is not None:
+        states = states.filter(workflow_id__in=list(workflow_ids))
+
+    with transaction.atomic():
+        state_rows = list(states.values_list("id", "workflow_id"))
+        existing = set(
+            StateCounter.objects.filter(state_id__in=[state_id for state_id, _ in state_rows])
+            .values_list("state_id", flat=True)
+        )
+        StateCounter.objects.bulk_create(
+            [
+                StateCounter(state_id=state_id, workflow_id=workflow_id)
+                for state_id, workflow_id in state_rows
+                if state_id not in existing
+            ]
+        )
+        counters = list(
+            StateCounter.objects.select_for_update()
+            .filter(state_id__in=[state_id for state_id, _ in state_rows])
+            .order_by("state_id")
+        )
+        totals = dict(
+            Entity.objects.filter(current_state_id__in=[c.state_id for c in counters])
+            .values("current_state_id")
+            .annotate(total=Count("id"))
+            .values_list("current_state_id", "total")
+        )
+        for counter in counters:
+            counter.count = totals.get(counter.state_id, 0)
+        StateCounter.objects.bulk_update(counters, ["count"], batch_size=1000)
+    return len(counters)
@@ -0,0 +1,83 @@
+"""Expression indexes backing the ``data__`` entity filters.
+
+Each data field with ``indexed`` set on any ``SchemaField`` gets a
+btree index on ``(data_json -> '<field>')`` named
+``workflow_entity_data_<field>_<hash>``. Indexes are built ``CONCURRENTLY``
+so syncing does not block writes; indexes for fields no longer marked are
+left alone unless ``drop_stale`` is set. Postgres only.
+"""
+import hashlib
+import re
+from typing import Dict, List, Tuple
+
+from django.db import connection
+
+from .models import Entity, SchemaField
+
+TABLE = Entity._meta.db_table
+INDEX_PREFIX = f"{TABLE}_data_"
+# Names are embedded in DDL as string literals, so keep them plain.
+FIELD_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def index_name(field_name: str) -> str:
+    digest = hashlib.md5(field_name.encode()).hexdigest()[:8]
+    return f"{INDEX_PREFIX}{field_name.lower()[:30]}_{digest}"
+
+
+def desired_indexes() -> Tuple[Dict[str, str], List[str]]:
+    """Return ``({index_name: field_name}, skipped_field_names)``."""
+    names = (
+        SchemaField.objects.filter(indexed=True)
+        .values_list("name", flat=True)
+        .distinct()
+    )
+    desired, skipped = {}, []
+    for name in sorted(set(names)):
+        if FIELD_NAME.match(name):
+            desired[index_name(name)] = name
+        else:
+            skipped.append(name)
+    return desired, skipped
+
+
+def existing_indexes() -> List[str]:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexname FROM pg_indexes WHERE tablename = %s AND indexname LIKE %s",
+            [TABLE, INDEX_PREFIX.replace("_", r"\_") + "%"],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def create_sql(name: str, field_name: str) -> str:
+    qn = connection.ops.quote_name
+    return (
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {qn(name)} "
+        f"ON {qn(TABLE)} (({qn('data_json')} -> '{field_name}'))"
+    )
+
+
+def drop_sql(name: str) -> str:
+    return f"DROP INDEX CONCURRENTLY IF EXISTS {connection.ops.quote_name(name)}"
+
+
+def plan(drop_stale: bool = False) -> Tuple[List[str], List[str]]:
+    """Return the DDL statements a sync would run and the skipped field names."""
+    desired, skipped = desired_indexes()
+    existing = set(existing_indexes())
+    statements = [create_sql(name, field) for name, field in desired.items() if name not in existing]
+    if drop_stale:
+        statements += [drop_sql(name) for name in sorted(existing - set(desired))]
+    return statements, skipped
+
+
+def sync_data_indexes(drop_stale: bool = False, dry_run: bool = False) -> Tuple[List[str], List[str]]:
+    statements, skipped = plan(drop_stale=drop_stale)
+    if not dry_run:
+        # CONCURRENTLY cannot run inside a transaction block; management
+        # commands run in autocommit mode.
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+    return statements, skipped
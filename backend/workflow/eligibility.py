@@ -0,0 +1,276 @@
+"""Cached "eligible transitions" bitsets on entities.
+
+``Entity.eligible_transitions`` has bit ``i`` set when the ``i``-th outgoing
+transition of the entity's current state (``WorkflowGraph.available`` order)
+passes all its active rules. ``eligibility_revision`` is the workflow
+``definition_revision`` the bits were computed at; NULL or an older revision
+means unknown, and state changes reset both to NULL.
+
+A data update only re-evaluates rules that read a changed field, found
+through ``RuleDependencyIndex`` (field name -> rules naming it as
+``params["field"]`` or ``params["requires"]``), built per workflow and cached
+like rule programs. A transition that was eligible stays eligible unless one
+of those rules now fails; one that was blocked runs its whole program again,
+since which rule blocked it is not stored.
+
+Entity creates, updates and transitions (single and bulk) write bits for
+the state the entity ends up in. Rows left stale by a definition change or
+a save outside the API are recomputed in batches by ``refresh_eligibility``;
+a definition change queues it as a job over the workflow's entities (see
+jobs.py). The ``?eligible_transition=<id>`` filter never writes: it uses the
+bit of rows at the current revision and evaluates the transition's program
+in memory for the stale rows of its source state.
+"""
+from collections import defaultdict
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import BigIntegerField, Case, F, PositiveIntegerField, Q, Value, When
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from .batch import evaluate_batch
+from .graph import WorkflowGraph, get_workflow_graph
+from .models import Entity, Transition
+from .programs import RuleProgram, get_transition_programs, run_program
+
+# Bits 0..62 of a signed 64-bit column; later transitions of a state are not tracked.
+MAX_TRACKED_TRANSITIONS = 63
+ELIGIBILITY_CHUNK_SIZE = 2000
+ELIGIBILITY_REFRESH_ON_CHANGE = getattr(settings, "WORKFLOW_ELIGIBILITY_REFRESH_ON_CHANGE", True)
+DEPENDENCY_PARAMS = ("field", "requires")
+
+
+def rule_fields(params: dict) -> FrozenSet[str]:
+    return frozenset(
+        params[key] for key in DEPENDENCY_PARAMS if isinstance(params.get(key), str) and params[key]
+    )
+
+
+def changed_fields(old: dict, new: dict) -> set:
+    old, new = old or {}, new or {}
+    return {key for key in old.keys() | new.keys() if old.get(key) != new.get(key)}
+
+
+class RuleDependencyIndex:
+    """Which rules of a workflow read each ``data_json`` field.
+
+    ``rules[field][transition_id]`` holds positions in that transition's
+    compiled program.
+    """
+
+    def __init__(self, programs: Dict[int, RuleProgram]):
+        rules: Dict[str, Dict[int, List[int]]] = defaultdict(lambda: defaultdict(list))
+        for transition_id, program in programs.items():
+            for position, compiled in enumerate(program):
+                for field in rule_fields(compiled.params):
+                    rules[field][transition_id].append(position)
+        self.rules = {
+            field: {transition_id: tuple(positions) for transition_id, positions in by_transition.items()}
+            for field, by_transition in rules.items()
+        }
+
+    def affected(self, transition_id: int, fields: Iterable[str]) -> Tuple[int, ...]:
+        """Program positions of ``transition_id`` reading any of ``fields``."""
+        positions = set()
+        for field in fields:
+            positions.update(self.rules.get(field, {}).get(transition_id, ()))
+        return tuple(sorted(positions))
+
+    def fields(self) -> List[str]:
+        return sorted(self.rules)
+
+
+# workflow id -> (workflow definition revision, index); same scheme as rule programs.
+_indexes: Dict[int, Tuple[int, RuleDependencyIndex]] = {}
+
+
+def get_dependency_index(workflow_id: int, revision: int) -> RuleDependencyIndex:
+    cached = _indexes.get(workflow_id)
+    if cached is not None and cached[0] == revision:
+        return cached[1]
+    graph = get_workflow_graph(workflow_id, revision)
+    index = RuleDependencyIndex(get_transition_programs({edge_id: revision for edge_id in graph.edges}))
+    _indexes[workflow_id] = (revision, index)
+    return index
+
+
+def clear_dependency_indexes() -> None:
+    _indexes.clear()
+
+
+def _tracked(graph: WorkflowGraph, state_id: int):
+    return graph.available(state_id)[:MAX_TRACKED_TRANSITIONS]
+
+
+def eligibility_mask(graph: WorkflowGraph, revision: int, state_id: int, data: dict) -> int:
+    edges = _tracked(graph, state_id)
+    programs = get_transition_programs({edge.id: revision for edge in edges})
+    mask = 0
+    for bit, edge in enumerate(edges):
+        if run_program(programs[edge.id], data or {}) is None:
+            mask |= 1 << bit
+    return mask
+
+
+def eligibility_masks(graph: WorkflowGraph, revision: int, state_id: int, rows: List[dict]) -> List[int]:
+    """``eligibility_mask`` for many ``data_json`` values in one state, batched per transition."""
+    edges = _tracked(graph, state_id)
+    programs = get_transition_programs({edge.id: revision for edge in edges})
+    masks = [0] * len(rows)
+    for bit, edge in enumerate(edges):
+        result = evaluate_batch(programs[edge.id], [data or {} for data in rows])
+        for index, passed in enumerate(result.passed.tolist()):
+            if passed:
+                masks[index] |= 1 << bit
+    return masks
+
+
+def eligibility_fields(workflow, state_id: int, data: dict, previous: Optional[Entity] = None) -> dict:
+    """``eligible_transitions``/``eligibility_revision`` values for an entity write.
+
+    ``previous`` is the entity as stored before an update. When it is in the
+    same workflow and state with bits at the current revision, only rules
+    reading the fields that changed are evaluated.
+    """
+    revision = workflow.definition_revision
+    graph = get_workflow_graph(workflow.id, revision)
+    if (
+        previous is None
+        or previous.workflow_id != workflow.id
+        or previous.current_state_id != state_id
+        or previous.eligibility_revision != revision
+        or previous.eligible_transitions is None
+    ):
+        return {
+            "eligible_transitions": eligibility_mask(graph, revision, state_id, data),
+            "eligibility_revision": revision,
+        }
+
+    mask = previous.eligible_transitions
+    changed = changed_fields(previous.data_json, data)
+    if changed:
+        index = get_dependency_index(workflow.id, revision)
+        affected = {}
+        for bit, edge in enumerate(_tracked(graph, state_id)):
+            positions = index.affected(edge.id, changed)
+            if positions:
+                affected[bit] = (edge.id, positions)
+        programs = get_transition_programs({edge_id: revision for edge_id, _ in affected.values()})
+        for bit, (edge_id, positions) in affected.items():
+            program = programs[edge_id]
+            if mask & (1 << bit):
+                program = tuple(program[position] for position in positions)
+            if run_program(program, data or {}) is None:
+                mask |= 1 << bit
+            else:
+                mask &= ~(1 << bit)
+    return {"eligible_transitions": mask, "eligibility_revision": revision}
+
+
+def stale_eligibility(queryset):
+    return queryset.filter(
+        Q(eligibility_revision__isnull=True) | ~Q(eligibility_revision=F("workflow__definition_revision"))
+    )
+
+
+def refresh_eligibility(queryset, chunk_size: int = ELIGIBILITY_CHUNK_SIZE) -> int:
+    """Recompute bits for the stale rows of ``queryset``; returns rows evaluated.
+
+    Each chunk runs every program once over its rows with ``evaluate_batch``
+    and is written in one UPDATE that skips rows whose ``version`` moved
+    since they were read.
+    """
+    rows = stale_eligibility(queryset).values_list(
+        "id", "version", "workflow_id", "workflow__definition_revision", "current_state_id", "data_json"
+    )
+    written = last_id = 0
+    while True:
+        chunk = list(rows.filter(id__gt=last_id).order_by("id")[:chunk_size])
+        if not chunk:
+            return written
+        last_id = chunk[-1][0]
+        written += len(chunk)
+
+        # (transition id, revision) -> [(row index, bit)]
+        members: Dict[Tuple[int, int], List[Tuple[int, int]]] = defaultdict(list)
+        for index, (_, _, workflow_id, revision, state_id, _) in enumerate(chunk):
+            graph = get_workflow_graph(workflow_id, revision)
+            for bit, edge in enumerate(_tracked(graph, state_id)):
+                members[(edge.id, revision)].append((index, bit))
+        programs = get_transition_programs({edge_id: revision for edge_id, revision in members})
+        masks = [0] * len(chunk)
+        for (edge_id, _), targets in members.items():
+            result = evaluate_batch(programs[edge_id], [chunk[index][5] or {} for index, _ in targets])
+            for (index, bit), passed in zip(targets, result.passed.tolist()):
+                if passed:
+                    masks[index] |= 1 << bit
+
+        guards = [(Q(pk=row[0], version=row[1]), masks[index], row[3]) for index, row in enumerate(chunk)]
+        Entity.objects.filter(id__in=[row[0] for row in chunk]).update(
+            eligible_transitions=Case(
+                *(When(guard, then=Value(mask)) for guard, mask, _ in guards),
+                default=F("eligible_transitions"),
+                output_field=BigIntegerField(),
+            ),
+            eligibility_revision=Case(
+                *(When(guard, then=Value(revision)) for guard, _, revision in guards),
+                default=F("eligibility_revision"),
+                output_field=PositiveIntegerField(),
+            ),
+        )
+
+
+def passing_stale_ids(
+    queryset, transition_id: int, revision: int, chunk_size: int = ELIGIBILITY_CHUNK_SIZE
+) -> List[int]:
+    """Ids of rows without bits at ``revision`` that pass ``transition_id`` now.
+
+    Evaluated in memory only; the stored bits are left to ``refresh_eligibility``.
+    """
+    program = get_transition_programs({transition_id: revision})[transition_id]
+    rows = queryset.filter(
+        Q(eligibility_revision__isnull=True) | ~Q(eligibility_revision=revision)
+    ).values_list("id", "data_json")
+    passing: List[int] = []
+    last_id = 0
+    while True:
+        chunk = list(rows.filter(id__gt=last_id).order_by("id")[:chunk_size])
+        if not chunk:
+            return passing
+        last_id = chunk[-1][0]
+        result = evaluate_batch(program, [data or {} for _, data in chunk])
+        passing.extend(entity_id for (entity_id, _), passed in zip(chunk, result.passed.tolist()) if passed)
+
+
+class EligibleTransitionFilterBackend(BaseFilterBackend):
+    """``?eligible_transition=<id>``: entities that can take a transition now."""
+
+    param = "eligible_transition"
+
+    def filter_queryset(self, request, queryset, view):
+        raw = request.query_params.get(self.param)
+        if raw is None:
+            return queryset
+        transition = (
+            Transition.objects.filter(pk=raw if raw.isdigit() else None)
+            .values_list("id", "workflow_id", "workflow__definition_revision", "from_state_id")
+            .first()
+        )
+        if transition is None:
+            raise ValidationError({self.param: "Unknown transition."})
+        transition_id, workflow_id, revision, from_state_id = transition
+        edges = _tracked(get_workflow_graph(workflow_id, revision), from_state_id)
+        bit = next((bit for bit, edge in enumerate(edges) if edge.id == transition_id), None)
+        if bit is None:
+            raise ValidationError(
+                {self.param: f"Only the first {MAX_TRACKED_TRANSITIONS} transitions of a state are tracked."}
+            )
+
+        in_state = Entity.objects.filter(workflow_id=workflow_id, current_state_id=from_state_id)
+        stale = passing_stale_ids(in_state, transition_id, revision)
+        return (
+            queryset.filter(workflow_id=workflow_id, current_state_id=from_state_id)
+            .alias(eligible_bit=F("eligible_transitions").bitand(1 << bit))
+            .filter(Q(eligibility_revision=revision, eligible_bit__gt=0) | Q(id__in=stale))
+        )
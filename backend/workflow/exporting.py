@@ -0,0 +1,371 @@
+"""Streaming exports of entities and audit logs to CSV, NDJSON or Parquet.
+
+Rows are read in ``(created_at, id)`` order through a server-side cursor
+(``.iterator``), so an export holds one batch in memory however many rows it
+covers. Entity exports scoped to a workflow flatten ``data_json`` into one
+``data.<field>`` column per ``SchemaField``, typed from the field definition;
+keys without a schema field are left out.
+
+Every row carries ``created_at`` and ``id``, and that pair is the export
+cursor: passing the last row's values as ``after`` continues right after it.
+``run_export`` also records the cursor in a checkpoint file after each
+batch, so an interrupted export resumes where it stopped.
+
+Parquet needs the optional ``pyarrow`` package.
+"""
+import csv
+import json
+import os
+from datetime import datetime
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import AuditLog, Entity, SchemaField
+
+EXPORT_BATCH_SIZE = 5000
+DATASETS = ("entities", "audit_logs")
+FORMATS = ("csv", "ndjson", "parquet")
+
+
+class ExportError(Exception):
+    pass
+
+
+class Column(NamedTuple):
+    name: str
+    # One of "int", "text", "number", "boolean", "date", "datetime", "json".
+    type: str
+    source: str
+
+
+_ENTITY_COLUMNS = [
+    Column("id", "int", "id"),
+    Column("workflow_id", "int", "workflow_id"),
+    Column("current_state_id", "int", "current_state_id"),
+    Column("current_state", "text", "current_state__name"),
+    Column("schema_version_id", "int", "schema_version_id"),
+    Column("parent_id", "int", "parent_id"),
+    Column("created_by_id", "int", "created_by_id"),
+    Column("version", "int", "version"),
+    Column("created_at", "datetime", "created_at"),
+    Column("updated_at", "datetime", "updated_at"),
+]
+
+_AUDIT_COLUMNS = [
+    Column("id", "int", "id"),
+    Column("entity_id", "int", "entity_id"),
+    Column("actor_id", "int", "actor_id"),
+    Column("action_type", "text", "action_type"),
+    Column("from_state_id", "int", "from_state_id"),
+    Column("to_state_id", "int", "to_state_id"),
+    Column("rule_id", "int", "rule_id"),
+    Column("reason", "text", "reason"),
+    Column("metadata_json", "json", "metadata_json"),
+    Column("created_at", "datetime", "created_at"),
+]
+
+_FIELD_TYPES = {
+    SchemaField.FieldType.TEXT: "text",
+    SchemaField.FieldType.ENUM: "text",
+    SchemaField.FieldType.NUMBER: "number",
+    SchemaField.FieldType.BOOLEAN: "boolean",
+    SchemaField.FieldType.DATE: "date",
+    SchemaField.FieldType.DATETIME: "datetime",
+}
+
+
+class ExportSpec(NamedTuple):
+    dataset: str
+    workflow_id: Optional[int] = None
+    created_gte: Optional[datetime] = None
+    created_lt: Optional[datetime] = None
+    after: Optional[Tuple[datetime, int]] = None
+
+
+def parse_cursor(value: str) -> Tuple[datetime, int]:
+    """Parse ``"<created_at ISO>,<id>"``; a timestamp without offset is in the current time zone."""
+    created_at, _, row_id = (value or "").rpartition(",")
+    try:
+        parsed = parse_datetime(created_at)
+        row_id = int(row_id)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ExportError("Cursor must be '<created_at ISO 8601>,<id>'.")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed, row_id
+
+
+def format_cursor(created_at: datetime, row_id: int) -> str:
+    return f"{created_at.isoformat()},{row_id}"
+
+
+def data_columns(workflow_id: int) -> List[Column]:
+    """One column per schema field of the workflow; later versions win on type."""
+    types: Dict[str, str] = {}
+    fields = SchemaField.objects.filter(schema_version__workflow_id=workflow_id).order_by(
+        "schema_version__version", "id"
+    )
+    for name, field_type in fields.values_list("name", "field_type"):
+        types[name] = _FIELD_TYPES.get(field_type, "text")
+    return [Column(f"data.{name}", field_type, name) for name, field_type in types.items()]
+
+
+def _check_dataset(dataset: str) -> None:
+    if dataset not in DATASETS:
+        raise ExportError(f"Unknown dataset {dataset!r}; use one of {list(DATASETS)}.")
+
+
+def export_columns(spec: ExportSpec) -> List[Column]:
+    _check_dataset(spec.dataset)
+    if spec.dataset == "audit_logs":
+        return list(_AUDIT_COLUMNS)
+    if spec.workflow_id is None:
+        return _ENTITY_COLUMNS + [Column("data_json", "json", "data_json")]
+    return _ENTITY_COLUMNS + data_columns(spec.workflow_id)
+
+
+def _queryset(spec: ExportSpec):
+    _check_dataset(spec.dataset)
+    if spec.dataset == "entities":
+        queryset = Entity.objects.all()
+        if spec.workflow_id is not None:
+            queryset = queryset.filter(workflow_id=spec.workflow_id)
+    else:
+        queryset = AuditLog.objects.all()
+        if spec.workflow_id is not None:
+            queryset = queryset.filter(entity__workflow_id=spec.workflow_id)
+    if spec.created_gte is not None:
+        queryset = queryset.filter(created_at__gte=spec.created_gte)
+    if spec.created_lt is not None:
+        queryset = queryset.filter(created_at__lt=spec.created_lt)
+    if spec.after is not None:
+        created_at, row_id = spec.after
+        queryset = queryset.filter(
+            Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=row_id)
+        )
+    return queryset.order_by("created_at", "id")
+
+
+def _typed(value, column_type: str):
+    if value is None:
+        return None
+    if column_type == "number":
+        if isinstance(value, bool):
+            return None
+        if isinstance(value, (int, float)):
+            return value
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+    if column_type == "boolean":
+        return value if isinstance(value, bool) else None
+    if column_type in ("date", "datetime") and not isinstance(value, str):
+        return None
+    if column_type == "text" and not isinstance(value, str):
+        return json.dumps(value, cls=JSONEncoder)
+    return value
+
+
+def iter_rows(spec: ExportSpec, columns: List[Column], chunk_size: int = 2000) -> Iterator[dict]:
+    """Yield export rows as ``{column name: value}`` in cursor order."""
+    base = [column for column in columns if not column.name.startswith("data.")]
+    flattened = [column for column in columns if column.name.startswith("data.")]
+    sources = [column.source for column in base]
+    if flattened:
+        sources.append("data_json")
+    for values in _queryset(spec).values_list(*sources).iterator(chunk_size=chunk_size):
+        row = dict(zip((column.name for column in base), values))
+        if flattened:
+            data = values[-1] or {}
+            for column in flattened:
+                row[column.name] = _typed(data.get(column.source), column.type)
+        yield row
+
+
+def _text(value, column_type: str):
+    if value is None:
+        return ""
+    if column_type == "json":
+        return json.dumps(value, cls=JSONEncoder)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+class CsvWriter:
+    def __init__(self, stream, columns: List[Column], header: bool = True):
+        self.columns = columns
+        self.writer = csv.writer(stream)
+        if header:
+            self.writer.writerow([column.name for column in columns])
+
+    def write(self, rows: List[dict]) -> None:
+        self.writer.writerows(
+            [[_text(row[column.name], column.type) for column in self.columns] for row in rows]
+        )
+
+    def close(self) -> None:
+        pass
+
+
+class NdjsonWriter:
+    def __init__(self, stream, columns: List[Column], header: bool = True):
+        self.stream = stream
+
+    def write(self, rows: List[dict]) -> None:
+        self.stream.write("".join(json.dumps(row, cls=JSONEncoder) + "\n" for row in rows))
+
+    def close(self) -> None:
+        pass
+
+
+_ARROW_TYPES = {
+    "int": "int64",
+    "text": "string",
+    "json": "string",
+    "number": "float64",
+    "boolean": "bool_",
+    "date": "date32",
+}
+
+
+class ParquetWriter:
+    def __init__(self, path: str, columns: List[Column]):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ExportError("Parquet export needs the pyarrow package.")
+        self.pa = pyarrow
+        self.columns = columns
+        fields = []
+        for column in columns:
+            if column.type == "datetime":
+                arrow_type = pyarrow.timestamp("us", tz="UTC")
+            else:
+                arrow_type = getattr(pyarrow, _ARROW_TYPES[column.type])()
+            fields.append(pyarrow.field(column.name, arrow_type))
+        self.schema = pyarrow.schema(fields)
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+
+    def _convert(self, value, column: Column):
+        if value is None:
+            return None
+        if column.type == "json":
+            return json.dumps(value, cls=JSONEncoder)
+        if column.type == "date" and isinstance(value, str):
+            return parse_date(value)
+        if column.type == "datetime" and isinstance(value, str):
+            try:
+                return parse_datetime(value)
+            except ValueError:
+                return None
+        return value
+
+    def write(self, rows: List[dict]) -> None:
+        arrays = {
+            column.name: [self._convert(row[column.name], column) for row in rows]
+            for column in self.columns
+        }
+        self.writer.write_table(self.pa.Table.from_pydict(arrays, schema=self.schema))
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+def _batches(rows: Iterator[dict], size: int) -> Iterator[List[dict]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def run_export(
+    spec: ExportSpec,
+    fmt: str,
+    path: str,
+    checkpoint: Optional[str] = None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> dict:
+    """Write an export file; with ``checkpoint``, resume and record progress.
+
+    When the checkpoint file holds a cursor, rows after it are appended to
+    ``path`` (CSV/NDJSON) or written to a new ``<path>.<id>.parquet`` part,
+    since Parquet files cannot be appended to.
+    """
+    if fmt not in FORMATS:
+        raise ExportError(f"Unknown format {fmt!r}; use one of {list(FORMATS)}.")
+    resumed = False
+    if checkpoint and os.path.exists(checkpoint):
+        with open(checkpoint) as handle:
+            state = json.load(handle)
+        if state.get("cursor"):
+            spec = spec._replace(after=parse_cursor(state["cursor"]))
+            resumed = True
+
+    columns = export_columns(spec)
+    if fmt == "parquet":
+        if resumed:
+            path = f"{os.path.splitext(path)[0]}.{spec.after[1]}.parquet"
+        stream = None
+        writer = ParquetWriter(path, columns)
+    else:
+        stream = open(path, "a" if resumed else "w", newline="", encoding="utf-8")
+        writer_class = CsvWriter if fmt == "csv" else NdjsonWriter
+        writer = writer_class(stream, columns, header=not resumed)
+
+    written = 0
+    cursor = format_cursor(*spec.after) if spec.after else None
+    try:
+        for batch in _batches(iter_rows(spec, columns), batch_size):
+            writer.write(batch)
+            written += len(batch)
+            cursor = format_cursor(batch[-1]["created_at"], batch[-1]["id"])
+            if checkpoint:
+                if stream is not None:
+                    stream.flush()
+                    os.fsync(stream.fileno())
+                with open(checkpoint, "w") as handle:
+                    json.dump({"cursor": cursor, "path": path}, handle)
+    finally:
+        writer.close()
+        if stream is not None:
+            stream.close()
+    return {"path": path, "rows": written, "resumed": resumed, "cursor": cursor}
+
+
+class _Buffer:
+    def __init__(self):
+        self.parts = []
+
+    def write(self, text):
+        self.parts.append(text)
+
+    def drain(self) -> str:
+        text = "".join(self.parts)
+        self.parts = []
+        return text
+
+
+def stream_export(spec: ExportSpec, fmt: str) -> Iterator[str]:
+    """Yield CSV or NDJSON text for an HTTP streaming response."""
+    if fmt not in ("csv", "ndjson"):
+        raise ExportError("Streaming supports csv and ndjson; use the export_data command for parquet.")
+    columns = export_columns(spec)
+    buffer = _Buffer()
+    writer = (CsvWriter if fmt == "csv" else NdjsonWriter)(buffer, columns, header=spec.after is None)
+    yield buffer.drain()
+    for batch in _batches(iter_rows(spec, columns), 500):
+        writer.write(batch)
+        yield buffer.drain()
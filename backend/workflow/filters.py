@@ -0,0 +1,115 @@
+"""Query API over ``Entity.data_json``.
+
+``DataFieldFilterBackend`` turns ``?data__<field>[__<lookup>]=<value>`` into
+JSON key lookups, e.g. ``?data__priority=High&data__amount__gte=1000``. Only
+fields with ``SchemaField.indexed`` set are filterable. For each of them,
+``manage.py sync_data_indexes`` creates an expression index on
+``(data_json -> '<field>')``. On Postgres every supported lookup compiles
+to that expression compared with a ``jsonb`` literal, or to ``IS NULL`` for
+``isnull``, so these filters stay index-backed. jsonb orders values of
+different types against each other (strings sort below numbers, for
+example). Range lookups therefore also require the declared JSON type, so
+that ``lt`` on a number field does not match strings.
+
+Values are coerced with the field's schema type, so ``1000`` matches the
+number ``1000`` for a number field and the string ``"1000"`` for a text one.
+"""
+from typing import Dict, Optional
+
+from django.db import connections
+from django.db.models import CharField, ExpressionWrapper, F, Func, JSONField, Value
+from django.db.models.fields.json import KeyTransform
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from .models import SchemaField
+from .schema import Invalid, coerce_value
+
+DATA_PREFIX = "data__"
+LOOKUPS = frozenset(["exact", "in", "gt", "gte", "lt", "lte", "isnull"])
+RANGE_LOOKUPS = frozenset(["gt", "gte", "lt", "lte"])
+# What each backend's JSON type function reports for a schema type's values.
+JSON_TYPES = {
+    "postgresql": {"number": ["number"], "boolean": ["boolean"], "string": ["string"]},
+    "sqlite": {"number": ["integer", "real"], "boolean": ["true", "false"], "string": ["text"]},
+}
+
+
+def indexed_field_types(workflow_id: Optional[str] = None) -> Dict[str, set]:
+    """Map indexed data field names to their declared types."""
+    fields = SchemaField.objects.filter(indexed=True)
+    if workflow_id:
+        fields = fields.filter(schema_version__workflow_id=workflow_id)
+    types: Dict[str, set] = {}
+    for name, field_type in fields.values_list("name", "field_type").distinct():
+        types.setdefault(name, set()).add(field_type)
+    return types
+
+
+def _parse(field_type: str, lookup: str, raw: str):
+    if lookup == "isnull":
+        return coerce_value(SchemaField.FieldType.BOOLEAN, raw)
+    if lookup == "in":
+        return [coerce_value(field_type, item) for item in raw.split(",") if item != ""]
+    return coerce_value(field_type, raw)
+
+
+def _json_kind(field_type: str) -> str:
+    if field_type == SchemaField.FieldType.NUMBER:
+        return "number"
+    if field_type == SchemaField.FieldType.BOOLEAN:
+        return "boolean"
+    return "string"
+
+
+def _json_type(name: str, vendor: str) -> Func:
+    if vendor == "postgresql":
+        return Func(KeyTransform(name, "data_json"), function="jsonb_typeof", output_field=CharField())
+    return Func(F("data_json"), Value(f'$."{name}"'), function="JSON_TYPE", output_field=CharField())
+
+
+class DataFieldFilterBackend(BaseFilterBackend):
+    def filter_queryset(self, request, queryset, view):
+        params = [key for key in request.query_params if key.startswith(DATA_PREFIX)]
+        if not params:
+            return queryset
+
+        workflow_id = request.query_params.get("workflow")
+        field_types = indexed_field_types(workflow_id if workflow_id and workflow_id.isdigit() else None)
+        vendor = connections[queryset.db].vendor
+        errors = {}
+        for position, param in enumerate(params):
+            name, _, lookup = param[len(DATA_PREFIX):].partition("__")
+            lookup = lookup or "exact"
+            types = field_types.get(name)
+            if lookup not in LOOKUPS:
+                errors[param] = f"Unsupported lookup. Use one of {sorted(LOOKUPS)}."
+                continue
+            if not types:
+                errors[param] = "Field is not indexed for filtering."
+                continue
+            if len(types) > 1:
+                errors[param] = "Field has conflicting types; filter by workflow."
+                continue
+            field_type = next(iter(types))
+            for raw in request.query_params.getlist(param):
+                try:
+                    value = _parse(field_type, lookup, raw)
+                except Invalid as exc:
+                    errors[param] = str(exc)
+                    break
+                alias = f"_data_{position}"
+                if lookup == "isnull":
+                    # Plain IS NULL on the indexed expression; Django's own
+                    # key isnull compiles to the unindexed ``?`` operator.
+                    key = ExpressionWrapper(KeyTransform(name, "data_json"), output_field=JSONField())
+                    queryset = queryset.alias(**{alias: key}).filter(**{f"{alias}__isnull": value})
+                    continue
+                if lookup in RANGE_LOOKUPS and vendor in JSON_TYPES:
+                    queryset = queryset.alias(**{alias: _json_type(name, vendor)}).filter(
+                        **{f"{alias}__in": JSON_TYPES[vendor][_json_kind(field_type)]}
+                    )
+                queryset = queryset.filter(**{f"data_json__{name}__{lookup}": value})
+        if errors:
+            raise ValidationError(errors)
+        return queryset
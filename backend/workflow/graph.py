@@ -0,0 +1,134 @@
+from collections import deque
+from types import MappingProxyType
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .models import State, Transition
+
+
+class StateNode(NamedTuple):
+    id: int
+    name: str
+    order_index: int
+    is_initial: bool
+
+
+class TransitionEdge(NamedTuple):
+    id: int
+    name: str
+    from_state_id: int
+    to_state_id: int
+    order_index: int
+    rules_order_independent: bool = False
+
+
+class WorkflowGraph:
+    """Immutable adjacency view of one workflow's states and transitions.
+
+    Built from two queries and then answered from memory: transition lookup
+    by id or by ``(from_state, to_state)`` is a dict hit, and reachability and
+    shortest paths are breadth-first searches over the adjacency tuples.
+    """
+
+    def __init__(self, workflow_id: int, states: Iterable[StateNode], edges: Iterable[TransitionEdge]):
+        self.workflow_id = workflow_id
+        states = sorted(states, key=lambda state: (state.order_index, state.id))
+        edges = sorted(edges, key=lambda edge: (edge.order_index, edge.id))
+
+        outgoing: Dict[int, List[TransitionEdge]] = {state.id: [] for state in states}
+        incoming: Dict[int, List[TransitionEdge]] = {state.id: [] for state in states}
+        by_pair: Dict[Tuple[int, int], TransitionEdge] = {}
+        for edge in edges:
+            outgoing[edge.from_state_id].append(edge)
+            incoming[edge.to_state_id].append(edge)
+            # Match the ORM's ``.first()``: lowest id wins for a pair.
+            pair = (edge.from_state_id, edge.to_state_id)
+            if pair not in by_pair or edge.id < by_pair[pair].id:
+                by_pair[pair] = edge
+
+        self.states = MappingProxyType({state.id: state for state in states})
+        self.edges = MappingProxyType({edge.id: edge for edge in edges})
+        self.outgoing = MappingProxyType({key: tuple(value) for key, value in outgoing.items()})
+        self.incoming = MappingProxyType({key: tuple(value) for key, value in incoming.items()})
+        self._by_pair = MappingProxyType(by_pair)
+        self.initial_state_ids = tuple(state.id for state in states if state.is_initial)
+
+    def transition(self, transition_id: int) -> Optional[TransitionEdge]:
+        return self.edges.get(transition_id)
+
+    def find_transition(self, from_state_id: int, to_state_id: int) -> Optional[TransitionEdge]:
+        return self._by_pair.get((from_state_id, to_state_id))
+
+    def available(self, state_id: int) -> Tuple[TransitionEdge, ...]:
+        return self.outgoing.get(state_id, ())
+
+    def reachable_from(self, state_ids: Iterable[int]) -> set:
+        seen = {state_id for state_id in state_ids if state_id in self.states}
+        queue = deque(seen)
+        while queue:
+            for edge in self.outgoing[queue.popleft()]:
+                if edge.to_state_id not in seen:
+                    seen.add(edge.to_state_id)
+                    queue.append(edge.to_state_id)
+        return seen
+
+    def shortest_path(self, from_state_id: int, to_state_id: int) -> Optional[List[TransitionEdge]]:
+        """Fewest transitions leading from one state to another, or ``None``."""
+        if from_state_id not in self.states or to_state_id not in self.states:
+            return None
+        via: Dict[int, Optional[TransitionEdge]] = {from_state_id: None}
+        queue = deque([from_state_id])
+        while queue and to_state_id not in via:
+            for edge in self.outgoing[queue.popleft()]:
+                if edge.to_state_id not in via:
+                    via[edge.to_state_id] = edge
+                    queue.append(edge.to_state_id)
+        if to_state_id not in via:
+            return None
+        path = []
+        state_id = to_state_id
+        while via[state_id] is not None:
+            path.append(via[state_id])
+            state_id = via[state_id].from_state_id
+        path.reverse()
+        return path
+
+    def unreachable_states(self) -> List[StateNode]:
+        """States no initial state can lead to."""
+        reachable = self.reachable_from(self.initial_state_ids)
+        return [state for state in self.states.values() if state.id not in reachable]
+
+    def dead_end_states(self) -> List[StateNode]:
+        """States without outgoing transitions; final states are expected here."""
+        return [state for state in self.states.values() if not self.outgoing[state.id]]
+
+
+def load_workflow_graph(workflow_id: int) -> WorkflowGraph:
+    states = State.objects.filter(workflow_id=workflow_id).values_list(
+        "id", "name", "order_index", "is_initial"
+    )
+    edges = Transition.objects.filter(workflow_id=workflow_id).values_list(
+        "id", "name", "from_state_id", "to_state_id", "order_index", "rules_order_independent"
+    )
+    return WorkflowGraph(
+        workflow_id,
+        [StateNode(*row) for row in states],
+        [TransitionEdge(*row) for row in edges],
+    )
+
+
+# workflow id -> (workflow definition revision, graph); same scheme as rule
+# programs, so state and transition changes show up through the revision.
+_graphs: Dict[int, Tuple[int, WorkflowGraph]] = {}
+
+
+def get_workflow_graph(workflow_id: int, revision: int) -> WorkflowGraph:
+    cached = _graphs.get(workflow_id)
+    if cached is not None and cached[0] == revision:
+        return cached[1]
+    graph = load_workflow_graph(workflow_id)
+    _graphs[workflow_id] = (revision, graph)
+    return graph
+
+
+def clear_graphs() -> None:
+    _graphs.clear()
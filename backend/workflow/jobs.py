@@ -0,0 +1,284 @@
+"""Postgres-backed background jobs.
+
+A ``Job`` is split into ``JobChunk`` rows when it is enqueued. Worker
+processes (``manage.py run_job_worker``) claim one pending chunk at a time
+with ``SELECT ... FOR UPDATE SKIP LOCKED``, so any number of workers share
+the queue without a broker and without blocking each other. A chunk that
+raises is retried with exponential backoff up to ``MAX_ATTEMPTS`` times.
+While a chunk runs, its worker renews the lease (``locked_at``) every third
+of ``LEASE_SECONDS``; a chunk whose lease expires anyway (the worker died)
+is requeued by ``requeue_stale_chunks``, which counts as a failed attempt, so
+a chunk that keeps killing its worker ends up failed. Completion is only
+recorded by the worker that still holds the lease, so a chunk is never
+counted twice. When the last chunk settles, chunk results are merged into
+``Job.result_json``.
+
+Job kinds register a chunk handler with ``@job_handler("kind")``; the handler
+receives the job and one chunk payload and returns a JSON-serializable
+result. Numbers under a result's ``"counts"`` key are summed across chunks.
+"""
+import logging
+import os
+import socket
+import threading
+from collections import Counter
+from datetime import timedelta
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Max, Min
+from django.utils import timezone
+
+from .bulk import transition_entities
+from .eligibility import refresh_eligibility
+from .models import Entity, Job, JobChunk, Transition
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = getattr(settings, "WORKFLOW_JOB_MAX_ATTEMPTS", 3)
+LEASE_SECONDS = getattr(settings, "WORKFLOW_JOB_LEASE_SECONDS", 600)
+RETRY_BASE_SECONDS = 2
+# Entity ids per refresh_eligibility chunk.
+ELIGIBILITY_ID_SPAN = 20000
+
+ChunkHandler = Callable[[Job, dict], dict]
+
+_handlers: Dict[str, ChunkHandler] = {}
+
+
+def job_handler(kind: str):
+    def register(func: ChunkHandler) -> ChunkHandler:
+        _handlers[kind] = func
+        return func
+
+    return register
+
+
+def id_chunks(ids: Iterable[int], size: int) -> Iterator[List[int]]:
+    iterator = iter(ids)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+@transaction.atomic
+def enqueue_job(kind: str, params: dict, chunks: Iterable[dict], user=None) -> Job:
+    """Create a job with one chunk per payload in ``chunks``."""
+    if kind not in _handlers:
+        raise ValueError(f"Unknown job kind: {kind}")
+    job = Job.objects.create(
+        kind=kind,
+        params_json=params,
+        created_by=user if user is not None and user.is_authenticated else None,
+    )
+    rows = [JobChunk(job=job, index=index, payload_json=payload) for index, payload in enumerate(chunks)]
+    JobChunk.objects.bulk_create(rows, batch_size=1000)
+    job.total_chunks = len(rows)
+    if not rows:
+        job.status = Job.Status.SUCCEEDED
+        job.finished_at = timezone.now()
+    job.save(update_fields=["total_chunks", "status", "finished_at"])
+    return job
+
+
+def claim_chunk(worker_id: str) -> Optional[JobChunk]:
+    """Lock and mark the next runnable chunk as running, or return ``None``."""
+    now = timezone.now()
+    with transaction.atomic():
+        chunk = (
+            JobChunk.objects.select_for_update(skip_locked=True, of=("self",))
+            .filter(status=JobChunk.Status.PENDING, run_after__lte=now)
+            .order_by("run_after", "id")
+            .first()
+        )
+        if chunk is None:
+            return None
+        chunk.status = JobChunk.Status.RUNNING
+        chunk.locked_by = worker_id
+        chunk.locked_at = now
+        chunk.attempts += 1
+        chunk.save(update_fields=["status", "locked_by", "locked_at", "attempts"])
+        Job.objects.filter(pk=chunk.job_id, status=Job.Status.PENDING).update(
+            status=Job.Status.RUNNING, started_at=now
+        )
+    return chunk
+
+
+class _LeaseHeartbeat:
+    """Renews a running chunk's ``locked_at`` from a background thread."""
+
+    def __init__(self, chunk: JobChunk, interval: float):
+        self.chunk = chunk
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"lease-{chunk.pk}", daemon=True)
+
+    def _run(self) -> None:
+        try:
+            while not self._stop.wait(self.interval):
+                renewed = JobChunk.objects.filter(
+                    pk=self.chunk.pk, status=JobChunk.Status.RUNNING, locked_by=self.chunk.locked_by
+                ).update(locked_at=timezone.now())
+                if not renewed:
+                    return
+        finally:
+            connection.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def _held(chunk: JobChunk):
+    """The chunk's row, as long as this worker still holds its lease."""
+    return JobChunk.objects.filter(pk=chunk.pk, status=JobChunk.Status.RUNNING, locked_by=chunk.locked_by)
+
+
+def run_chunk(chunk: JobChunk) -> None:
+    """Execute a claimed chunk and record its outcome."""
+    job = Job.objects.select_related("created_by").get(pk=chunk.job_id)
+    try:
+        with _LeaseHeartbeat(chunk, LEASE_SECONDS / 3):
+            result = _handlers[job.kind](job, chunk.payload_json)
+    except Exception as exc:
+        logger.exception("Job %s chunk %s failed (attempt %s)", job.pk, chunk.index, chunk.attempts)
+        _chunk_failed(chunk, f"{type(exc).__name__}: {exc}")
+        return
+    with transaction.atomic():
+        if not _held(chunk).update(status=JobChunk.Status.SUCCEEDED, result_json=result or {}, error=""):
+            logger.warning("Job %s chunk %s lost its lease; result discarded", job.pk, chunk.index)
+            return
+        Job.objects.filter(pk=job.pk).update(done_chunks=F("done_chunks") + 1)
+        _finish_if_settled(job.pk)
+
+
+def _chunk_failed(chunk: JobChunk, error: str) -> bool:
+    """Retry or fail a chunk this worker holds; ``False`` if the lease was lost."""
+    with transaction.atomic():
+        if chunk.attempts < MAX_ATTEMPTS:
+            delay = RETRY_BASE_SECONDS ** chunk.attempts
+            return bool(
+                _held(chunk).update(
+                    status=JobChunk.Status.PENDING,
+                    run_after=timezone.now() + timedelta(seconds=delay),
+                    locked_by="",
+                    locked_at=None,
+                    error=error,
+                )
+            )
+        if not _held(chunk).update(status=JobChunk.Status.FAILED, error=error):
+            return False
+        Job.objects.filter(pk=chunk.job_id).update(failed_chunks=F("failed_chunks") + 1, error=error)
+        _finish_if_settled(chunk.job_id)
+    return True
+
+
+def _finish_if_settled(job_id: int) -> None:
+    job = Job.objects.select_for_update().get(pk=job_id)
+    if job.done_chunks + job.failed_chunks < job.total_chunks:
+        return
+    counts: Counter = Counter()
+    for result in JobChunk.objects.filter(job_id=job_id).values_list("result_json", flat=True):
+        counts.update((result or {}).get("counts", {}))
+    job.result_json = {"counts": dict(counts)}
+    job.status = Job.Status.FAILED if job.failed_chunks else Job.Status.SUCCEEDED
+    job.finished_at = timezone.now()
+    job.save(update_fields=["result_json", "status", "finished_at"])
+
+
+def requeue_stale_chunks(lease_seconds: int = LEASE_SECONDS) -> int:
+    """Retry or fail running chunks whose lease expired; returns how many.
+
+    The expired run used one of the chunk's attempts (counted when it was
+    claimed), so a chunk that kills its worker fails after ``MAX_ATTEMPTS``.
+    """
+    cutoff = timezone.now() - timedelta(seconds=lease_seconds)
+    settled = 0
+    with transaction.atomic():
+        stale = JobChunk.objects.select_for_update(skip_locked=True).filter(
+            status=JobChunk.Status.RUNNING, locked_at__lt=cutoff
+        )
+        for chunk in stale:
+            error = f"Lease of worker {chunk.locked_by} expired"
+            logger.warning("Job %s chunk %s: %s (attempt %s)", chunk.job_id, chunk.index, error, chunk.attempts)
+            settled += _chunk_failed(chunk, error)
+    return settled
+
+
+def work(worker_id: Optional[str] = None, max_chunks: Optional[int] = None) -> int:
+    """Run chunks until the queue is empty (or ``max_chunks``); returns chunks run."""
+    worker_id = worker_id or default_worker_id()
+    processed = 0
+    while max_chunks is None or processed < max_chunks:
+        chunk = claim_chunk(worker_id)
+        if chunk is None:
+            break
+        run_chunk(chunk)
+        processed += 1
+    return processed
+
+
+def progress(job: Job) -> dict:
+    settled = job.done_chunks + job.failed_chunks
+    return {
+        "total_chunks": job.total_chunks,
+        "done_chunks": job.done_chunks,
+        "failed_chunks": job.failed_chunks,
+        "percent": round(100 * settled / job.total_chunks, 1) if job.total_chunks else 100.0,
+    }
+
+
+@job_handler("bulk_transition")
+def bulk_transition_chunk(job: Job, payload: dict) -> dict:
+    transition = Transition.objects.select_related("workflow").get(pk=job.params_json["transition"])
+    report = transition_entities(
+        transition,
+        entity_ids=payload["entities"],
+        actor=job.created_by,
+        lock=job.params_json.get("lock", "wait"),
+    )
+    return {"counts": report["counts"]}
+
+
+def enqueue_eligibility_refresh(workflow_id: int) -> Optional[Job]:
+    """Queue a recompute of a workflow's eligibility bits, in entity id ranges.
+
+    A job for the workflow that no worker has started yet already covers the
+    latest revision, so no second job is queued.
+    """
+    pending = Job.objects.filter(
+        kind="refresh_eligibility", status=Job.Status.PENDING, params_json__workflow=workflow_id
+    )
+    if pending.exists():
+        return None
+    bounds = Entity.objects.filter(workflow_id=workflow_id).aggregate(first=Min("id"), last=Max("id"))
+    if bounds["first"] is None:
+        return None
+    return enqueue_job(
+        "refresh_eligibility",
+        {"workflow": workflow_id},
+        (
+            {"after": after, "through": min(after + ELIGIBILITY_ID_SPAN, bounds["last"])}
+            for after in range(bounds["first"] - 1, bounds["last"], ELIGIBILITY_ID_SPAN)
+        ),
+    )
+
+
+@job_handler("refresh_eligibility")
+def refresh_eligibility_chunk(job: Job, payload: dict) -> dict:
+    entities = Entity.objects.filter(
+        workflow_id=job.params_json["workflow"], id__gt=payload["after"], id__lte=payload["through"]
+    )
+    return {"counts": {"refreshed": refresh_eligibility(entities)}}
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from workflow import analytics
+from workflow.models import Workflow
+
+
+class Command(BaseCommand):
+    help = "Maintain the time-in-state and throughput rollups behind the analytics endpoint"
+
+    def add_arguments(self, parser):
+        subparsers = parser.add_subparsers(dest="operation", required=True)
+
+        update = subparsers.add_parser("update", help="Fold audit rows created since the watermark")
+        update.add_argument("--chunk-size", type=int, default=analytics.ANALYTICS_CHUNK_SIZE)
+
+        rebuild = subparsers.add_parser("rebuild", help="Recompute rollups from the whole audit log")
+        rebuild.add_argument("--workflow", type=int, help="Only rebuild this workflow, up to the watermark")
+        rebuild.add_argument("--chunk-size", type=int, default=analytics.ANALYTICS_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be at least 1.")
+        if options["operation"] == "update":
+            processed = analytics.update_rollups(chunk_size=options["chunk_size"])
+        else:
+            workflow_id = options["workflow"]
+            if workflow_id is not None and not Workflow.objects.filter(pk=workflow_id).exists():
+                raise CommandError(f"Workflow {workflow_id} does not exist.")
+            processed = analytics.rebuild_rollups(workflow_id, chunk_size=options["chunk_size"])
+        watermark = analytics.get_watermark()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Folded {processed} state changes; watermark at {watermark.folded_until if watermark else None}."
+            )
+        )
@@ -0,0 +1,58 @@
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from workflow import partitioning
+
+
+class Command(BaseCommand):
+    help = "Manage monthly audit log partitions and retention"
+
+    def add_arguments(self, parser):
+        subparsers = parser.add_subparsers(dest="operation", required=True)
+
+        convert = subparsers.add_parser("convert", help="Convert the audit log table to monthly partitions (Postgres)")
+        convert.add_argument("--months-ahead", type=int, default=3)
+        convert.add_argument("--keep-legacy", action="store_true", help="Keep the unpartitioned table")
+
+        ensure = subparsers.add_parser("ensure", help="Create upcoming monthly partitions")
+        ensure.add_argument("--months-ahead", type=int, default=3)
+
+        archive = subparsers.add_parser("archive", help="Archive and remove old audit rows")
+        archive.add_argument("--older-than-days", type=int, required=True)
+        archive.add_argument("--output-dir", required=True)
+
+    def handle(self, *args, **options):
+        operation = options["operation"]
+        if operation in ("convert", "ensure") and not partitioning.is_postgres():
+            raise CommandError("Audit log partitioning requires Postgres.")
+
+        if operation == "convert":
+            if partitioning.is_partitioned():
+                raise CommandError("The audit log table is already partitioned.")
+            created = partitioning.convert_to_partitioned(
+                months_ahead=options["months_ahead"], keep_legacy=options["keep_legacy"]
+            )
+            self.stdout.write(self.style.SUCCESS(f"Partitioned audit log into {len(created)} monthly partitions."))
+            return
+
+        if operation == "ensure":
+            if not partitioning.is_partitioned():
+                raise CommandError("The audit log table is not partitioned; run convert first.")
+            created = partitioning.ensure_partitions(months_ahead=options["months_ahead"])
+            self.stdout.write(self.style.SUCCESS(f"Created {len(created)} partitions."))
+            return
+
+        cutoff = timezone.now() - timedelta(days=options["older_than_days"])
+        if partitioning.is_partitioned():
+            # Only whole months strictly before the cutoff can be detached.
+            paths = partitioning.archive_partitions(
+                partitioning.month_start(cutoff.date()), options["output_dir"]
+            )
+        else:
+            cutoff = timezone.make_aware(datetime.combine(cutoff.date(), time.min))
+            paths = partitioning.archive_rows(cutoff, options["output_dir"])
+        for path in paths:
+            self.stdout.write(path)
+        self.stdout.write(self.style.SUCCESS(f"Archived audit log to {len(paths)} files."))
@@ -0,0 +1,56 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from workflow.benchmarking import run_benchmark
+from workflow.models import Workflow
+
+
+class Command(BaseCommand):
+    help = "Benchmark workflow API endpoints in-process and write a JSON report"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+        parser.add_argument("--iterations", type=int, default=200)
+        parser.add_argument("--page-size", type=int, default=100)
+        parser.add_argument("--workflow", type=int, help="Workflow id (default: latest benchmark workflow)")
+        parser.add_argument("--username", default="admin")
+        parser.add_argument("--seed", action="store_true", help="Seed a fresh benchmark workflow first")
+        parser.add_argument("--states", type=int, default=5)
+        parser.add_argument("--rules-per-transition", type=int, default=3)
+        parser.add_argument("--entities", type=int, default=10000)
+        parser.add_argument("--audit-rows", type=int, default=20000)
+
+    def handle(self, *args, **options):
+        if options["seed"]:
+            call_command(
+                "seed_sample_data",
+                workflows=1,
+                states=options["states"],
+                rules_per_transition=options["rules_per_transition"],
+                entities=options["entities"],
+                audit_rows=options["audit_rows"],
+                stdout=self.stderr,
+            )
+
+        workflows = Workflow.objects.filter(name__startswith="Benchmark Workflow")
+        if options["workflow"]:
+            workflows = Workflow.objects.filter(pk=options["workflow"])
+        workflow = workflows.order_by("-id").first()
+        if workflow is None:
+            raise CommandError("No benchmark workflow found; pass --seed or --workflow.")
+
+        user = get_user_model().objects.filter(username=options["username"]).first()
+        if user is None:
+            raise CommandError(f"User {options['username']!r} not found.")
+
+        report = run_benchmark(user, workflow, iterations=options["iterations"], page_size=options["page_size"])
+        payload = json.dumps(report, indent=2, sort_keys=True)
+        if options["output"]:
+            with open(options["output"], "w") as out:
+                out.write(payload + "\n")
+            self.stderr.write(self.style.SUCCESS(f"Wrote benchmark report to {options['output']}"))
+        else:
+            self.stdout.write(payload)
@@ -0,0 +1,59 @@
+import base64
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from workflow.benchmarking import run_concurrency_benchmark
+from workflow.models import Entity, Workflow
+
+
+class Command(BaseCommand):
+    help = "Compare read endpoint concurrency of the WSGI and ASGI deployments over HTTP"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--wsgi-url", help="Base URL of the WSGI server, e.g. http://api:8000")
+        parser.add_argument("--asgi-url", help="Base URL of the ASGI server, e.g. http://api-asgi:8002")
+        parser.add_argument("--concurrency", default="1,16,64", help="Comma-separated client counts")
+        parser.add_argument("--requests", type=int, default=500, help="Requests per scenario and level")
+        parser.add_argument("--page-size", type=int, default=100)
+        parser.add_argument("--workflow", type=int, help="Workflow id (default: latest benchmark workflow)")
+        parser.add_argument("--username", default="admin")
+        parser.add_argument("--password", required=True)
+        parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+
+    def handle(self, *args, **options):
+        if not options["wsgi_url"] and not options["asgi_url"]:
+            raise CommandError("Pass --wsgi-url, --asgi-url or both.")
+        try:
+            levels = [int(level) for level in options["concurrency"].split(",") if level]
+        except ValueError:
+            raise CommandError("--concurrency must be comma-separated integers.")
+
+        workflows = Workflow.objects.filter(name__startswith="Benchmark Workflow")
+        if options["workflow"]:
+            workflows = Workflow.objects.filter(pk=options["workflow"])
+        workflow = workflows.order_by("-id").first()
+        if workflow is None:
+            raise CommandError("No benchmark workflow found; run benchmark_api --seed or pass --workflow.")
+        entity_id = Entity.objects.filter(workflow=workflow).order_by("-id").values_list("id", flat=True).first()
+        if entity_id is None:
+            raise CommandError(f"Workflow {workflow.id} has no entities to benchmark.")
+
+        token = base64.b64encode(f"{options['username']}:{options['password']}".encode()).decode()
+        report = run_concurrency_benchmark(
+            options["wsgi_url"],
+            options["asgi_url"],
+            entity_id,
+            workflow.id,
+            levels=levels,
+            requests=options["requests"],
+            page_size=options["page_size"],
+            headers={"Authorization": f"Basic {token}"},
+        )
+        payload = json.dumps(report, indent=2, sort_keys=True)
+        if options["output"]:
+            with open(options["output"], "w") as out:
+                out.write(payload + "\n")
+            self.stderr.write(self.style.SUCCESS(f"Wrote concurrency report to {options['output']}"))
+        else:
+            self.stdout.write(payload)
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from workflow.exporting import DATASETS, FORMATS, ExportError, ExportSpec, parse_cursor, run_export
+
+
+class Command(BaseCommand):
+    help = "Export entities or audit logs to CSV, NDJSON or Parquet, resumably"
+
+    def add_arguments(self, parser):
+        parser.add_argument("dataset", choices=DATASETS)
+        parser.add_argument("--output", required=True)
+        parser.add_argument("--format", choices=FORMATS, default="csv")
+        parser.add_argument("--workflow", type=int, help="Scope to one workflow (flattens entity data)")
+        parser.add_argument("--since", help="created_at >= this ISO 8601 datetime")
+        parser.add_argument("--until", help="created_at < this ISO 8601 datetime")
+        parser.add_argument("--after", help="Start after this '<created_at>,<id>' cursor")
+        parser.add_argument(
+            "--checkpoint", help="Record progress here and resume from it when it already exists"
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def _datetime(self, value, option):
+        if not value:
+            return None
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise CommandError(f"--{option} must be an ISO 8601 datetime.")
+        return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+    def handle(self, *args, **options):
+        try:
+            spec = ExportSpec(
+                options["dataset"],
+                workflow_id=options["workflow"],
+                created_gte=self._datetime(options["since"], "since"),
+                created_lt=self._datetime(options["until"], "until"),
+                after=parse_cursor(options["after"]) if options["after"] else None,
+            )
+            result = run_export(
+                spec,
+                options["format"],
+                options["output"],
+                checkpoint=options["checkpoint"],
+                batch_size=options["batch_size"],
+            )
+        except ExportError as exc:
+            raise CommandError(str(exc))
+        resumed = " (resumed)" if result["resumed"] else ""
+        self.stdout.write(
+            self.style.SUCCESS(f"Exported {result['rows']} rows to {result['path']}{resumed}; cursor {result['cursor']}")
+        )
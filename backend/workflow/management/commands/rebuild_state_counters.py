@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from workflow.counters import rebuild_state_counters
+
+
+class Command(BaseCommand):
+    help = "Rebuild per-state entity counters from the Entity table"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workflow", type=int, action="append", dest="workflows", help="Workflow id (repeatable)"
+        )
+
+    def handle(self, *args, **options):
+        written = rebuild_state_counters(options["workflows"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} state counters."))
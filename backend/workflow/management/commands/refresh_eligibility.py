@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from workflow.eligibility import ELIGIBILITY_CHUNK_SIZE, refresh_eligibility
+from workflow.models import Entity
+
+
+class Command(BaseCommand):
+    help = "Recompute stale eligible-transition bits, e.g. after rule or transition changes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workflow", type=int, action="append", help="Limit to these workflow ids")
+        parser.add_argument("--chunk-size", type=int, default=ELIGIBILITY_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        entities = Entity.objects.all()
+        if options["workflow"]:
+            entities = entities.filter(workflow_id__in=options["workflow"])
+        refreshed = refresh_eligibility(entities, chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {refreshed} entities"))
@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from workflow.models import Workflow
+from workflow.replay import build_checkpoints
+
+
+class Command(BaseCommand):
+    help = "Write missing audit replay checkpoints so as-of queries replay short windows"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workflow", type=int, action="append", help="Limit to these workflow ids")
+        parser.add_argument("--interval-hours", type=int, default=24)
+
+    def handle(self, *args, **options):
+        if options["interval_hours"] < 1:
+            raise CommandError("--interval-hours must be at least 1.")
+        interval = timedelta(hours=options["interval_hours"])
+        workflows = Workflow.objects.order_by("id")
+        if options["workflow"]:
+            workflows = workflows.filter(pk__in=options["workflow"])
+        total = 0
+        for workflow in workflows:
+            written = build_checkpoints(workflow, interval)
+            total += written
+            if written:
+                self.stdout.write(f"{workflow.name}: {written} checkpoints")
+        self.stdout.write(self.style.SUCCESS(f"Wrote {total} checkpoints"))
@@ -0,0 +1,49 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from workflow import jobs
+
+
+class Command(BaseCommand):
+    help = "Process background job chunks from the database queue"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--worker-id", help="Name recorded on claimed chunks (default: host:pid)")
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds to sleep when idle")
+        parser.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+
+    def handle(self, *args, **options):
+        worker_id = options["worker_id"] or jobs.default_worker_id()
+        stopping = False
+
+        def stop(signum, frame):
+            nonlocal stopping
+            stopping = True
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        self.stderr.write(f"Job worker {worker_id} started")
+        processed = 0
+        last_requeue = 0.0
+        while not stopping:
+            close_old_connections()
+            if time.monotonic() - last_requeue > 60:
+                requeued = jobs.requeue_stale_chunks()
+                if requeued:
+                    self.stderr.write(f"Requeued {requeued} stale chunks")
+                last_requeue = time.monotonic()
+
+            # Finish the chunk in hand before checking for a stop signal.
+            chunk = jobs.claim_chunk(worker_id)
+            if chunk is not None:
+                jobs.run_chunk(chunk)
+                processed += 1
+                continue
+            if options["once"]:
+                break
+            time.sleep(options["poll_interval"])
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} chunks."))
@@ -1,7 +1,10 @@
+import random
+
 from django.contrib.auth import get_user_model
 from django.core.management.base import BaseCommand
 from django.db import transaction
 
+from workflow.counters import rebuild_state_counters
 from workflow.models import (
     AuditLog,
     Entity,
@@ -15,11 +18,41 @@ from workflow.models import (
 )
 
 
+BATCH_SIZE = 1000
+
+# Rules cycled through for synthetic transitions; generated data passes them
+# most of the time, so transitions exercise the full rule program.
+VOLUME_RULES = [
+    ("Require requester", "field_present", {"field": "requester"}),
+    ("Minimum amount", "field_gte", {"field": "amount", "value": 0}),
+    ("Known priority", "field_in", {"field": "priority", "values": ["Low", "Medium", "High"]}),
+    (
+        "Approval for High priority",
+        "field_equals",
+        {"field": "priority", "value": "High", "requires": "approved"},
+    ),
+    ("Amount ceiling", "field_lte", {"field": "amount", "value": 1000000}),
+]
+
+
 class Command(BaseCommand):
-    help = "Seed sample workflow data (IT access request)"
+    help = "Seed sample workflow data (IT access request), optionally plus synthetic volume"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workflows", type=int, default=0, help="Synthetic workflows to create")
+        parser.add_argument("--states", type=int, default=5, help="States per synthetic workflow")
+        parser.add_argument("--rules-per-transition", type=int, default=3)
+        parser.add_argument("--entities", type=int, default=0, help="Entities per synthetic workflow")
+        parser.add_argument("--audit-rows", type=int, default=0, help="Audit rows per synthetic workflow")
+        parser.add_argument("--random-seed", type=int, default=0)
 
     @transaction.atomic
     def handle(self, *args, **options):
+        admin_user = self.seed_sample()
+        if options["workflows"]:
+            self.seed_volume(admin_user, options)
+
+    def seed_sample(self):
         User = get_user_model()
 
         admin_user, _ = User.objects.get_or_create(
@@ -171,3 +204,107 @@ class Command(BaseCommand):
         )
 
         self.stdout.write(self.style.SUCCESS("Seeded IT Access Request sample data."))
+        return admin_user
+
+    def seed_volume(self, admin_user, options):
+        rng = random.Random(options["random_seed"])
+        state_count = max(options["states"], 2)
+        workflow_ids = []
+        start = Workflow.objects.filter(name__startswith="Benchmark Workflow").count()
+
+        for offset in range(options["workflows"]):
+            workflow = Workflow.objects.create(name=f"Benchmark Workflow {start + offset + 1}")
+            workflow_ids.append(workflow.id)
+            schema_version = SchemaVersion.objects.create(workflow=workflow, version=1)
+            SchemaField.objects.bulk_create(
+                [
+                    SchemaField(schema_version=schema_version, name="requester", field_type="text", required=True),
+                    SchemaField(schema_version=schema_version, name="amount", field_type="number"),
+                    SchemaField(
+                        schema_version=schema_version,
+                        name="priority",
+                        field_type="enum",
+                        options_json={"options": ["Low", "Medium", "High"]},
+                    ),
+                    SchemaField(schema_version=schema_version, name="approved", field_type="boolean"),
+                ]
+            )
+            states = State.objects.bulk_create(
+                [
+                    State(workflow=workflow, name=f"Step {i}", order_index=i, is_initial=i == 0)
+                    for i in range(state_count)
+                ]
+            )
+            transitions = Transition.objects.bulk_create(
+                [
+                    Transition(
+                        workflow=workflow,
+                        name=f"Advance {i}",
+                        from_state=states[i],
+                        to_state=states[i + 1],
+                        order_index=i,
+                    )
+                    for i in range(state_count - 1)
+                ]
+            )
+            Rule.objects.bulk_create(
+                [
+                    Rule(
+                        transition=transition,
+                        name=VOLUME_RULES[i % len(VOLUME_RULES)][0],
+                        condition_type=VOLUME_RULES[i % len(VOLUME_RULES)][1],
+                        params_json=VOLUME_RULES[i % len(VOLUME_RULES)][2],
+                        eval_order=i,
+                    )
+                    for transition in transitions
+                    for i in range(options["rules_per_transition"])
+                ]
+            )
+
+            entity_ids = []
+            remaining = options["entities"]
+            while remaining > 0:
+                batch = min(remaining, BATCH_SIZE)
+                remaining -= batch
+                created = Entity.objects.bulk_create(
+                    [
+                        Entity(
+                            workflow=workflow,
+                            # Keep most entities at the start so transition
+                            # benchmarks have work to do.
+                            current_state=states[0] if rng.random() < 0.6 else rng.choice(states),
+                            schema_version=schema_version,
+                            data_json={
+                                "requester": f"user{rng.randrange(10000)}",
+                                "amount": rng.randrange(0, 50000),
+                                "priority": rng.choice(["Low", "Medium", "High"]),
+                                "approved": rng.random() < 0.8,
+                            },
+                            created_by=admin_user,
+                        )
+                        for _ in range(batch)
+                    ]
+                )
+                entity_ids.extend(entity.id for entity in created)
+
+            remaining = options["audit_rows"] if entity_ids else 0
+            while remaining > 0:
+                batch = min(remaining, BATCH_SIZE)
+                remaining -= batch
+                AuditLog.objects.bulk_create(
+                    [
+                        AuditLog(
+                            entity_id=rng.choice(entity_ids),
+                            actor=admin_user,
+                            action_type="system",
+                            reason="Seeded benchmark volume",
+                        )
+                        for _ in range(batch)
+                    ]
+                )
+
+        # bulk_create skips the signals that maintain counters.
+        rebuild_state_counters(workflow_ids)
+        self.stdout.write(
+            self.style.SUCCESS(f"Seeded {len(workflow_ids)} benchmark workflows: {workflow_ids}")
+        )
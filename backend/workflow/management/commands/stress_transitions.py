@@ -0,0 +1,77 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from workflow.benchmarking import STRESS_MODES, prepare_stress_entities, run_transition_stress
+from workflow.models import Transition, Workflow
+from workflow.partitioning import is_postgres
+
+
+class Command(BaseCommand):
+    help = "Race concurrent workers through one transition and report correctness and throughput"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+        parser.add_argument("--workflow", type=int, help="Workflow id (default: latest benchmark workflow)")
+        parser.add_argument("--transition", type=int, help="Transition id (default: first from the initial state)")
+        parser.add_argument("--username", default="admin")
+        parser.add_argument("--entities", type=int, default=1000, help="Fresh entities per mode")
+        parser.add_argument("--workers", type=int, default=8)
+        parser.add_argument("--chunk-size", type=int, default=100)
+        parser.add_argument(
+            "--mode", action="append", choices=STRESS_MODES, help="Repeatable; default: all modes"
+        )
+
+    def handle(self, *args, **options):
+        if not is_postgres():
+            raise CommandError("The transition stress test needs Postgres for concurrent connections.")
+
+        if options["transition"]:
+            transition = Transition.objects.select_related("workflow").filter(pk=options["transition"]).first()
+        else:
+            workflows = Workflow.objects.filter(name__startswith="Benchmark Workflow")
+            if options["workflow"]:
+                workflows = Workflow.objects.filter(pk=options["workflow"])
+            workflow = workflows.order_by("-id").first()
+            transition = (
+                Transition.objects.select_related("workflow")
+                .filter(workflow=workflow, from_state__is_initial=True)
+                .order_by("order_index", "id")
+                .first()
+            )
+        if transition is None:
+            raise CommandError("No transition found; seed a benchmark workflow or pass --transition.")
+
+        user = get_user_model().objects.filter(username=options["username"]).first()
+        if user is None:
+            raise CommandError(f"User {options['username']!r} not found.")
+
+        reports = []
+        for mode in options["mode"] or STRESS_MODES:
+            try:
+                entity_ids = prepare_stress_entities(transition, options["entities"])
+            except ValueError as exc:
+                raise CommandError(str(exc))
+            report = run_transition_stress(
+                user,
+                transition,
+                entity_ids,
+                mode=mode,
+                workers=options["workers"],
+                chunk_size=options["chunk_size"],
+            )
+            reports.append(report)
+            self.stderr.write(
+                f"{mode}: {report['transitions_per_s']} transitions/s, consistent={report['consistent']}"
+            )
+
+        payload = json.dumps({"transition": transition.id, "runs": reports}, indent=2, sort_keys=True)
+        if options["output"]:
+            with open(options["output"], "w") as out:
+                out.write(payload + "\n")
+            self.stderr.write(self.style.SUCCESS(f"Wrote stress report to {options['output']}"))
+        else:
+            self.stdout.write(payload)
+        if not all(report["consistent"] for report in reports):
+            raise CommandError("Inconsistent results: some entities were not moved exactly once.")
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from workflow import data_indexes
+from workflow.partitioning import is_postgres
+
+
+class Command(BaseCommand):
+    help = "Create expression indexes for data_json fields marked indexed in the schema"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--drop-stale", action="store_true", help="Drop indexes for fields no longer marked indexed")
+        parser.add_argument("--dry-run", action="store_true", help="Print the statements without running them")
+
+    def handle(self, *args, **options):
+        if not is_postgres():
+            raise CommandError("Data field indexes require Postgres.")
+        statements, skipped = data_indexes.sync_data_indexes(
+            drop_stale=options["drop_stale"], dry_run=options["dry_run"]
+        )
+        for name in skipped:
+            self.stderr.write(f"Skipped field {name!r}: only letters, digits and underscores are supported.")
+        for statement in statements:
+            self.stdout.write(statement)
+        verb = "Would run" if options["dry_run"] else "Ran"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {len(statements)} index statements."))
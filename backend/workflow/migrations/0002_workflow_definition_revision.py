@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("workflow", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="workflow",
+            name="definition_revision",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,47 @@
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def populate_state_counters(apps, schema_editor):
+    State = apps.get_model("workflow", "State")
+    Entity = apps.get_model("workflow", "Entity")
+    StateCounter = apps.get_model("workflow", "StateCounter")
+
+    totals = dict(
+        Entity.objects.values("current_state_id")
+        .annotate(total=Count("id"))
+        .values_list("current_state_id", "total")
+    )
+    StateCounter.objects.bulk_create(
+        [
+            StateCounter(state_id=state_id, workflow_id=workflow_id, count=totals.get(state_id, 0))
+            for state_id, workflow_id in State.objects.values_list("id", "workflow_id")
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("workflow", "0002_workflow_definition_revision"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StateCounter",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("count", models.BigIntegerField(default=0)),
+                (
+                    "state",
+                    models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name="counter", to="workflow.state"),
+                ),
+                (
+                    "workflow",
+                    models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="state_counters", to="workflow.workflow"),
+                ),
+            ],
+        ),
+        migrations.RunPython(populate_state_counters, migrations.RunPython.noop),
+    ]
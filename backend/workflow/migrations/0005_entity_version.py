@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("workflow", "0004_auditlog_created_at_default"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="entity",
+            name="version",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
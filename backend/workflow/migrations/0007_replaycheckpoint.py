@@ -0,0 +1,32 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("workflow", "0006_job_jobchunk"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReplayCheckpoint",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("as_of", models.DateTimeField()),
+                ("counts_json", models.JSONField(default=dict)),
+                ("events", models.PositiveIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "workflow",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="replay_checkpoints",
+                        to="workflow.workflow",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("workflow", "as_of")},
+            },
+        ),
+    ]
@@ -0,0 +1,88 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+GRANULARITY_CHOICES = [("hour", "Hour"), ("day", "Day")]
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("workflow", "0007_replaycheckpoint"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AnalyticsWatermark",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("name", models.CharField(max_length=64, unique=True)),
+                ("last_audit_id", models.BigIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="TransitionRollup",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("granularity", models.CharField(choices=GRANULARITY_CHOICES, max_length=8)),
+                ("bucket_start", models.DateTimeField()),
+                ("count", models.PositiveIntegerField(default=0)),
+                (
+                    "from_state",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="+", to="workflow.state"
+                    ),
+                ),
+                (
+                    "to_state",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="+", to="workflow.state"
+                    ),
+                ),
+                (
+                    "workflow",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="transition_rollups",
+                        to="workflow.workflow",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("workflow", "granularity", "bucket_start", "from_state", "to_state")},
+            },
+        ),
+        migrations.CreateModel(
+            name="DurationRollup",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("time_in_state", "Time in state"), ("lead_time", "Lead time")], max_length=16
+                    ),
+                ),
+                ("granularity", models.CharField(choices=GRANULARITY_CHOICES, max_length=8)),
+                ("bucket_start", models.DateTimeField()),
+                ("count", models.PositiveIntegerField(default=0)),
+                ("total_seconds", models.FloatField(default=0)),
+                ("histogram_json", models.JSONField(default=dict)),
+                (
+                    "state",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="+", to="workflow.state"
+                    ),
+                ),
+                (
+                    "workflow",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="duration_rollups",
+                        to="workflow.workflow",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("workflow", "kind", "granularity", "bucket_start", "state")},
+            },
+        ),
+    ]
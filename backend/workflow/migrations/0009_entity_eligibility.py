@@ -0,0 +1,20 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("workflow", "0008_analytics_rollups"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="entity",
+            name="eligible_transitions",
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="entity",
+            name="eligibility_revision",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("workflow", "0009_entity_eligibility"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="transition",
+            name="rules_order_independent",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name="RuleStats",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("evaluations", models.BigIntegerField(default=0)),
+                ("failures", models.BigIntegerField(default=0)),
+                ("total_ns", models.BigIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "rule",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="stats", to="workflow.rule"
+                    ),
+                ),
+            ],
+        ),
+    ]
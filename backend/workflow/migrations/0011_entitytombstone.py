@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("workflow", "0010_rulestats"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EntityTombstone",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("workflow_id", models.BigIntegerField()),
+                ("entity_id", models.BigIntegerField()),
+                ("entity_created_at", models.DateTimeField()),
+                ("state_id", models.BigIntegerField(null=True)),
+                ("events_json", models.JSONField(default=list)),
+                ("deleted_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "indexes": [models.Index(fields=["workflow_id", "deleted_at"], name="workflow_en_workflo_4b5e65_idx")],
+            },
+        ),
+    ]
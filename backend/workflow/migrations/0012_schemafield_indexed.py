@@ -0,0 +1,30 @@
+from django.db import migrations, models
+
+
+def move_indexed_flag(apps, schema_editor):
+    SchemaField = apps.get_model("workflow", "SchemaField")
+    for field in SchemaField.objects.filter(options_json__has_key="indexed"):
+        field.indexed = field.options_json.pop("indexed") is True
+        field.save(update_fields=["indexed", "options_json"])
+
+
+def restore_indexed_flag(apps, schema_editor):
+    SchemaField = apps.get_model("workflow", "SchemaField")
+    for field in SchemaField.objects.filter(indexed=True):
+        field.options_json["indexed"] = True
+        field.save(update_fields=["options_json"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("workflow", "0011_entitytombstone"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="schemafield",
+            name="indexed",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(move_indexed_flag, restore_indexed_flag),
+    ]
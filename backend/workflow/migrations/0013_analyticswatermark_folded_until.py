@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("workflow", "0012_schemafield_indexed"),
+    ]
+
+    # The id watermark cannot be mapped to a time; rollups are re-aggregated
+    # from the first audit row on the next run.
+    operations = [
+        migrations.RemoveField(
+            model_name="analyticswatermark",
+            name="last_audit_id",
+        ),
+        migrations.AddField(
+            model_name="analyticswatermark",
+            name="folded_until",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,10 +1,13 @@
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
 
 class Workflow(models.Model):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
+    # Only ever changed by signals.bump_definition_revision's UPDATE.
+    definition_revision = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -14,8 +17,31 @@ class Workflow(models.Model):
     def __str__(self) -> str:
         return self.name
 
+    def save(self, *args, **kwargs):
+        # Updates leave definition_revision out, so saving an instance loaded
+        # before a bump does not write the older revision back.
+        if not self._state.adding and not kwargs.get("force_insert"):
+            update_fields = kwargs.get("update_fields")
+            if update_fields is None:
+                update_fields = [field.attname for field in self._meta.concrete_fields if not field.primary_key]
+            kwargs["update_fields"] = [name for name in update_fields if name != "definition_revision"]
+        super().save(*args, **kwargs)
 
-class State(models.Model):
+
+class DefinitionOwnerMixin:
+    """Remembers the persisted ``owner_field`` so signals can bump the
+    workflow a definition row is moved away from."""
+
+    owner_field = "workflow_id"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_owner_id = instance.__dict__.get(cls.owner_field)
+        return instance
+
+
+class State(DefinitionOwnerMixin, models.Model):
     workflow = models.ForeignKey(Workflow, on_delete=models.CASCADE, related_name="states")
     name = models.CharField(max_length=255)
     order_index = models.PositiveIntegerField(default=0)
@@ -32,12 +58,15 @@ class State(models.Model):
         return f"{self.workflow.name}: {self.name}"
 
 
-class Transition(models.Model):
+class Transition(DefinitionOwnerMixin, models.Model):
     workflow = models.ForeignKey(Workflow, on_delete=models.CASCADE, related_name="transitions")
     name = models.CharField(max_length=255)
     from_state = models.ForeignKey(State, on_delete=models.CASCADE, related_name="outgoing_transitions")
     to_state = models.ForeignKey(State, on_delete=models.CASCADE, related_name="incoming_transitions")
     order_index = models.PositiveIntegerField(default=0)
+    # Rules may run in any order (all must pass either way), so they are
+    # reordered by observed selectivity and cost; see rule_stats.py.
+    rules_order_independent = models.BooleanField(default=False)
 
     class Meta:
         unique_together = ("workflow", "from_state", "to_state", "name")
@@ -50,7 +79,9 @@ class Transition(models.Model):
         return f"{self.workflow.name}: {self.from_state.name} -> {self.to_state.name}"
 
 
-class Rule(models.Model):
+class Rule(DefinitionOwnerMixin, models.Model):
+    owner_field = "transition_id"
+
     class ConditionType(models.TextChoices):
         FIELD_EQUALS = "field_equals", "Field equals"
         FIELD_PRESENT = "field_present", "Field present"
@@ -77,7 +108,24 @@ class Rule(models.Model):
         return f"{self.transition} :: {self.name}"
 
 
-class SchemaVersion(models.Model):
+class RuleStats(models.Model):
+    """Observed outcomes of a rule in single-entity transitions.
+
+    Only evaluations that reached the rule count: a rule after a blocking one
+    is not run.
+    """
+
+    rule = models.OneToOneField(Rule, on_delete=models.CASCADE, related_name="stats")
+    evaluations = models.BigIntegerField(default=0)
+    failures = models.BigIntegerField(default=0)
+    total_ns = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"{self.rule_id}: {self.failures}/{self.evaluations}"
+
+
+class SchemaVersion(DefinitionOwnerMixin, models.Model):
     workflow = models.ForeignKey(Workflow, on_delete=models.CASCADE, related_name="schema_versions")
     version = models.PositiveIntegerField()
     created_at = models.DateTimeField(auto_now_add=True)
@@ -90,7 +138,9 @@ class SchemaVersion(models.Model):
         return f"{self.workflow.name} v{self.version}"
 
 
-class SchemaField(models.Model):
+class SchemaField(DefinitionOwnerMixin, models.Model):
+    owner_field = "schema_version_id"
+
     class FieldType(models.TextChoices):
         TEXT = "text", "Text"
         NUMBER = "number", "Number"
@@ -105,6 +155,9 @@ class SchemaField(models.Model):
     name = models.CharField(max_length=255)
     field_type = models.CharField(max_length=32, choices=FieldType.choices)
     required = models.BooleanField(default=False)
+    # Filterable through ``?data__<name>=`` and backed by an expression index
+    # (see data_indexes.py).
+    indexed = models.BooleanField(default=False)
     options_json = models.JSONField(default=dict, blank=True)
 
     class Meta:
@@ -128,6 +181,13 @@ class Entity(models.Model):
     created_by = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True
     )
+    # Incremented on every write; transitions only apply if it is unchanged
+    # since the entity was read.
+    version = models.PositiveIntegerField(default=0, editable=False)
+    # Bit i: the i-th outgoing transition of current_state passes its rules,
+    # as of workflow definition_revision eligibility_revision (see eligibility.py).
+    eligible_transitions = models.BigIntegerField(null=True, blank=True, editable=False)
+    eligibility_revision = models.PositiveIntegerField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -140,6 +200,24 @@ class Entity(models.Model):
     def __str__(self) -> str:
         return f"{self.workflow.name} #{self.pk}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the persisted state so saves can maintain StateCounter.
+        instance._loaded_state_id = instance.__dict__.get("current_state_id")
+        return instance
+
+
+class StateCounter(models.Model):
+    """Denormalized number of entities currently in a state."""
+
+    workflow = models.ForeignKey(Workflow, on_delete=models.CASCADE, related_name="state_counters")
+    state = models.OneToOneField(State, on_delete=models.CASCADE, related_name="counter")
+    count = models.BigIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f"{self.state_id}: {self.count}"
+
 
 class AuditLog(models.Model):
     class ActionType(models.TextChoices):
@@ -163,7 +241,8 @@ class AuditLog(models.Model):
     rule = models.ForeignKey(Rule, on_delete=models.SET_NULL, null=True, blank=True)
     reason = models.TextField(blank=True)
     metadata_json = models.JSONField(default=dict, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Event time, set when the row is recorded so buffered writes keep it.
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
         indexes = [
@@ -186,3 +265,160 @@ class UserProfile(models.Model):
 
     def __str__(self) -> str:
         return f"{self.user_id} {self.role}"
+
+
+class Job(models.Model):
+    """A long-running operation split into ``JobChunk`` rows for workers."""
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        RUNNING = "running", "Running"
+        SUCCEEDED = "succeeded", "Succeeded"
+        FAILED = "failed", "Failed"
+
+    kind = models.CharField(max_length=64)
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.PENDING)
+    params_json = models.JSONField(default=dict, blank=True)
+    result_json = models.JSONField(default=dict, blank=True)
+    total_chunks = models.PositiveIntegerField(default=0)
+    done_chunks = models.PositiveIntegerField(default=0)
+    failed_chunks = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "created_at"])]
+
+    def __str__(self) -> str:
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+
+class JobChunk(models.Model):
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        RUNNING = "running", "Running"
+        SUCCEEDED = "succeeded", "Succeeded"
+        FAILED = "failed", "Failed"
+
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name="chunks")
+    index = models.PositiveIntegerField()
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.PENDING)
+    payload_json = models.JSONField(default=dict, blank=True)
+    result_json = models.JSONField(default=dict, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=255, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        unique_together = ("job", "index")
+        indexes = [models.Index(fields=["status", "run_after"])]
+
+    def __str__(self) -> str:
+        return f"{self.job_id}/{self.index} ({self.status})"
+
+
+class ReplayCheckpoint(models.Model):
+    """Per-state entity counts of a workflow as of a point in time (see workflow.replay)."""
+
+    workflow = models.ForeignKey(Workflow, on_delete=models.CASCADE, related_name="replay_checkpoints")
+    as_of = models.DateTimeField()
+    # {state id: number of entities in that state at ``as_of``}
+    counts_json = models.JSONField(default=dict)
+    events = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("workflow", "as_of")
+
+    def __str__(self) -> str:
+        return f"{self.workflow_id} @ {self.as_of.isoformat()}"
+
+
+class EntityTombstone(models.Model):
+    """State history of a deleted entity, whose audit rows are deleted with it.
+
+    Lets replays drop the entity from checkpoints written before it was
+    deleted (see workflow.replay).
+    """
+
+    # Plain ids rather than foreign keys: tombstones are also written while
+    # a workflow delete cascades to its entities.
+    workflow_id = models.BigIntegerField()
+    entity_id = models.BigIntegerField()
+    entity_created_at = models.DateTimeField()
+    # State when deleted, and [[created_at ISO, from_state_id, to_state_id], ...]
+    # of its state events in order.
+    state_id = models.BigIntegerField(null=True)
+    events_json = models.JSONField(default=list)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["workflow_id", "deleted_at"])]
+
+    def __str__(self) -> str:
+        return f"{self.workflow_id}/{self.entity_id} deleted {self.deleted_at.isoformat()}"
+
+
+class AnalyticsWatermark(models.Model):
+    """``AuditLog`` rows created before ``folded_until`` are in the analytics rollups."""
+
+    name = models.CharField(max_length=64, unique=True)
+    folded_until = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"{self.name}: {self.folded_until.isoformat() if self.folded_until else '-'}"
+
+
+class Granularity(models.TextChoices):
+    HOUR = "hour", "Hour"
+    DAY = "day", "Day"
+
+
+class TransitionRollup(models.Model):
+    """State changes between two states per hour or day (see workflow.analytics)."""
+
+    workflow = models.ForeignKey(Workflow, on_delete=models.CASCADE, related_name="transition_rollups")
+    granularity = models.CharField(max_length=8, choices=Granularity.choices)
+    bucket_start = models.DateTimeField()
+    from_state = models.ForeignKey(State, on_delete=models.CASCADE, related_name="+")
+    to_state = models.ForeignKey(State, on_delete=models.CASCADE, related_name="+")
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("workflow", "granularity", "bucket_start", "from_state", "to_state")
+
+    def __str__(self) -> str:
+        return f"{self.workflow_id} {self.granularity} {self.bucket_start.isoformat()}"
+
+
+class DurationRollup(models.Model):
+    """Histogram of durations ending in a bucket: time spent in a state, or lead time."""
+
+    class Kind(models.TextChoices):
+        TIME_IN_STATE = "time_in_state", "Time in state"
+        LEAD_TIME = "lead_time", "Lead time"
+
+    workflow = models.ForeignKey(Workflow, on_delete=models.CASCADE, related_name="duration_rollups")
+    kind = models.CharField(max_length=16, choices=Kind.choices)
+    granularity = models.CharField(max_length=8, choices=Granularity.choices)
+    bucket_start = models.DateTimeField()
+    # The state left (time in state) or the final state reached (lead time).
+    state = models.ForeignKey(State, on_delete=models.CASCADE, related_name="+")
+    count = models.PositiveIntegerField(default=0)
+    total_seconds = models.FloatField(default=0)
+    # {bin index: count}; see analytics.duration_bin.
+    histogram_json = models.JSONField(default=dict)
+
+    class Meta:
+        unique_together = ("workflow", "kind", "granularity", "bucket_start", "state")
+
+    def __str__(self) -> str:
+        return f"{self.workflow_id} {self.kind} {self.granularity} {self.bucket_start.isoformat()}"
@@ -0,0 +1,217 @@
+"""Monthly range partitioning and retention for the audit log table.
+
+Partitioning is Postgres-only and opt-in: ``manage.py audit_partitions
+convert`` rebuilds ``workflow_auditlog`` as a table partitioned by month on
+``created_at``. Queries that bound ``created_at`` (see the ``created_at__gte``
+/ ``created_at__lt`` filters on the audit log API) are then pruned to the
+matching partitions by the planner, and retention detaches whole partitions
+instead of running large ``DELETE`` statements.
+
+On other databases, or before conversion, retention falls back to exporting
+and deleting rows in batches.
+"""
+import gzip
+import json
+import os
+from datetime import date, datetime
+from typing import Iterator, List, Tuple
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import AuditLog, Entity, Rule, State
+
+TABLE = AuditLog._meta.db_table
+PARTITION_PREFIX = f"{TABLE}_p"
+DEFAULT_PARTITION = f"{TABLE}_default"
+SEQUENCE = f"{TABLE}_partitioned_id_seq"
+ARCHIVE_BATCH_SIZE = 5000
+FIELDS = [field.attname for field in AuditLog._meta.concrete_fields]
+
+
+def month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(value: date, months: int) -> date:
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(start: date) -> str:
+    return f"{PARTITION_PREFIX}{start:%Y%m}"
+
+
+def month_ranges(first: date, last: date) -> Iterator[Tuple[date, date]]:
+    """Yield ``[start, end)`` month bounds covering ``first`` through ``last``."""
+    start = month_start(first)
+    while start <= last:
+        end = add_months(start, 1)
+        yield start, end
+        start = end
+
+
+def is_postgres() -> bool:
+    return connection.vendor == "postgresql"
+
+
+def is_partitioned() -> bool:
+    if not is_postgres():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relkind FROM pg_class c WHERE c.oid = to_regclass(%s)", [TABLE]
+        )
+        row = cursor.fetchone()
+    return bool(row) and row[0] == "p"
+
+
+def list_partitions() -> List[Tuple[str, date]]:
+    """Return ``(name, month_start)`` for each monthly partition, oldest first."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s
+            """,
+            [TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = []
+    for name in names:
+        if not name.startswith(PARTITION_PREFIX):
+            continue
+        suffix = name[len(PARTITION_PREFIX):]
+        partitions.append((name, date(int(suffix[:4]), int(suffix[4:6]), 1)))
+    return sorted(partitions, key=lambda item: item[1])
+
+
+def _create_partition(cursor, start: date, end: date) -> None:
+    cursor.execute(
+        f'CREATE TABLE IF NOT EXISTS "{partition_name(start)}" PARTITION OF "{TABLE}" '
+        "FOR VALUES FROM (%s) TO (%s)",
+        [start.isoformat(), end.isoformat()],
+    )
+
+
+def ensure_partitions(months_ahead: int = 3) -> List[str]:
+    """Create monthly partitions from the current month up to ``months_ahead``."""
+    today = timezone.now().date()
+    created = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        existing = {name for name, _ in list_partitions()}
+        for start, end in month_ranges(today, add_months(month_start(today), months_ahead)):
+            if partition_name(start) not in existing:
+                _create_partition(cursor, start, end)
+                created.append(partition_name(start))
+    return created
+
+
+def convert_to_partitioned(months_ahead: int = 3, keep_legacy: bool = False) -> List[str]:
+    """Rebuild the audit log table as a monthly range-partitioned table.
+
+    Postgres requires the partition key in every unique constraint, so the
+    primary key becomes ``(id, created_at)``; ids still come from a single
+    sequence and stay unique. Existing rows are copied into their month's
+    partition inside one transaction, so run this in a maintenance window.
+    """
+    legacy = f"{TABLE}_legacy"
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE "{TABLE}" RENAME TO "{legacy}"')
+        # ``LIKE`` does not copy the IDENTITY of ``id``, and the legacy
+        # identity sequence goes away with the legacy table, so ids continue
+        # from a sequence owned by the new table.
+        cursor.execute(
+            f'CREATE TABLE "{TABLE}" (LIKE "{legacy}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            "PARTITION BY RANGE (created_at)"
+        )
+        cursor.execute(f'CREATE SEQUENCE "{SEQUENCE}" OWNED BY "{TABLE}".id')
+        cursor.execute(
+            f'SELECT setval(%s, COALESCE((SELECT MAX(id) FROM "{legacy}"), 0) + 1, false)',
+            [SEQUENCE],
+        )
+        cursor.execute(f"ALTER TABLE \"{TABLE}\" ALTER COLUMN id SET DEFAULT nextval('\"{SEQUENCE}\"')")
+        cursor.execute(f'ALTER TABLE "{TABLE}" ADD PRIMARY KEY (id, created_at)')
+        cursor.execute(f'CREATE INDEX "{TABLE}_entity_created_idx" ON "{TABLE}" (entity_id, created_at)')
+        cursor.execute(f'CREATE INDEX "{TABLE}_action_type_idx" ON "{TABLE}" (action_type)')
+        for column, target in (
+            ("entity_id", Entity._meta.db_table),
+            ("actor_id", get_user_model()._meta.db_table),
+            ("from_state_id", State._meta.db_table),
+            ("to_state_id", State._meta.db_table),
+            ("rule_id", Rule._meta.db_table),
+        ):
+            cursor.execute(
+                f'ALTER TABLE "{TABLE}" ADD FOREIGN KEY ({column}) REFERENCES "{target}" (id) '
+                "DEFERRABLE INITIALLY DEFERRED"
+            )
+
+        cursor.execute(f'SELECT MIN(created_at) FROM "{legacy}"')
+        oldest = cursor.fetchone()[0] or timezone.now()
+        newest = add_months(month_start(timezone.now().date()), months_ahead)
+        created = []
+        for start, end in month_ranges(oldest.date(), newest):
+            _create_partition(cursor, start, end)
+            created.append(partition_name(start))
+        # Safety net for rows outside the pre-created range; keep it empty by
+        # running ``audit_partitions ensure`` ahead of each month.
+        cursor.execute(f'CREATE TABLE "{DEFAULT_PARTITION}" PARTITION OF "{TABLE}" DEFAULT')
+
+        cursor.execute(f'INSERT INTO "{TABLE}" SELECT * FROM "{legacy}"')
+        if not keep_legacy:
+            cursor.execute(f'DROP TABLE "{legacy}"')
+    return created
+
+
+def _write_ndjson(out, rows) -> None:
+    for row in rows:
+        out.write(json.dumps(row, cls=JSONEncoder) + "\n")
+    out.flush()
+
+
+def archive_partitions(before: date, output_dir: str) -> List[str]:
+    """Detach, dump (gzipped NDJSON) and drop every partition entirely before ``before``."""
+    os.makedirs(output_dir, exist_ok=True)
+    columns = ", ".join(f'"{name}"' for name in FIELDS)
+    archived = []
+    for name, start in list_partitions():
+        if add_months(start, 1) > before:
+            continue
+        path = os.path.join(output_dir, f"{name}.ndjson.gz")
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE "{TABLE}" DETACH PARTITION "{name}"')
+            cursor.execute(f'SELECT {columns} FROM "{name}" ORDER BY created_at, id')
+            with gzip.open(path, "wt", encoding="utf-8") as out:
+                while True:
+                    rows = cursor.fetchmany(ARCHIVE_BATCH_SIZE)
+                    if not rows:
+                        break
+                    _write_ndjson(out, (dict(zip(FIELDS, row)) for row in rows))
+            cursor.execute(f'DROP TABLE "{name}"')
+        archived.append(path)
+    return archived
+
+
+def archive_rows(before: datetime, output_dir: str, batch_size: int = ARCHIVE_BATCH_SIZE) -> List[str]:
+    """Export rows older than ``before`` as gzipped NDJSON, then delete them.
+
+    Used when the table is not partitioned. Rows are written and deleted one
+    batch at a time in ``(created_at, id)`` order, so a crash leaves at most
+    one batch duplicated between the archive and the table, never lost.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"{TABLE}_before_{before:%Y%m%d}.ndjson.gz")
+    queryset = AuditLog.objects.filter(created_at__lt=before).order_by("created_at", "id")
+    with gzip.open(path, "at", encoding="utf-8") as out:
+        while True:
+            rows = list(queryset.values(*FIELDS)[:batch_size])
+            if not rows:
+                break
+            _write_ndjson(out, rows)
+            AuditLog.objects.filter(id__in=[row["id"] for row in rows]).delete()
+    return [path]
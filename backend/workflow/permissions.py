@@ -1,19 +1,105 @@
+import threading
 from typing import Optional
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from rest_framework.permissions import BasePermission, SAFE_METHODS
 
 from .models import UserProfile
 
+ROLE_CACHE_TIMEOUT = getattr(settings, "WORKFLOW_ROLE_CACHE_TIMEOUT", 60)
+
+_REQUEST_ROLE_ATTR = "_workflow_role"
+_UNSET = object()
+
+
+class RoleCacheStats:
+    """Process-wide hit/miss counters for role lookups."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.request_hits = 0
+            self.cache_hits = 0
+            self.misses = 0
+
+    def record(self, kind: str):
+        with self._lock:
+            setattr(self, kind, getattr(self, kind) + 1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            hits = self.request_hits + self.cache_hits
+            total = hits + self.misses
+            return {
+                "request_hits": self.request_hits,
+                "cache_hits": self.cache_hits,
+                "misses": self.misses,
+                "hit_ratio": hits / total if total else 0.0,
+            }
+
+
+role_cache_stats = RoleCacheStats()
+
+
+def role_cache_key(user_id) -> str:
+    return f"workflow:role:{user_id}"
+
+
+def invalidate_role(user_id) -> None:
+    cache.delete(role_cache_key(user_id))
+
 
 def get_role(user: Optional[get_user_model()]):
     if not user or not user.is_authenticated:
         return None
+    key = role_cache_key(user.pk)
+    role = cache.get(key)
+    if role is not None:
+        role_cache_stats.record("cache_hits")
+        return role
+
+    role_cache_stats.record("misses")
+    try:
+        role = UserProfile.objects.values_list("role", flat=True).get(user=user)
+    except UserProfile.DoesNotExist:
+        role = UserProfile.Role.VIEWER
+    cache.set(key, role, ROLE_CACHE_TIMEOUT)
+    return role
+
+
+async def aget_role(user):
+    """``get_role`` for async views, through the async cache and ORM APIs."""
+    if not user or not user.is_authenticated:
+        return None
+    key = role_cache_key(user.pk)
+    role = await cache.aget(key)
+    if role is not None:
+        role_cache_stats.record("cache_hits")
+        return role
+
+    role_cache_stats.record("misses")
     try:
-        profile = UserProfile.objects.get(user=user)
-        return profile.role
+        role = await UserProfile.objects.values_list("role", flat=True).aget(user=user)
     except UserProfile.DoesNotExist:
-        return UserProfile.Role.VIEWER
+        role = UserProfile.Role.VIEWER
+    await cache.aset(key, role, ROLE_CACHE_TIMEOUT)
+    return role
+
+
+def get_request_role(request):
+    """``get_role`` memoized on the request, since DRF may check permissions more than once."""
+    role = getattr(request, _REQUEST_ROLE_ATTR, _UNSET)
+    if role is not _UNSET:
+        role_cache_stats.record("request_hits")
+        return role
+    role = get_role(request.user)
+    setattr(request, _REQUEST_ROLE_ATTR, role)
+    return role
 
 
 class RolePermission(BasePermission):
@@ -24,19 +110,25 @@ class RolePermission(BasePermission):
     """
 
     def has_permission(self, request, view):
-        role = get_role(request.user)
-        if role is None:
-            return False
-        if role == UserProfile.Role.ADMIN:
-            return True
-
-        role_permissions = getattr(view, "role_permissions", {})
-        action = getattr(view, "action", None)
-        allowed = role_permissions.get(action) or role_permissions.get("*")
-        if allowed is not None:
-            return role in allowed
+        return role_allows(
+            get_request_role(request),
+            getattr(view, "role_permissions", {}),
+            getattr(view, "action", None),
+            request.method,
+        )
 
-        if request.method in SAFE_METHODS:
-            return role in [UserProfile.Role.ADMIN, UserProfile.Role.OPERATOR, UserProfile.Role.VIEWER]
 
+def role_allows(role, role_permissions: dict, action, method: str) -> bool:
+    if role is None:
         return False
+    if role == UserProfile.Role.ADMIN:
+        return True
+
+    allowed = role_permissions.get(action) or role_permissions.get("*")
+    if allowed is not None:
+        return role in allowed
+
+    if method in SAFE_METHODS:
+        return role in [UserProfile.Role.ADMIN, UserProfile.Role.OPERATOR, UserProfile.Role.VIEWER]
+
+    return False
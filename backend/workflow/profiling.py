@@ -0,0 +1,237 @@
+"""Per-request query counting, duplicate (N+1) detection and DB timing.
+
+``QueryProfilingMiddleware`` wraps every database call made while a request
+is handled. Totals are aggregated per view action (e.g.
+``EntityViewSet.transition``) and served by ``GET /api/query-stats/``; in
+``DEBUG`` each response also carries ``X-Query-Count``, ``X-Query-Time-Ms``
+and ``X-Query-Duplicates`` headers. Enable it with
+``WORKFLOW_QUERY_PROFILING`` (on by default when ``DEBUG`` is set).
+
+The middleware runs in sync and async stacks. The active request's recorder
+is kept in a context variable and a wrapper installed on every connection
+reads it, so queries made through ``sync_to_async`` (the async ORM) count
+towards the request. Queries made while a streamed body is produced are
+recorded when the stream ends; streamed responses get no ``X-Query-*``
+headers, since those are sent before the body.
+"""
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+_IN_LIST = re.compile(r"\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)")
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+# A statement shape repeated this many times in one request is reported as a
+# likely N+1 pattern.
+DUPLICATE_THRESHOLD = 2
+
+
+def fingerprint(sql: str) -> str:
+    """Normalize SQL so statements differing only in literals compare equal."""
+    sql = _LITERALS.sub("?", sql)
+    sql = _IN_LIST.sub("(...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+class QueryRecorder:
+    """``connection.execute_wrapper`` hook collecting one request's queries."""
+
+    def __init__(self):
+        self.count = 0
+        self.time_ms = 0.0
+        self.fingerprints: Counter = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time_ms += (time.perf_counter() - started) * 1000
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def duplicates(self) -> List[Tuple[str, int]]:
+        return [
+            (sql, count)
+            for sql, count in self.fingerprints.most_common()
+            if count >= DUPLICATE_THRESHOLD
+        ]
+
+
+class QueryStats:
+    """Process-wide query totals per view action."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views: Dict[str, dict] = {}
+
+    def record(self, view: str, recorder: QueryRecorder) -> None:
+        duplicates = recorder.duplicates()
+        with self._lock:
+            stats = self._views.setdefault(
+                view,
+                {
+                    "requests": 0,
+                    "queries_total": 0,
+                    "queries_max": 0,
+                    "db_time_ms_total": 0.0,
+                    "requests_with_duplicates": 0,
+                    "duplicate_fingerprints": Counter(),
+                },
+            )
+            stats["requests"] += 1
+            stats["queries_total"] += recorder.count
+            stats["queries_max"] = max(stats["queries_max"], recorder.count)
+            stats["db_time_ms_total"] += recorder.time_ms
+            if duplicates:
+                stats["requests_with_duplicates"] += 1
+                for sql, count in duplicates:
+                    stats["duplicate_fingerprints"][sql] += count
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            return {
+                view: {
+                    "requests": stats["requests"],
+                    "queries_mean": round(stats["queries_total"] / stats["requests"], 2),
+                    "queries_max": stats["queries_max"],
+                    "db_time_ms_mean": round(stats["db_time_ms_total"] / stats["requests"], 3),
+                    "requests_with_duplicates": stats["requests_with_duplicates"],
+                    "top_duplicates": [
+                        {"sql": sql, "count": count}
+                        for sql, count in stats["duplicate_fingerprints"].most_common(5)
+                    ],
+                }
+                for view, stats in sorted(self._views.items())
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._views.clear()
+
+
+query_stats = QueryStats()
+
+
+def view_label(request) -> str:
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unresolved"
+    func = match.func
+    cls = getattr(func, "cls", None)
+    if cls is None:
+        return match.view_name or getattr(func, "__name__", "unknown")
+    actions = getattr(func, "actions", None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return f"{cls.__name__}.{action}"
+
+
+_recorder: ContextVar[Optional[QueryRecorder]] = ContextVar("query_recorder", default=None)
+
+
+def _execute(execute, sql, params, many, context):
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install_wrappers(**kwargs) -> None:
+    """Add the recording wrapper to this thread's connections; also a ``connection_created`` receiver."""
+    targets = [kwargs["connection"]] if "connection" in kwargs else connections.all()
+    for connection in targets:
+        if _execute not in connection.execute_wrappers:
+            connection.execute_wrappers.append(_execute)
+
+
+def _recorded(content, recorder: QueryRecorder, view: str):
+    iterator = iter(content)
+    try:
+        while True:
+            token = _recorder.set(recorder)
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                _recorder.reset(token)
+            yield chunk
+    finally:
+        query_stats.record(view, recorder)
+
+
+async def _arecorded(content, recorder: QueryRecorder, view: str):
+    iterator = aiter(content)
+    try:
+        while True:
+            token = _recorder.set(recorder)
+            try:
+                chunk = await anext(iterator)
+            except StopAsyncIteration:
+                return
+            finally:
+                _recorder.reset(token)
+            yield chunk
+    finally:
+        query_stats.record(view, recorder)
+
+
+class QueryProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "WORKFLOW_QUERY_PROFILING", settings.DEBUG):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        connection_created.connect(install_wrappers, dispatch_uid="workflow.profiling")
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        install_wrappers()
+        recorder = QueryRecorder()
+        token = _recorder.set(recorder)
+        try:
+            response = self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return self.finish(request, response, recorder)
+
+    async def __acall__(self, request):
+        # The thread sync_to_async runs queries on may hold connections
+        # opened before the middleware was loaded.
+        await sync_to_async(install_wrappers)()
+        recorder = QueryRecorder()
+        token = _recorder.set(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return self.finish(request, response, recorder)
+
+    def finish(self, request, response, recorder: QueryRecorder):
+        view = view_label(request)
+        if response.streaming:
+            wrap = _arecorded if response.is_async else _recorded
+            response.streaming_content = wrap(response.streaming_content, recorder, view)
+            return response
+        query_stats.record(view, recorder)
+        if settings.DEBUG:
+            response["X-Query-Count"] = str(recorder.count)
+            response["X-Query-Time-Ms"] = f"{recorder.time_ms:.3f}"
+            response["X-Query-Duplicates"] = str(sum(count for _, count in recorder.duplicates()))
+        return response
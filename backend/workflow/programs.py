@@ -0,0 +1,98 @@
+from typing import Dict, NamedTuple, Tuple
+
+from .models import Rule
+from .rules import RuleCheck, compile_rule
+
+
+class CompiledRule(NamedTuple):
+    rule_id: int
+    name: str
+    check: RuleCheck
+    condition_type: str
+    params: dict
+
+
+RuleProgram = Tuple[CompiledRule, ...]
+
+# transition id -> (workflow definition revision, program). Entries compiled
+# against an older revision are simply recompiled on the next lookup, so any
+# process sees rule changes as soon as it reads the bumped revision.
+_programs: Dict[int, Tuple[int, RuleProgram]] = {}
+
+
+def compile_program(rules) -> RuleProgram:
+    program = []
+    for rule in rules:
+        params = rule.params_json or {}
+        program.append(
+            CompiledRule(
+                rule.id,
+                rule.name,
+                compile_rule(rule.condition_type, params),
+                rule.condition_type,
+                params,
+            )
+        )
+    return tuple(program)
+
+
+def get_transition_program(transition_id: int, revision: int) -> RuleProgram:
+    """Return the active rules of a transition compiled in ``eval_order``.
+
+    ``revision`` is the owning workflow's ``definition_revision``; callers
+    normally already have it from ``entity.workflow``, so a cache hit costs no
+    queries at all.
+    """
+    cached = _programs.get(transition_id)
+    if cached is not None and cached[0] == revision:
+        return cached[1]
+
+    rules = Rule.objects.filter(transition_id=transition_id, is_active=True).order_by(
+        "eval_order", "id"
+    )
+    program = compile_program(rules)
+    _programs[transition_id] = (revision, program)
+    return program
+
+
+def get_transition_programs(revisions: Dict[int, int]) -> Dict[int, RuleProgram]:
+    """Batch form of ``get_transition_program``.
+
+    ``revisions`` maps transition id to its workflow's revision. Programs not
+    cached at that revision are compiled from a single rule query.
+    """
+    programs: Dict[int, RuleProgram] = {}
+    missing = []
+    for transition_id, revision in revisions.items():
+        cached = _programs.get(transition_id)
+        if cached is not None and cached[0] == revision:
+            programs[transition_id] = cached[1]
+        else:
+            missing.append(transition_id)
+    if not missing:
+        return programs
+
+    grouped = {transition_id: [] for transition_id in missing}
+    rules = Rule.objects.filter(transition_id__in=missing, is_active=True).order_by(
+        "eval_order", "id"
+    )
+    for rule in rules:
+        grouped[rule.transition_id].append(rule)
+    for transition_id, rules in grouped.items():
+        program = compile_program(rules)
+        _programs[transition_id] = (revisions[transition_id], program)
+        programs[transition_id] = program
+    return programs
+
+
+def run_program(program: RuleProgram, data: dict):
+    """Return the first ``(compiled_rule, reason)`` that blocks, or ``None``."""
+    for compiled in program:
+        passed, reason = compiled.check(data)
+        if not passed:
+            return compiled, reason
+    return None
+
+
+def clear_programs() -> None:
+    _programs.clear()
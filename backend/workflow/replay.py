@@ -0,0 +1,252 @@
+"""Point-in-time entity states rebuilt from the audit log.
+
+State-changing audit rows are ``state_change`` events and ``system`` rows
+that set a state (imports record an entity's initial state that way). An
+entity created before ``at`` is in the ``to_state`` of its last such event
+at or before ``at``. Without one, it has not moved yet and is in the
+``from_state`` of its next event (or its current state if it never moved).
+
+Whole-workflow snapshots are per-state counts. ``ReplayCheckpoint`` rows store
+the counts at fixed times, so an as-of query starts from the nearest
+checkpoint at or before ``at`` and only folds the events between the two,
+streamed in ``(entity, created_at)`` order: each entity that moved leaves its
+state at the checkpoint and lands in the state of its last event. Entities
+created in that window are added in their state at ``at``.
+
+Deleting an entity cascades to its audit rows, so a deleted entity drops
+out of every replay, as if it had never existed. Checkpoints written before
+the deletion still count it. So when a checkpoint might have counted an
+entity, deleting it first records an ``EntityTombstone`` with its state
+events. Replays that start from an older checkpoint subtract the entity in
+its state at that checkpoint. With or without checkpoints, the counts match.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import groupby
+from operator import itemgetter
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q, Subquery
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import AuditLog, Entity, EntityTombstone, ReplayCheckpoint, State, Workflow
+
+# Audit rows can arrive a little late through the buffered sink, so
+# checkpoints are only written for times at least this far in the past.
+CHECKPOINT_LAG = timedelta(seconds=getattr(settings, "WORKFLOW_REPLAY_CHECKPOINT_LAG", 3600))
+REPLAY_CHUNK_SIZE = 5000
+
+STATE_EVENTS = Q(action_type=AuditLog.ActionType.STATE_CHANGE) | Q(
+    action_type=AuditLog.ActionType.SYSTEM, to_state__isnull=False
+)
+
+
+class EntitySnapshot(NamedTuple):
+    entity_id: int
+    at: datetime
+    existed: bool
+    state_id: Optional[int]
+    # Audit row the state comes from; None when the entity had not moved yet.
+    event_id: Optional[int]
+
+
+class WorkflowSnapshot(NamedTuple):
+    workflow_id: int
+    at: datetime
+    counts: Dict[int, int]
+    checkpoint: Optional[datetime]
+    replayed_events: int
+
+
+def _load_counts(counts_json: dict) -> Dict[Optional[int], int]:
+    # Audit rows keep a deleted state as NULL, stored under "null".
+    return {None if key == "null" else int(key): count for key, count in counts_json.items()}
+
+
+def _dump_counts(counts: Dict[Optional[int], int]) -> dict:
+    return {"null" if key is None else str(key): count for key, count in counts.items() if count}
+
+
+def _state_events():
+    return AuditLog.objects.filter(STATE_EVENTS).order_by("created_at", "id")
+
+
+def entity_state_at(entity: Entity, at: datetime) -> EntitySnapshot:
+    if entity.created_at > at:
+        return EntitySnapshot(entity.id, at, False, None, None)
+    events = _state_events().filter(entity_id=entity.id)
+    last = events.filter(created_at__lte=at).values_list("id", "to_state_id").last()
+    if last is not None:
+        return EntitySnapshot(entity.id, at, True, last[1], last[0])
+    upcoming = events.filter(created_at__gt=at).values_list("from_state_id", "to_state_id").first()
+    state_id = entity.current_state_id
+    if upcoming is not None:
+        state_id = upcoming[0] or upcoming[1]
+    return EntitySnapshot(entity.id, at, True, state_id, None)
+
+
+def record_deletion(entity: Entity) -> None:
+    """Keep the state events of an entity about to be deleted, if a checkpoint may count it."""
+    counted = ReplayCheckpoint.objects.filter(workflow_id=entity.workflow_id, as_of__gte=entity.created_at)
+    if not counted.exists():
+        return
+    events = _state_events().filter(entity_id=entity.id).values_list("created_at", "from_state_id", "to_state_id")
+    EntityTombstone.objects.create(
+        workflow_id=entity.workflow_id,
+        entity_id=entity.id,
+        entity_created_at=entity.created_at,
+        state_id=entity.current_state_id,
+        events_json=[[at.isoformat(), from_state, to_state] for at, from_state, to_state in events],
+    )
+
+
+def _tombstone_state_at(tombstone: EntityTombstone, at: datetime) -> Optional[int]:
+    # Same rule as entity_state_at, over the recorded events.
+    events = [
+        (parse_datetime(created_at), from_state, to_state)
+        for created_at, from_state, to_state in tombstone.events_json
+    ]
+    last = [to_state for created_at, _, to_state in events if created_at <= at]
+    if last:
+        return last[-1]
+    upcoming = [(from_state, to_state) for created_at, from_state, to_state in events if created_at > at]
+    if upcoming:
+        return upcoming[0][0] or upcoming[0][1]
+    return tombstone.state_id
+
+
+def discount_deleted(workflow_id: int, counts: Dict[int, int], as_of: datetime, written_at: datetime) -> None:
+    """Remove entities deleted after a checkpoint was written from its ``counts``."""
+    tombstones = EntityTombstone.objects.filter(
+        workflow_id=workflow_id, deleted_at__gt=written_at, entity_created_at__lte=as_of
+    )
+    for tombstone in tombstones.iterator(chunk_size=REPLAY_CHUNK_SIZE):
+        state_id = _tombstone_state_at(tombstone, as_of)
+        counts[state_id] = counts.get(state_id, 0) - 1
+
+
+def _window_events(workflow_id: int, since: Optional[datetime], until: datetime) -> Iterator[tuple]:
+    events = AuditLog.objects.filter(STATE_EVENTS, entity__workflow_id=workflow_id, created_at__lte=until)
+    if since is not None:
+        events = events.filter(created_at__gt=since)
+    return (
+        events.order_by("entity_id", "created_at", "id")
+        .values_list("entity_id", "entity__created_at", "from_state_id", "to_state_id")
+        .iterator(chunk_size=REPLAY_CHUNK_SIZE)
+    )
+
+
+def fold_window(
+    workflow_id: int, counts: Dict[int, int], since: Optional[datetime], until: datetime
+) -> int:
+    """Move ``counts`` (as of ``since``; empty for the beginning) to ``until``.
+
+    Updates ``counts`` in place and returns the number of events folded.
+    """
+    folded = 0
+    for _, group in groupby(_window_events(workflow_id, since, until), key=itemgetter(0)):
+        first = last = next(group)
+        folded += 1
+        for last in group:
+            folded += 1
+        if since is not None and first[1] <= since:
+            # Existed at the checkpoint, in the state its first later event
+            # leaves (or sets, for a creation record written just after it).
+            before = first[2] or first[3]
+            counts[before] = counts.get(before, 0) - 1
+        counts[last[3]] = counts.get(last[3], 0) + 1
+
+    # Entities created in the window that did not move in it: their state is
+    # the one their next event leaves, or their current state.
+    window = _state_events().filter(entity_id=OuterRef("pk"), created_at__lte=until)
+    if since is not None:
+        window = window.filter(created_at__gt=since)
+    upcoming = _state_events().filter(entity_id=OuterRef("pk"), created_at__gt=until)
+    created = Entity.objects.filter(workflow_id=workflow_id, created_at__lte=until)
+    if since is not None:
+        created = created.filter(created_at__gt=since)
+    rows = (
+        created.annotate(
+            moved=Exists(window),
+            next_from=Subquery(upcoming.values("from_state_id")[:1]),
+            next_to=Subquery(upcoming.values("to_state_id")[:1]),
+        )
+        .filter(moved=False)
+        .values_list("next_from", "next_to", "current_state_id")
+        .iterator(chunk_size=REPLAY_CHUNK_SIZE)
+    )
+    for next_from, next_to, current_state_id in rows:
+        state_id = (next_from or next_to) if next_to is not None else current_state_id
+        counts[state_id] = counts.get(state_id, 0) + 1
+    return folded
+
+
+def workflow_counts_at(workflow_id: int, at: datetime) -> WorkflowSnapshot:
+    checkpoint = (
+        ReplayCheckpoint.objects.filter(workflow_id=workflow_id, as_of__lte=at)
+        .order_by("-as_of")
+        .values_list("as_of", "counts_json", "created_at")
+        .first()
+    )
+    since, counts = None, {}
+    if checkpoint is not None:
+        since = checkpoint[0]
+        counts = _load_counts(checkpoint[1])
+        discount_deleted(workflow_id, counts, since, checkpoint[2])
+    folded = fold_window(workflow_id, counts, since, at)
+    counts = {state_id: count for state_id, count in counts.items() if count}
+    return WorkflowSnapshot(workflow_id, at, counts, since, folded)
+
+
+def checkpoint_times(start: datetime, until: datetime, interval: timedelta) -> List[datetime]:
+    """Interval boundaries after ``start`` up to ``until``, aligned to the UTC epoch."""
+    epoch = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+    step = (start - epoch) // interval + 1
+    times = []
+    while epoch + step * interval <= until:
+        times.append(epoch + step * interval)
+        step += 1
+    return times
+
+
+def build_checkpoints(workflow: Workflow, interval: timedelta, now: Optional[datetime] = None) -> int:
+    """Write missing checkpoints up to ``now - CHECKPOINT_LAG``; returns how many.
+
+    Each checkpoint is folded from the previous one, so the audit log is
+    replayed once across a run.
+    """
+    until = (now or timezone.now()) - CHECKPOINT_LAG
+    latest = ReplayCheckpoint.objects.filter(workflow=workflow).order_by("-as_of").first()
+    if latest is not None:
+        since, counts = latest.as_of, _load_counts(latest.counts_json)
+        discount_deleted(workflow.id, counts, since, latest.created_at)
+    else:
+        since, counts = None, {}
+    written = 0
+    for as_of in checkpoint_times(since or workflow.created_at, until, interval):
+        folded = fold_window(workflow.id, counts, since, as_of)
+        ReplayCheckpoint.objects.create(
+            workflow=workflow, as_of=as_of, counts_json=_dump_counts(counts), events=folded
+        )
+        since = as_of
+        written += 1
+    return written
+
+
+def snapshot_data(snapshot: WorkflowSnapshot) -> dict:
+    names = dict(State.objects.filter(workflow_id=snapshot.workflow_id).values_list("id", "name"))
+    return {
+        "workflow": snapshot.workflow_id,
+        "at": snapshot.at,
+        "checkpoint": snapshot.checkpoint,
+        "replayed_events": snapshot.replayed_events,
+        "total": sum(snapshot.counts.values()),
+        # A None state is one deleted since; its events no longer name it.
+        "states": [
+            {"state": state_id, "name": names.get(state_id), "count": count}
+            for state_id, count in sorted(
+                snapshot.counts.items(), key=lambda item: (item[0] is None, item[0] or 0)
+            )
+        ],
+    }
@@ -1,64 +1,131 @@
-from typing import Any, Tuple
+import operator
+from typing import Callable, Tuple
 
-
-def _get_value(data: dict, field: str) -> Any:
-    return data.get(field)
+RuleCheck = Callable[[dict], Tuple[bool, str]]
 
 
 def evaluate_rule(condition_type: str, params: dict, data: dict) -> Tuple[bool, str]:
+    return compile_rule(condition_type, params)(data)
+
+
+def compile_rule(condition_type: str, params: dict) -> RuleCheck:
+    """Resolve a rule's parameters once and return a check over ``data_json``.
+
+    The returned callable gives exactly the same ``(passed, reason)`` as the
+    interpreted form did, without re-reading ``params`` or dispatching on
+    ``condition_type`` per call.
+    """
     field = params.get("field")
     value = params.get("value")
     values = params.get("values") or params.get("options")
     requires = params.get("requires")
 
     if condition_type == "field_present":
-        if not field:
-            return False, "Missing field parameter"
-        v = _get_value(data, field)
-        passed = v is not None and v != ""
-        return passed, f"{field} is required"
-
+        return _compile_present(field)
     if condition_type == "field_equals":
-        if not field:
-            return False, "Missing field parameter"
-        v = _get_value(data, field)
-        if requires:
-            if v == value:
-                req_val = _get_value(data, requires)
-                if not req_val:
-                    return False, f"{requires} is required when {field} is {value}"
+        return _compile_equals(field, value, requires)
+    if condition_type == "field_in":
+        return _compile_in(field, values)
+    if condition_type in _COMPARATORS:
+        return _compile_compare(condition_type, field, value)
+    return _constant(False, f"Unsupported condition type: {condition_type}")
+
+
+def _constant(passed: bool, reason: str) -> RuleCheck:
+    result = (passed, reason)
+
+    def check(data: dict) -> Tuple[bool, str]:
+        return result
+
+    return check
+
+
+def _compile_present(field) -> RuleCheck:
+    if not field:
+        return _constant(False, "Missing field parameter")
+    passed_result = (True, f"{field} is required")
+    failed_result = (False, f"{field} is required")
+
+    def check(data: dict) -> Tuple[bool, str]:
+        v = data.get(field)
+        return passed_result if v is not None and v != "" else failed_result
+
+    return check
+
+
+def _compile_equals(field, value, requires) -> RuleCheck:
+    if not field:
+        return _constant(False, "Missing field parameter")
+
+    if requires:
+        blocked = (False, f"{requires} is required when {field} is {value}")
+
+        def check_requires(data: dict) -> Tuple[bool, str]:
+            if data.get(field) == value and not data.get(requires):
+                return blocked
             return True, ""
-        if v != value:
-            return False, f"{field} must equal {value}"
-        return True, ""
 
-    if condition_type == "field_in":
-        if not field or not isinstance(values, list):
-            return False, "Missing field or values"
-        v = _get_value(data, field)
-        passed = v in values
-        return passed, f"{field} must be one of {values}"
-
-    if condition_type in {"field_gt", "field_gte", "field_lt", "field_lte"}:
-        if not field:
-            return False, "Missing field parameter"
-        v = _get_value(data, field)
+        return check_requires
+
+    blocked = (False, f"{field} must equal {value}")
+
+    def check(data: dict) -> Tuple[bool, str]:
+        return (True, "") if data.get(field) == value else blocked
+
+    return check
+
+
+def _compile_in(field, values) -> RuleCheck:
+    if not field or not isinstance(values, list):
+        return _constant(False, "Missing field or values")
+    reason = f"{field} must be one of {values}"
+    try:
+        lookup = frozenset(values)
+    except TypeError:
+        lookup = None
+
+    def check(data: dict) -> Tuple[bool, str]:
+        v = data.get(field)
+        if lookup is not None:
+            try:
+                return v in lookup, reason
+            except TypeError:
+                pass
+        return v in values, reason
+
+    return check
+
+
+_COMPARATORS = {
+    "field_gt": (operator.gt, ">"),
+    "field_gte": (operator.ge, ">="),
+    "field_lt": (operator.lt, "<"),
+    "field_lte": (operator.le, "<="),
+}
+
+
+def _compile_compare(condition_type: str, field, value) -> RuleCheck:
+    if not field:
+        return _constant(False, "Missing field parameter")
+    compare, symbol = _COMPARATORS[condition_type]
+    missing = (False, f"{field} is required")
+    not_number = (False, f"{field} must be a number")
+    blocked = (False, f"{field} must be {symbol} {value}")
+    try:
+        cmp_num = float(value)
+    except (TypeError, ValueError):
+        cmp_num = None
+
+    def check(data: dict) -> Tuple[bool, str]:
+        v = data.get(field)
         if v is None:
-            return False, f"{field} is required"
+            return missing
         try:
             v_num = float(v)
-            cmp_num = float(value)
         except (TypeError, ValueError):
-            return False, f"{field} must be a number"
-
-        if condition_type == "field_gt" and not (v_num > cmp_num):
-            return False, f"{field} must be > {value}"
-        if condition_type == "field_gte" and not (v_num >= cmp_num):
-            return False, f"{field} must be >= {value}"
-        if condition_type == "field_lt" and not (v_num < cmp_num):
-            return False, f"{field} must be < {value}"
-        if condition_type == "field_lte" and not (v_num <= cmp_num):
-            return False, f"{field} must be <= {value}"
-        return True, ""
-
-    return False, f"Unsupported condition type: {condition_type}"
+            return not_number
+        if cmp_num is None:
+            return not_number
+        return (True, "") if compare(v_num, cmp_num) else blocked
+
+    return check
@@ -0,0 +1,175 @@
+import math
+from decimal import Decimal, InvalidOperation
+from typing import Any, Callable, Dict, Tuple
+
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import SchemaField
+
+_TRUE = frozenset(["true", "1", "yes", "y", "on"])
+_FALSE = frozenset(["false", "0", "no", "n", "off"])
+# Numbers whose decimal exponent is past float range (about 1.8e308) are rejected.
+MAX_EXPONENT = 308
+
+
+class Invalid(Exception):
+    pass
+
+
+Coercer = Callable[[Any], Any]
+
+
+def _coerce_text(value):
+    if not isinstance(value, str):
+        raise Invalid("Must be text.")
+    return value
+
+
+def _coerce_number(value):
+    if isinstance(value, bool):
+        raise Invalid("Must be a number.")
+    if isinstance(value, float) and not math.isfinite(value):
+        raise Invalid("Must be a number.")
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        try:
+            number = Decimal(value.strip())
+        except InvalidOperation:
+            raise Invalid("Must be a number.")
+        # Bound the exponent before int()/to_integral_value(): "1e999999999"
+        # would otherwise build a billion-digit integer.
+        if not number.is_finite() or abs(number.adjusted()) > MAX_EXPONENT:
+            raise Invalid("Must be a number.")
+        return int(number) if number == number.to_integral_value() else float(number)
+    raise Invalid("Must be a number.")
+
+
+def _coerce_boolean(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str):
+        lowered = value.strip().lower()
+        if lowered in _TRUE:
+            return True
+        if lowered in _FALSE:
+            return False
+    raise Invalid("Must be a boolean.")
+
+
+def _coerce_date(value):
+    parsed = parse_date(value) if isinstance(value, str) else None
+    if parsed is None:
+        raise Invalid("Must be a date (YYYY-MM-DD).")
+    return parsed.isoformat()
+
+
+def _coerce_datetime(value):
+    try:
+        parsed = parse_datetime(value) if isinstance(value, str) else None
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise Invalid("Must be an ISO 8601 datetime.")
+    return parsed.isoformat()
+
+
+def _enum_coercer(options) -> Coercer:
+    options = list(options or [])
+    try:
+        lookup = frozenset(options)
+    except TypeError:
+        lookup = options
+    message = f"Must be one of {options}."
+
+    def coerce(value):
+        try:
+            if value in lookup:
+                return value
+        except TypeError:
+            pass
+        raise Invalid(message)
+
+    return coerce
+
+
+_COERCERS: Dict[str, Coercer] = {
+    SchemaField.FieldType.TEXT: _coerce_text,
+    SchemaField.FieldType.NUMBER: _coerce_number,
+    SchemaField.FieldType.BOOLEAN: _coerce_boolean,
+    SchemaField.FieldType.DATE: _coerce_date,
+    SchemaField.FieldType.DATETIME: _coerce_datetime,
+}
+
+
+def coerce_value(field_type: str, value):
+    """Coerce one value (e.g. from a query string) to its stored form.
+
+    Enum and unknown types pass through unchanged; raises ``Invalid``.
+    """
+    coerce = _COERCERS.get(field_type)
+    return value if coerce is None else coerce(value)
+
+
+class CompiledSchema:
+    """Validator for one ``SchemaVersion``'s ``data_json``.
+
+    Field types, required names and enum option sets are resolved once from
+    the ``SchemaField`` rows. Keys without a matching field pass through.
+    """
+
+    def __init__(self, fields):
+        self.required = tuple(field.name for field in fields if field.required)
+        self.coercers: Dict[str, Coercer] = {}
+        for field in fields:
+            if field.field_type == SchemaField.FieldType.ENUM:
+                self.coercers[field.name] = _enum_coercer((field.options_json or {}).get("options"))
+            else:
+                self.coercers[field.name] = _COERCERS.get(field.field_type, lambda value: value)
+
+    def validate(self, data: dict) -> Tuple[dict, Dict[str, str]]:
+        """Return ``(cleaned_data, errors)``; ``errors`` maps field name to message."""
+        if not isinstance(data, dict):
+            return {}, {"non_field_errors": "Must be an object."}
+        errors: Dict[str, str] = {}
+        for name in self.required:
+            value = data.get(name)
+            if value is None or value == "":
+                errors[name] = "This field is required."
+
+        cleaned = dict(data)
+        for name, value in data.items():
+            coerce = self.coercers.get(name)
+            if coerce is None or value is None or name in errors:
+                continue
+            if value == "" and name not in self.required:
+                continue
+            try:
+                cleaned[name] = coerce(value)
+            except Invalid as exc:
+                errors[name] = str(exc)
+        return cleaned, errors
+
+
+# schema version id -> (workflow definition revision, compiled schema).
+_schemas: Dict[int, Tuple[int, CompiledSchema]] = {}
+
+
+def get_compiled_schema(schema_version_id: int, revision: int) -> CompiledSchema:
+    """Return the cached validator for a schema version.
+
+    Keyed like rule programs: ``revision`` is the workflow's
+    ``definition_revision``, which schema field changes bump.
+    """
+    cached = _schemas.get(schema_version_id)
+    if cached is not None and cached[0] == revision:
+        return cached[1]
+    compiled = CompiledSchema(list(SchemaField.objects.filter(schema_version_id=schema_version_id)))
+    _schemas[schema_version_id] = (revision, compiled)
+    return compiled
+
+
+def clear_schemas() -> None:
+    _schemas.clear()
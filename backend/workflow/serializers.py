@@ -1,10 +1,14 @@
+from typing import Optional
+
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
 
 from .models import (
     AuditLog,
     Entity,
+    Job,
     Rule,
+    RuleStats,
     SchemaField,
     SchemaVersion,
     State,
@@ -12,13 +16,26 @@ from .models import (
     UserProfile,
     Workflow,
 )
+from .bulk import LOCK_MODES, LOCK_WAIT
+from .importing import FORMATS, guess_format
+from .jobs import progress
+from .schema import get_compiled_schema
+from .simulation import MAX_EXAMPLES, MAX_SAMPLE_SIZE
+
+
+def validate_entity_data(schema_version_id: int, revision: int, data):
+    """Validate and coerce ``data_json`` against its compiled schema version."""
+    cleaned, errors = get_compiled_schema(schema_version_id, revision).validate(data)
+    if errors:
+        raise serializers.ValidationError({"data_json": errors})
+    return cleaned
 
 
 class WorkflowSerializer(serializers.ModelSerializer):
     class Meta:
         model = Workflow
-        fields = ["id", "name", "is_active", "created_at", "updated_at"]
-        read_only_fields = ["created_at", "updated_at"]
+        fields = ["id", "name", "is_active", "definition_revision", "created_at", "updated_at"]
+        read_only_fields = ["definition_revision", "created_at", "updated_at"]
 
 
 class StateSerializer(serializers.ModelSerializer):
@@ -30,7 +47,30 @@ class StateSerializer(serializers.ModelSerializer):
 class TransitionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Transition
-        fields = ["id", "workflow", "name", "from_state", "to_state", "order_index"]
+        fields = [
+            "id",
+            "workflow",
+            "name",
+            "from_state",
+            "to_state",
+            "order_index",
+            "rules_order_independent",
+        ]
+
+
+class RuleStatsSerializer(serializers.ModelSerializer):
+    failure_rate = serializers.SerializerMethodField()
+    mean_cost_us = serializers.SerializerMethodField()
+
+    class Meta:
+        model = RuleStats
+        fields = ["evaluations", "failures", "failure_rate", "mean_cost_us", "updated_at"]
+
+    def get_failure_rate(self, obj) -> Optional[float]:
+        return round(obj.failures / obj.evaluations, 4) if obj.evaluations else None
+
+    def get_mean_cost_us(self, obj) -> Optional[float]:
+        return round(obj.total_ns / obj.evaluations / 1000, 3) if obj.evaluations else None
 
 
 class RuleSerializer(serializers.ModelSerializer):
@@ -63,6 +103,7 @@ class SchemaFieldSerializer(serializers.ModelSerializer):
             "name",
             "field_type",
             "required",
+            "indexed",
             "options_json",
         ]
 
@@ -78,10 +119,86 @@ class EntitySerializer(serializers.ModelSerializer):
             "parent",
             "data_json",
             "created_by",
+            "version",
             "created_at",
             "updated_at",
         ]
-        read_only_fields = ["created_at", "updated_at"]
+        read_only_fields = ["version", "created_at", "updated_at"]
+
+    def validate(self, attrs):
+        instance = self.instance
+        if not {"workflow", "schema_version", "data_json"} & attrs.keys():
+            return attrs
+        workflow = attrs.get("workflow") or instance.workflow
+        schema_version = attrs.get("schema_version") or instance.schema_version
+        if schema_version.workflow_id != workflow.id:
+            raise serializers.ValidationError(
+                {"schema_version": "Schema version belongs to a different workflow."}
+            )
+        if "data_json" in attrs or "schema_version" in attrs:
+            data = attrs["data_json"] if "data_json" in attrs else getattr(instance, "data_json", {})
+            attrs["data_json"] = validate_entity_data(schema_version.id, workflow.definition_revision, data)
+        return attrs
+
+
+class BulkTransitionSerializer(serializers.Serializer):
+    transition = serializers.PrimaryKeyRelatedField(
+        queryset=Transition.objects.select_related("workflow")
+    )
+    entities = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), required=False, allow_empty=False
+    )
+    filter = serializers.DictField(required=False)
+    lock = serializers.ChoiceField(choices=LOCK_MODES, default=LOCK_WAIT)
+    background = serializers.BooleanField(default=False)
+
+    def validate(self, attrs):
+        if ("entities" in attrs) == ("filter" in attrs):
+            raise serializers.ValidationError("Provide exactly one of entities or filter.")
+        return attrs
+
+
+class EntityImportSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    workflow = serializers.PrimaryKeyRelatedField(queryset=Workflow.objects.all())
+    schema_version = serializers.PrimaryKeyRelatedField(
+        queryset=SchemaVersion.objects.all(), required=False
+    )
+    format = serializers.ChoiceField(choices=FORMATS, required=False)
+    mapping = serializers.JSONField(required=False)
+
+    def validate_mapping(self, value):
+        if not isinstance(value, dict) or not all(
+            isinstance(k, str) and isinstance(v, str) for k, v in value.items()
+        ):
+            raise serializers.ValidationError("Must map column names to field names.")
+        return value
+
+    def validate(self, attrs):
+        if "format" not in attrs:
+            attrs["format"] = guess_format(attrs["file"].name)
+            if attrs["format"] is None:
+                raise serializers.ValidationError({"format": "Cannot infer format; pass csv or ndjson."})
+        return attrs
+
+
+class DraftRuleSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=255)
+    condition_type = serializers.ChoiceField(choices=Rule.ConditionType.choices)
+    params_json = serializers.DictField(required=False, default=dict)
+    eval_order = serializers.IntegerField(min_value=0, default=0)
+
+
+class RuleSimulationSerializer(serializers.Serializer):
+    rules = DraftRuleSerializer(many=True, allow_empty=True)
+    sample = serializers.IntegerField(min_value=1, max_value=MAX_SAMPLE_SIZE, required=False)
+    after = serializers.IntegerField(min_value=0, default=0)
+    examples = serializers.IntegerField(min_value=0, max_value=MAX_EXAMPLES, default=5)
+
+    def validate(self, attrs):
+        if attrs.get("sample") and attrs["after"]:
+            raise serializers.ValidationError({"after": "Only full-population runs can be resumed."})
+        return attrs
 
 
 class AuditLogSerializer(serializers.ModelSerializer):
@@ -112,3 +229,27 @@ class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = get_user_model()
         fields = ["id", "username", "email"]
+
+
+class JobSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = [
+            "id",
+            "kind",
+            "status",
+            "params_json",
+            "progress",
+            "result_json",
+            "error",
+            "created_by",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+        read_only_fields = fields
+
+    def get_progress(self, obj):
+        return progress(obj)
@@ -0,0 +1,168 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .counters import adjust_state_counts, move_state_count
+from .models import (
+    Entity,
+    Rule,
+    SchemaField,
+    SchemaVersion,
+    State,
+    StateCounter,
+    Transition,
+    UserProfile,
+    Workflow,
+)
+from .eligibility import ELIGIBILITY_REFRESH_ON_CHANGE, clear_dependency_indexes
+from .graph import clear_graphs
+from .jobs import enqueue_eligibility_refresh
+from .permissions import invalidate_role
+from .programs import clear_programs
+from .replay import record_deletion
+from .rule_stats import clear_rule_orders
+from .schema import clear_schemas
+
+
+def bump_definition_revision(workflow_id) -> None:
+    """Mark a workflow's definition as changed so compiled caches rebuild.
+
+    Other processes notice through the bumped revision; this process also
+    drops its compiled caches right away. Once the change commits, a job is
+    queued to recompute the workflow's eligibility bits.
+    """
+    Workflow.objects.filter(pk=workflow_id).update(
+        definition_revision=F("definition_revision") + 1
+    )
+    clear_programs()
+    clear_schemas()
+    clear_graphs()
+    clear_dependency_indexes()
+    clear_rule_orders()
+    if ELIGIBILITY_REFRESH_ON_CHANGE:
+        transaction.on_commit(lambda: enqueue_eligibility_refresh(workflow_id))
+
+
+@receiver(post_save, sender=Transition)
+@receiver(post_delete, sender=Transition)
+def transition_changed(sender, instance, **kwargs):
+    bump_definition_revision(instance.workflow_id)
+
+
+def _transition_workflow(transition_id):
+    return Transition.objects.filter(pk=transition_id).values_list("workflow_id", flat=True).first()
+
+
+def _schema_version_workflow(schema_version_id):
+    return SchemaVersion.objects.filter(pk=schema_version_id).values_list("workflow_id", flat=True).first()
+
+
+@receiver(post_save, sender=Rule)
+@receiver(post_delete, sender=Rule)
+def rule_changed(sender, instance, **kwargs):
+    workflow_id = _transition_workflow(instance.transition_id)
+    if workflow_id is not None:
+        bump_definition_revision(workflow_id)
+
+
+@receiver(post_save, sender=SchemaVersion)
+@receiver(post_delete, sender=SchemaVersion)
+def schema_version_changed(sender, instance, **kwargs):
+    bump_definition_revision(instance.workflow_id)
+
+
+@receiver(post_save, sender=SchemaField)
+@receiver(post_delete, sender=SchemaField)
+def schema_field_changed(sender, instance, **kwargs):
+    workflow_id = _schema_version_workflow(instance.schema_version_id)
+    if workflow_id is not None:
+        bump_definition_revision(workflow_id)
+
+
+@receiver(post_save, sender=State)
+@receiver(post_save, sender=Transition)
+@receiver(post_save, sender=Rule)
+@receiver(post_save, sender=SchemaVersion)
+@receiver(post_save, sender=SchemaField)
+def definition_moved(sender, instance, created, **kwargs):
+    """Bump the workflow a definition row was moved away from as well."""
+    previous = getattr(instance, "_loaded_owner_id", None)
+    instance._loaded_owner_id = getattr(instance, sender.owner_field)
+    if created or previous is None or previous == instance._loaded_owner_id:
+        return
+    if sender is Rule:
+        previous = _transition_workflow(previous)
+    elif sender is SchemaField:
+        previous = _schema_version_workflow(previous)
+    if previous is not None:
+        bump_definition_revision(previous)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def user_profile_changed(sender, instance, **kwargs):
+    # Invalidate again after commit: a concurrent request can re-cache the
+    # old role between the first invalidation and the commit.
+    user_id = instance.user_id
+    invalidate_role(user_id)
+    transaction.on_commit(lambda: invalidate_role(user_id))
+
+
+@receiver(post_save, sender=State)
+def state_saved(sender, instance, created, **kwargs):
+    if created:
+        StateCounter.objects.get_or_create(
+            state_id=instance.pk, defaults={"workflow_id": instance.workflow_id}
+        )
+    bump_definition_revision(instance.workflow_id)
+
+
+@receiver(post_delete, sender=State)
+def state_deleted(sender, instance, **kwargs):
+    bump_definition_revision(instance.workflow_id)
+
+
+# Fields whose change can alter which transitions an entity is eligible for.
+ELIGIBILITY_INPUTS = {"workflow", "workflow_id", "current_state", "current_state_id", "data_json"}
+
+
+@receiver(pre_save, sender=Entity)
+def entity_saving(sender, instance, update_fields=None, **kwargs):
+    """Mark eligibility bits unknown on saves that did not compute them.
+
+    The entity API computes the bits and sets ``_eligibility_current``; any
+    other save of an existing row (admin, scripts) could change the
+    entity's data or state without updating them.
+    """
+    if instance._state.adding or getattr(instance, "_eligibility_current", False):
+        return
+    if update_fields is not None and not ELIGIBILITY_INPUTS & set(update_fields):
+        return
+    instance.eligible_transitions = None
+    instance.eligibility_revision = None
+    if update_fields is not None:
+        Entity.objects.filter(pk=instance.pk).update(eligible_transitions=None, eligibility_revision=None)
+
+
+@receiver(post_save, sender=Entity)
+def entity_saved(sender, instance, created, **kwargs):
+    if created:
+        adjust_state_counts(instance.workflow_id, {instance.current_state_id: 1})
+    else:
+        previous = getattr(instance, "_loaded_state_id", None)
+        if previous is not None:
+            move_state_count(instance.workflow_id, previous, instance.current_state_id)
+    instance._loaded_state_id = instance.current_state_id
+    instance._eligibility_current = False
+
+
+@receiver(pre_delete, sender=Entity)
+def entity_deleting(sender, instance, **kwargs):
+    # Before the delete cascades to the entity's audit rows.
+    record_deletion(instance)
+
+
+@receiver(post_delete, sender=Entity)
+def entity_deleted(sender, instance, **kwargs):
+    adjust_state_counts(instance.workflow_id, {instance.current_state_id: -1})
@@ -0,0 +1,41 @@
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .profiling import DUPLICATE_THRESHOLD, fingerprint
+
+
+class QueryBudgetMixin:
+    """TestCase mixin enforcing a view's declared ``query_budgets``.
+
+    Views declare ``query_budgets = {"list": 2, ...}`` per action; wrap the
+    request in ``assertWithinQueryBudget(ViewSet, "list")`` to fail the test
+    when the action issues more queries than that. The failure lists every
+    query and flags repeated statement shapes, which usually point at N+1.
+    """
+
+    @contextmanager
+    def assertWithinQueryBudget(self, view_class, action):
+        budgets = getattr(view_class, "query_budgets", {})
+        if action not in budgets:
+            self.fail(f"{view_class.__name__} declares no query budget for {action!r}")
+        budget = budgets[action]
+        with CaptureQueriesContext(connection) as captured:
+            yield captured
+        if len(captured) <= budget:
+            return
+
+        shapes = {}
+        for query in captured.captured_queries:
+            key = fingerprint(query["sql"])
+            shapes[key] = shapes.get(key, 0) + 1
+        lines = []
+        for index, query in enumerate(captured.captured_queries, start=1):
+            repeated = shapes[fingerprint(query["sql"])]
+            marker = f" [x{repeated}]" if repeated >= DUPLICATE_THRESHOLD else ""
+            lines.append(f"{index}.{marker} {query['sql']}")
+        self.fail(
+            f"{view_class.__name__}.{action} issued {len(captured)} queries, budget is {budget}:\n"
+            + "\n".join(lines)
+        )
@@ -1,13 +1,26 @@
+from io import StringIO
+from unittest import mock
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import F
 from django.urls import reverse
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.test import APIClient, APITestCase
 
+from workflow.batch import evaluate_batch
+from workflow.bulk import LOCK_SKIP_LOCKED, transition_entities
 from workflow.models import AuditLog, Entity, Rule, SchemaField, SchemaVersion, State, Transition, Workflow
-from workflow.models import UserProfile
+from workflow.models import StateCounter, UserProfile
+from workflow.profiling import query_stats
+from workflow.programs import get_transition_program
+from workflow.schema import get_compiled_schema
+from workflow.testing import QueryBudgetMixin
+from workflow.views import AuditLogViewSet, EntityViewSet
 
 
-class WorkflowAPITests(APITestCase):
+class WorkflowAPITests(QueryBudgetMixin, APITestCase):
     def setUp(self):
         User = get_user_model()
         self.user = User.objects.create_user(username="tester", password="testpass")
@@ -154,6 +167,62 @@ class WorkflowAPITests(APITestCase):
         resp_ok = self.client.post(url, {"transition": self.transition_complete.id}, format="json")
         self.assertEqual(resp_ok.status_code, status.HTTP_200_OK)
 
+    def test_transition_conflicts_when_entity_changes_after_read(self):
+        entity = Entity.objects.create(
+            workflow=self.workflow,
+            current_state=self.state_new,
+            schema_version=self.schema_version,
+            data_json={"requester": "Sam"},
+        )
+
+        def concurrent_edit(*args):
+            # Another request edits the entity between read and write.
+            Entity.objects.filter(pk=entity.pk).update(version=F("version") + 1)
+            return get_transition_program(*args)
+
+        url = reverse("entity-transition", kwargs={"pk": entity.id})
+        with mock.patch("workflow.views.get_transition_program", side_effect=concurrent_edit):
+            resp = self.client.post(url, {"transition": self.transition_submit.id}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_409_CONFLICT)
+        entity.refresh_from_db()
+        self.assertEqual(entity.current_state_id, self.state_new.id)
+        self.assertFalse(AuditLog.objects.filter(entity=entity).exists())
+
+        resp = self.client.post(url, {"transition": self.transition_submit.id}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data["version"], 2)
+        self.assertEqual(StateCounter.objects.get(state=self.state_review).count, 1)
+
+    def test_bulk_transition_reports_conflicts(self):
+        entity = Entity.objects.create(
+            workflow=self.workflow,
+            current_state=self.state_new,
+            schema_version=self.schema_version,
+            data_json={"requester": "Sam"},
+        )
+
+        def concurrent_edit(program, payloads):
+            Entity.objects.filter(pk=entity.pk).update(version=F("version") + 1)
+            return evaluate_batch(program, payloads)
+
+        with mock.patch("workflow.bulk.evaluate_batch", side_effect=concurrent_edit):
+            report = transition_entities(
+                self.transition_submit, entity_ids=[entity.id], lock=LOCK_SKIP_LOCKED
+            )
+        self.assertEqual(report["counts"]["conflict"], 1)
+        entity.refresh_from_db()
+        self.assertEqual(entity.current_state_id, self.state_new.id)
+
+        def concurrent_delete(program, payloads):
+            Entity.objects.filter(pk=entity.pk).delete()
+            return evaluate_batch(program, payloads)
+
+        with mock.patch("workflow.bulk.evaluate_batch", side_effect=concurrent_delete):
+            report = transition_entities(
+                self.transition_submit, entity_ids=[entity.id], lock=LOCK_SKIP_LOCKED
+            )
+        self.assertEqual((report["counts"]["not_found"], report["counts"]["locked"]), (1, 0))
+
     def test_transition_mismatch_state(self):
         entity = Entity.objects.create(
             workflow=self.workflow,
@@ -168,3 +237,334 @@ class WorkflowAPITests(APITestCase):
 
         self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(resp.data.get("detail"), "Transition does not match entity state.")
+
+    def test_bulk_transition_by_ids(self):
+        ready = Entity.objects.create(
+            workflow=self.workflow,
+            current_state=self.state_new,
+            schema_version=self.schema_version,
+            data_json={"requester": "Sam"},
+        )
+        blocked = Entity.objects.create(
+            workflow=self.workflow,
+            current_state=self.state_new,
+            schema_version=self.schema_version,
+            data_json={},
+        )
+        elsewhere = Entity.objects.create(
+            workflow=self.workflow,
+            current_state=self.state_review,
+            schema_version=self.schema_version,
+            data_json={"requester": "Sam"},
+        )
+
+        url = reverse("entity-bulk-transition")
+        resp = self.client.post(
+            url,
+            {
+                "transition": self.transition_submit.id,
+                "entities": [ready.id, blocked.id, elsewhere.id, 999999],
+            },
+            format="json",
+        )
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            resp.data["counts"],
+            {
+                "moved": 1,
+                "blocked": 1,
+                "invalid_state": 1,
+                "not_found": 1,
+                "conflict": 0,
+                "locked": 0,
+            },
+        )
+        outcomes = {row["id"]: row["outcome"] for row in resp.data["results"]}
+        self.assertEqual(outcomes[ready.id], "moved")
+        self.assertEqual(outcomes[blocked.id], "blocked")
+        self.assertEqual(outcomes[elsewhere.id], "invalid_state")
+        self.assertEqual(outcomes[999999], "not_found")
+
+        ready.refresh_from_db()
+        blocked.refresh_from_db()
+        self.assertEqual(ready.current_state_id, self.state_review.id)
+        self.assertEqual(blocked.current_state_id, self.state_new.id)
+        self.assertTrue(
+            AuditLog.objects.filter(entity=ready, action_type="state_change").exists()
+        )
+        self.assertTrue(
+            AuditLog.objects.filter(entity=blocked, action_type="rule_block").exists()
+        )
+
+    def test_bulk_transition_by_filter(self):
+        for requester in ["A", "B", "C"]:
+            Entity.objects.create(
+                workflow=self.workflow,
+                current_state=self.state_new,
+                schema_version=self.schema_version,
+                data_json={"requester": requester},
+            )
+
+        url = reverse("entity-bulk-transition")
+        resp = self.client.post(
+            url,
+            {"transition": self.transition_submit.id, "filter": {"workflow": self.workflow.id}},
+            format="json",
+        )
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data["counts"]["moved"], 3)
+        self.assertEqual(
+            Entity.objects.filter(current_state=self.state_review).count(), 3
+        )
+
+        resp = self.client.post(url, {"transition": self.transition_submit.id}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def _state_counts(self):
+        url = reverse("workflow-state-counts", kwargs={"pk": self.workflow.id})
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        return {row["name"]: row["count"] for row in resp.data}
+
+    def test_state_counts_follow_entity_lifecycle(self):
+        resp = self.client.post(
+            reverse("entity-list"),
+            {
+                "workflow": self.workflow.id,
+                "current_state": self.state_new.id,
+                "schema_version": self.schema_version.id,
+                "data_json": {"requester": "Sam"},
+            },
+            format="json",
+        )
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        entity_id = resp.data["id"]
+        self.assertEqual(self._state_counts(), {"New": 1, "Review": 0, "Done": 0})
+
+        url = reverse("entity-transition", kwargs={"pk": entity_id})
+        self.client.post(url, {"transition": self.transition_submit.id}, format="json")
+        self.assertEqual(self._state_counts(), {"New": 0, "Review": 1, "Done": 0})
+
+        Entity.objects.get(pk=entity_id).delete()
+        self.assertEqual(self._state_counts(), {"New": 0, "Review": 0, "Done": 0})
+
+    def test_rebuild_state_counters(self):
+        for _ in range(2):
+            Entity.objects.create(
+                workflow=self.workflow,
+                current_state=self.state_new,
+                schema_version=self.schema_version,
+                data_json={"requester": "Sam"},
+            )
+        StateCounter.objects.filter(workflow=self.workflow).update(count=42)
+
+        call_command("rebuild_state_counters", "--workflow", str(self.workflow.id), stdout=StringIO())
+
+        self.assertEqual(self._state_counts(), {"New": 2, "Review": 0, "Done": 0})
+
+    def test_entity_data_validated_against_schema(self):
+        url = reverse("entity-list")
+        payload = {
+            "workflow": self.workflow.id,
+            "current_state": self.state_new.id,
+            "schema_version": self.schema_version.id,
+        }
+
+        resp = self.client.post(
+            url, {**payload, "data_json": {"priority": "Urgent", "manager_approval": "maybe"}}, format="json"
+        )
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            set(resp.data["data_json"]), {"requester", "priority", "manager_approval"}
+        )
+
+        resp = self.client.post(
+            url,
+            {**payload, "data_json": {"requester": "Sam", "priority": "High", "manager_approval": "true"}},
+            format="json",
+        )
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertIs(resp.data["data_json"]["manager_approval"], True)
+
+        # Moving an entity to another workflow keeps its schema version in check.
+        other = Workflow.objects.create(name="Other")
+        resp = self.client.patch(
+            reverse("entity-detail", args=[resp.data["id"]]), {"workflow": other.id}, format="json"
+        )
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(list(resp.data), ["schema_version"])
+
+    def test_schema_validator_cached_until_fields_change(self):
+        self.workflow.refresh_from_db()
+        revision = self.workflow.definition_revision
+        compiled = get_compiled_schema(self.schema_version.id, revision)
+        with self.assertNumQueries(0):
+            self.assertIs(get_compiled_schema(self.schema_version.id, revision), compiled)
+
+        SchemaField.objects.create(
+            schema_version=self.schema_version, name="amount", field_type="number", required=True
+        )
+        self.workflow.refresh_from_db()
+        compiled = get_compiled_schema(self.schema_version.id, self.workflow.definition_revision)
+        cleaned, errors = compiled.validate({"requester": "Sam", "amount": "12.5"})
+        self.assertEqual(errors, {})
+        self.assertEqual(cleaned["amount"], 12.5)
+
+        for huge in ("1e999999999", "-1e-999999999", float("inf")):
+            _, errors = compiled.validate({"requester": "Sam", "amount": huge})
+            self.assertEqual(errors, {"amount": "Must be a number."})
+        cleaned, errors = compiled.validate({"requester": "Sam", "amount": "1e308"})
+        self.assertEqual((errors, cleaned["amount"]), ({}, 10**308))
+
+    def test_available_transitions_follow_entity_state(self):
+        entity = Entity.objects.create(
+            workflow=self.workflow,
+            current_state=self.state_new,
+            schema_version=self.schema_version,
+            data_json={"requester": "Sam"},
+        )
+        url = reverse("entity-available-transitions", kwargs={"pk": entity.id})
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual([edge["id"] for edge in resp.data], [self.transition_submit.id])
+        self.assertEqual(resp.data[0]["to_state_name"], "Review")
+        self.assertTrue(resp.data[0]["allowed"])
+        self.assertIsNone(resp.data[0]["blocked_by"])
+
+        # A new transition bumps the revision, so the cached graph is rebuilt.
+        reject = Transition.objects.create(
+            workflow=self.workflow, name="Reject", from_state=self.state_new, to_state=self.state_done
+        )
+        resp = self.client.get(url)
+        self.assertEqual(
+            [edge["id"] for edge in resp.data], [self.transition_submit.id, reject.id]
+        )
+
+    def test_batch_available_transitions_report_rule_outcomes(self):
+        ready = Entity.objects.create(
+            workflow=self.workflow,
+            current_state=self.state_review,
+            schema_version=self.schema_version,
+            data_json={"requester": "Sam", "priority": "High", "manager_approval": True},
+        )
+        pending = Entity.objects.create(
+            workflow=self.workflow,
+            current_state=self.state_review,
+            schema_version=self.schema_version,
+            data_json={"requester": "Sam", "priority": "High"},
+        )
+        done = Entity.objects.create(
+            workflow=self.workflow,
+            current_state=self.state_done,
+            schema_version=self.schema_version,
+            data_json={"requester": "Sam"},
+        )
+        audit_rows = AuditLog.objects.count()
+
+        with self.assertWithinQueryBudget(EntityViewSet, "batch_available_transitions"):
+            resp = self.client.get(
+                reverse("entity-batch-available-transitions"),
+                {"ids": f"{ready.id},{pending.id},{done.id},999999"},
+            )
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        results = {item["entity"]: item["transitions"] for item in resp.data["results"]}
+        self.assertTrue(results[ready.id][0]["allowed"])
+        self.assertFalse(results[pending.id][0]["allowed"])
+        self.assertEqual(
+            results[pending.id][0]["blocked_by"]["name"], "Require manager approval for High priority"
+        )
+        self.assertEqual(results[done.id], [])
+        self.assertEqual(resp.data["not_found"], [999999])
+        # Pre-evaluation never writes rule_block audit rows.
+        self.assertEqual(AuditLog.objects.count(), audit_rows)
+
+        resp = self.client.get(reverse("entity-batch-available-transitions"), {"ids": "a,b"})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_shortest_path_and_graph_analysis(self):
+        orphan = State.objects.create(workflow=self.workflow, name="Orphan", order_index=3)
+        url = reverse("workflow-shortest-path", kwargs={"pk": self.workflow.id})
+
+        resp = self.client.get(url, {"from_state": self.state_new.id, "to_state": self.state_done.id})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data["length"], 2)
+        self.assertEqual(
+            [edge["id"] for edge in resp.data["transitions"]],
+            [self.transition_submit.id, self.transition_complete.id],
+        )
+
+        resp = self.client.get(url, {"from_state": self.state_done.id, "to_state": self.state_new.id})
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+        resp = self.client.get(url, {"from_state": self.state_new.id})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+        resp = self.client.get(reverse("workflow-graph-analysis", kwargs={"pk": self.workflow.id}))
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual([s["id"] for s in resp.data["initial_states"]], [self.state_new.id])
+        self.assertEqual([s["id"] for s in resp.data["unreachable_states"]], [orphan.id])
+        self.assertEqual(
+            [s["id"] for s in resp.data["dead_end_states"]], [self.state_done.id, orphan.id]
+        )
+
+    def test_entity_endpoints_within_query_budget(self):
+        entity = Entity.objects.create(
+            workflow=self.workflow,
+            current_state=self.state_new,
+            schema_version=self.schema_version,
+            data_json={"requester": "Sam"},
+        )
+        AuditLog.objects.create(entity=entity, action_type="system")
+        for _ in range(3):
+            Entity.objects.create(
+                workflow=self.workflow,
+                current_state=self.state_new,
+                schema_version=self.schema_version,
+                parent=entity,
+                data_json={"requester": "Sam"},
+            )
+
+        with self.assertWithinQueryBudget(EntityViewSet, "list"):
+            self.client.get(reverse("entity-list"))
+        cache.clear()
+        with self.assertWithinQueryBudget(EntityViewSet, "retrieve"):
+            self.client.get(reverse("entity-detail", kwargs={"pk": entity.id}))
+        cache.clear()
+        with self.assertWithinQueryBudget(EntityViewSet, "partial_update"):
+            self.client.patch(
+                reverse("entity-detail", kwargs={"pk": entity.id}),
+                {"data_json": {"requester": "Alex"}},
+                format="json",
+            )
+        cache.clear()
+        with self.assertWithinQueryBudget(EntityViewSet, "available_transitions"):
+            self.client.get(reverse("entity-available-transitions", kwargs={"pk": entity.id}))
+        cache.clear()
+        with self.assertWithinQueryBudget(EntityViewSet, "transition"):
+            resp = self.client.post(
+                reverse("entity-transition", kwargs={"pk": entity.id}),
+                {"transition": self.transition_submit.id},
+                format="json",
+            )
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        cache.clear()
+        with self.assertWithinQueryBudget(AuditLogViewSet, "list"):
+            self.client.get(reverse("auditlog-list"))
+
+    def test_query_stats_endpoint_and_debug_headers(self):
+        UserProfile.objects.filter(user=self.user).update(role="admin")
+        cache.clear()
+        query_stats.reset()
+        # Middleware is loaded on a client's first request, so use a fresh
+        # client while profiling is switched on.
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with self.settings(DEBUG=True, WORKFLOW_QUERY_PROFILING=True):
+            resp = client.get(reverse("entity-list"))
+            self.assertEqual(resp["X-Query-Count"], "2")
+
+            resp = client.get(reverse("query-stats"))
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data["EntityViewSet.list"]["requests"], 1)
+        self.assertEqual(resp.data["EntityViewSet.list"]["queries_max"], 2)
@@ -0,0 +1,162 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from workflow.analytics import rebuild_rollups, update_rollups
+from workflow.models import (
+    AnalyticsWatermark,
+    AuditLog,
+    DurationRollup,
+    Entity,
+    SchemaVersion,
+    State,
+    Transition,
+    TransitionRollup,
+    UserProfile,
+    Workflow,
+)
+
+T0 = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def hours(n):
+    return T0 + timedelta(hours=n)
+
+
+class AnalyticsRollupTests(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="manager", password="x")
+        UserProfile.objects.create(user=self.user, role="viewer")
+        self.client.force_authenticate(self.user)
+        self.workflow = Workflow.objects.create(name="Cycle")
+        sv = SchemaVersion.objects.create(workflow=self.workflow, version=1)
+        self.a = State.objects.create(workflow=self.workflow, name="A", is_initial=True)
+        self.b = State.objects.create(workflow=self.workflow, name="B", order_index=1)
+        self.c = State.objects.create(workflow=self.workflow, name="C", order_index=2)
+        Transition.objects.create(workflow=self.workflow, name="start", from_state=self.a, to_state=self.b)
+        Transition.objects.create(workflow=self.workflow, name="finish", from_state=self.b, to_state=self.c)
+
+        def entity(created):
+            obj = Entity.objects.create(
+                workflow=self.workflow, current_state=self.c, schema_version=sv, data_json={}
+            )
+            Entity.objects.filter(pk=obj.pk).update(created_at=created)
+            return obj
+
+        def move(obj, at, from_state, to_state):
+            AuditLog.objects.create(
+                entity=obj, action_type="state_change", from_state=from_state, to_state=to_state, created_at=at
+            )
+
+        # e1: 2h in A, 1h in B; e2: 1h in A, 4h in B (finishing the next day).
+        e1, e2 = entity(hours(0)), entity(hours(21))
+        move(e1, hours(2), self.a, self.b)
+        move(e1, hours(3), self.b, self.c)
+        AuditLog.objects.create(
+            entity=e1, action_type="rule_block", from_state=self.c, to_state=self.a, created_at=hours(4)
+        )
+        move(e2, hours(22), self.a, self.b)
+        move(e2, hours(26), self.b, self.c)
+
+    def test_incremental_update_matches_rebuild(self):
+        # Rows inside the lag window stay behind the watermark.
+        self.assertEqual(update_rollups(now=hours(22)), 2)
+        folded_until = AnalyticsWatermark.objects.get().folded_until
+        self.assertEqual(update_rollups(now=hours(22)), 0)
+        self.assertEqual(
+            TransitionRollup.objects.filter(granularity="day", from_state=self.a).get().count, 1
+        )
+
+        update_rollups(now=hours(48))
+        self.assertGreater(AnalyticsWatermark.objects.get().folded_until, folded_until)
+        self.assertEqual(
+            TransitionRollup.objects.filter(granularity="day", from_state=self.a).get().count, 2
+        )
+        hour_total = sum(TransitionRollup.objects.filter(granularity="hour").values_list("count", flat=True))
+        self.assertEqual(hour_total, 4)
+        lead = DurationRollup.objects.filter(kind="lead_time", granularity="day").order_by("bucket_start")
+        self.assertEqual(
+            [(row.state_id, row.total_seconds) for row in lead],
+            [(self.c.id, 3 * 3600.0), (self.c.id, 5 * 3600.0)],
+        )
+
+        def snapshot():
+            return sorted(
+                DurationRollup.objects.values_list(
+                    "kind", "granularity", "bucket_start", "state_id", "count", "total_seconds", "histogram_json"
+                )
+            )
+
+        before = snapshot()
+        rebuild_rollups(self.workflow.id)
+        self.assertEqual(snapshot(), before)
+        rebuild_rollups()
+        self.assertEqual(snapshot(), before)
+
+    def test_rows_committed_after_a_run_are_folded_by_the_next(self):
+        update_rollups(now=hours(24))
+        # A buffered row recorded before the last cutoff but inserted after
+        # the run, with an id below rows already folded.
+        late = AuditLog.objects.get(action_type="rule_block")
+        late_id = late.id
+        late.delete()
+        entity = Entity.objects.create(
+            workflow=self.workflow, current_state=self.b, schema_version=SchemaVersion.objects.get(), data_json={}
+        )
+        AuditLog.objects.create(
+            id=late_id,
+            entity=entity,
+            action_type="state_change",
+            from_state=self.a,
+            to_state=self.b,
+            created_at=hours(24) - timedelta(minutes=8),
+        )
+        self.assertLess(late_id, AuditLog.objects.filter(created_at=hours(22)).get().id)
+
+        update_rollups(now=hours(48))
+        moves = TransitionRollup.objects.filter(from_state=self.a)
+        self.assertEqual(sum(row.count for row in moves.filter(granularity="hour")), 3)
+        self.assertEqual(sum(row.count for row in moves.filter(granularity="day")), 3)
+
+        def snapshot():
+            return sorted(TransitionRollup.objects.values_list("granularity", "bucket_start", "from_state_id", "count"))
+
+        before = snapshot()
+        update_rollups(now=hours(48))
+        self.assertEqual(snapshot(), before)
+        rebuild_rollups()
+        self.assertEqual(snapshot(), before)
+
+    def test_analytics_endpoint(self):
+        update_rollups(now=hours(48))
+        url = reverse("workflow-analytics", args=[self.workflow.id])
+        response = self.client.get(url, {"since": hours(0).isoformat(), "until": hours(48).isoformat()})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["granularity"], "hour")
+        time_in_b = {row["name"]: row for row in response.data["time_in_state"]}["B"]
+        self.assertEqual(time_in_b["count"], 2)
+        self.assertEqual(time_in_b["mean_seconds"], 2.5 * 3600)
+        # Percentiles come from log-scale bins: within 10% of the exact values.
+        self.assertAlmostEqual(time_in_b["p50_seconds"], 3600, delta=360)
+        self.assertAlmostEqual(time_in_b["p95_seconds"], 4 * 3600, delta=4 * 360)
+        self.assertEqual(response.data["lead_time"]["count"], 2)
+        self.assertEqual(
+            [(row["from_state_name"], row["to_state_name"], row["count"]) for row in response.data["transitions"]],
+            [("A", "B", 2), ("B", "C", 2)],
+        )
+        self.assertEqual(len(response.data["throughput"]), 4)
+
+        daily = self.client.get(url, {"since": hours(0).isoformat(), "until": hours(24 * 10).isoformat()})
+        self.assertEqual(daily.data["granularity"], "day")
+        self.assertEqual([row["count"] for row in daily.data["throughput"]], [3, 1])
+
+        bad = self.client.get(url, {"granularity": "week"})
+        self.assertEqual(bad.status_code, status.HTTP_400_BAD_REQUEST)
+
+        for name, value in (("until", "2024-13-45T00:00:00"), ("since", "yesterday")):
+            bad = self.client.get(url, {name: value})
+            self.assertEqual(bad.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(name, bad.data)
@@ -1,4 +1,7 @@
+import json
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
@@ -14,6 +17,8 @@ from workflow.models import (
     UserProfile,
     Workflow,
 )
+from workflow.permissions import get_role, role_cache_key, role_cache_stats
+from workflow.simulation import simulate_rules
 
 
 class WorkflowCRUDTests(APITestCase):
@@ -169,4 +174,276 @@ class WorkflowCRUDTests(APITestCase):
         url = reverse("entity-list")
         resp = self.client.get(url, {"current_state": state_a.id})
         self.assertEqual(resp.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(resp.data), 1)
+        self.assertEqual(len(resp.data["results"]), 1)
+
+    def test_entity_data_field_filters(self):
+        workflow = Workflow.objects.create(name="DataFilter", is_active=True)
+        sv = SchemaVersion.objects.create(workflow=workflow, version=1)
+        SchemaField.objects.create(
+            schema_version=sv, name="priority", field_type="enum",
+            options_json={"options": ["Low", "High"]}, indexed=True,
+        )
+        SchemaField.objects.create(schema_version=sv, name="amount", field_type="number", indexed=True)
+        SchemaField.objects.create(schema_version=sv, name="note", field_type="text")
+        state = State.objects.create(workflow=workflow, name="A", order_index=0, is_initial=True)
+        UserProfile.objects.filter(user=self.user).update(role="operator")
+        for priority, amount in [("High", 500), ("High", 1500), ("Low", 2000)]:
+            Entity.objects.create(
+                workflow=workflow,
+                current_state=state,
+                schema_version=sv,
+                data_json={"priority": priority, "amount": amount, "note": "x"},
+            )
+
+        url = reverse("entity-list")
+        resp = self.client.get(url, {"data__priority": "High", "data__amount__gte": "1000"})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual([e["data_json"]["amount"] for e in resp.data["results"]], [1500])
+
+        resp = self.client.get(url, {"data__priority__in": "High,Low", "data__amount__lt": "1000"})
+        self.assertEqual([e["data_json"]["amount"] for e in resp.data["results"]], [500])
+
+        # Values stored with another JSON type never match a range lookup.
+        Entity.objects.create(
+            workflow=workflow, current_state=state, schema_version=sv, data_json={"amount": "9999"}
+        )
+        resp = self.client.get(url, {"data__amount__gte": "1000"})
+        self.assertEqual(sorted(e["data_json"]["amount"] for e in resp.data["results"]), [1500, 2000])
+        resp = self.client.get(url, {"data__priority__isnull": "true"})
+        self.assertEqual([e["data_json"] for e in resp.data["results"]], [{"amount": "9999"}])
+
+        resp = self.client.get(url, {"data__note": "x"})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        resp = self.client.get(url, {"data__amount__gte": "lots"})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        resp = self.client.get(url, {"data__amount__regex": "1"})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_entity_list_cursor_pagination(self):
+        workflow = Workflow.objects.create(name="Paged", is_active=True)
+        sv = SchemaVersion.objects.create(workflow=workflow, version=1)
+        state = State.objects.create(workflow=workflow, name="New", order_index=0, is_initial=True)
+        created = [
+            Entity.objects.create(
+                workflow=workflow, current_state=state, schema_version=sv, data_json={"n": n}
+            )
+            for n in range(5)
+        ]
+
+        url = reverse("entity-list")
+        resp = self.client.get(url, {"page_size": 2})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        seen = [row["id"] for row in resp.data["results"]]
+        while resp.data["next"]:
+            resp = self.client.get(resp.data["next"])
+            seen.extend(row["id"] for row in resp.data["results"])
+
+        self.assertEqual(seen, [entity.id for entity in reversed(created)])
+
+    def test_entity_list_cursor_pages_through_equal_timestamps(self):
+        workflow = Workflow.objects.create(name="Ties", is_active=True)
+        sv = SchemaVersion.objects.create(workflow=workflow, version=1)
+        state = State.objects.create(workflow=workflow, name="New", order_index=0, is_initial=True)
+        created = [
+            Entity.objects.create(workflow=workflow, current_state=state, schema_version=sv) for _ in range(5)
+        ]
+        Entity.objects.update(created_at=created[0].created_at)
+        ids = [entity.id for entity in created]
+
+        url = reverse("entity-list")
+        for ordering, expected in (("-created_at", ids[::-1]), ("created_at", ids)):
+            resp = self.client.get(url, {"page_size": 2, "ordering": ordering})
+            pages = [[row["id"] for row in resp.data["results"]]]
+            while resp.data["next"]:
+                resp = self.client.get(resp.data["next"])
+                pages.append([row["id"] for row in resp.data["results"]])
+            self.assertEqual(sum(pages, []), expected)
+
+            back = self.client.get(resp.data["previous"])
+            self.assertEqual([row["id"] for row in back.data["results"]], pages[-2])
+
+        bad = self.client.get(url, {"cursor": "bm9wZQ=="})
+        self.assertEqual(bad.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_audit_log_ndjson_stream(self):
+        workflow = Workflow.objects.create(name="Stream", is_active=True)
+        sv = SchemaVersion.objects.create(workflow=workflow, version=1)
+        state = State.objects.create(workflow=workflow, name="New", order_index=0, is_initial=True)
+        entity = Entity.objects.create(
+            workflow=workflow, current_state=state, schema_version=sv, data_json={}
+        )
+        for _ in range(3):
+            AuditLog.objects.create(entity=entity, actor=self.user, action_type="system")
+
+        resp = self.client.get(reverse("auditlog-list"), {"stream": "ndjson", "entity": entity.id})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp["Content-Type"], "application/x-ndjson")
+        lines = b"".join(resp.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(json.loads(lines[0])["entity"], entity.id)
+
+
+class RoleCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        role_cache_stats.reset()
+        User = get_user_model()
+        self.user = User.objects.create_user(username="cached", password="testpass")
+        self.client.force_authenticate(self.user)
+        self.profile = UserProfile.objects.create(user=self.user, role="viewer")
+
+    def test_role_cached_across_requests(self):
+        url = reverse("workflow-list")
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_role(self.user), "viewer")
+        self.assertEqual(role_cache_stats.snapshot()["misses"], 1)
+
+    def test_profile_save_invalidates_role(self):
+        url = reverse("workflow-list")
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.profile.role = "admin"
+        self.profile.save()
+
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        stats = self.client.get(reverse("userprofile-role-cache-stats")).data
+        self.assertEqual(stats["misses"], 2)
+        self.assertGreater(stats["hit_ratio"], 0)
+
+    def test_role_cached_during_profile_write_is_dropped_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.profile.role = "admin"
+            self.profile.save()
+            # Another request caches the role before the write commits.
+            cache.set(role_cache_key(self.user.pk), "viewer")
+        self.assertEqual(get_role(self.user), "admin")
+
+
+class DefinitionCachingTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(username="designer", password="testpass")
+        UserProfile.objects.create(user=self.user, role="admin")
+        self.client.force_authenticate(self.user)
+        self.workflow = Workflow.objects.create(name="Cached")
+        self.state = State.objects.create(workflow=self.workflow, name="New", is_initial=True)
+
+    def test_list_answers_304_until_definition_changes(self):
+        url = reverse("state-list")
+        resp = self.client.get(url, {"workflow": self.workflow.id})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        etag = resp["ETag"]
+        self.assertIn("private", resp["Cache-Control"])
+        self.assertIn("must-revalidate", resp["Cache-Control"])
+
+        # Role lookup is cached, so only the fingerprint query runs.
+        with self.assertNumQueries(1):
+            resp = self.client.get(url, {"workflow": self.workflow.id}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(resp["ETag"], etag)
+        self.assertEqual(resp.content, b"")
+
+        State.objects.create(workflow=self.workflow, name="Done", order_index=1)
+        resp = self.client.get(url, {"workflow": self.workflow.id}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(resp["ETag"], etag)
+        self.assertEqual(len(resp.data), 2)
+
+    def test_detail_etag_follows_workflow_revision_and_fields(self):
+        transition = Transition.objects.create(
+            workflow=self.workflow, from_state=self.state, to_state=self.state, name="Loop"
+        )
+        rule = Rule.objects.create(
+            transition=transition, name="R", condition_type="field_present", params_json={"field": "a"}
+        )
+        url = reverse("rule-detail", kwargs={"pk": rule.id})
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        rule.params_json = {"field": "b"}
+        rule.save()
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data["params_json"], {"field": "b"})
+
+        url = reverse("workflow-list")
+        etag = self.client.get(url)["ETag"]
+        self.client.patch(reverse("workflow-detail", kwargs={"pk": self.workflow.id}), {"name": "Renamed"})
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+        resp = self.client.get(reverse("workflow-state-counts", kwargs={"pk": self.workflow.id}))
+        self.assertNotIn("ETag", resp)
+
+
+class RuleSimulationTests(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="analyst", password="testpass")
+        UserProfile.objects.create(user=self.user, role="admin")
+        self.client.force_authenticate(self.user)
+        workflow = Workflow.objects.create(name="Simulated")
+        sv = SchemaVersion.objects.create(workflow=workflow, version=1)
+        start = State.objects.create(workflow=workflow, name="Start", is_initial=True)
+        end = State.objects.create(workflow=workflow, name="End", order_index=1)
+        self.transition = Transition.objects.create(
+            workflow=workflow, from_state=start, to_state=end, name="Go"
+        )
+        Rule.objects.create(
+            transition=self.transition, name="Live", condition_type="field_present", params_json={"field": "owner"}
+        )
+        self.entities = [
+            Entity.objects.create(
+                workflow=workflow, current_state=start, schema_version=sv, data_json=data
+            )
+            for data in [
+                {"owner": "a", "amount": 50},
+                {"owner": "b", "amount": 500},
+                {"amount": 5000},
+                {"owner": "c"},
+            ]
+        ]
+        Entity.objects.create(workflow=workflow, current_state=end, schema_version=sv, data_json={})
+        self.url = reverse("transition-simulate", kwargs={"pk": self.transition.id})
+        self.draft = [
+            {
+                "name": "Big enough",
+                "condition_type": "field_gte",
+                "params_json": {"field": "amount", "value": 100},
+                "eval_order": 1,
+            },
+            {"name": "Has amount", "condition_type": "field_present", "params_json": {"field": "amount"}},
+        ]
+
+    def test_simulate_reports_blocking_rules_without_saving(self):
+        resp = self.client.post(self.url, {"rules": self.draft}, format="json")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        report = resp.data
+        self.assertEqual((report["population"], report["evaluated"], report["complete"]), (4, 4, True))
+        self.assertEqual((report["allowed"], report["blocked"]), (2, 2))
+        # "Has amount" runs first (lower eval_order) and blocks the entity without one.
+        self.assertEqual([rule["index"] for rule in report["rules"]], [1, 0])
+        self.assertEqual(report["rules"][0]["example_ids"], [self.entities[3].id])
+        self.assertEqual(report["rules"][1]["example_ids"], [self.entities[0].id])
+        self.assertEqual(
+            report["current_rules"], {"blocked": 1, "newly_blocked": 2, "newly_allowed": 1}
+        )
+        self.assertEqual(Rule.objects.filter(transition=self.transition).count(), 1)
+
+    def test_simulate_resumes_after_time_limit_and_samples(self):
+        report = simulate_rules(self.transition, self.draft, chunk_size=3, time_limit=0)
+        self.assertFalse(report["complete"])
+        self.assertEqual(report["evaluated"], 3)
+        rest = simulate_rules(self.transition, self.draft, after=report["resume_after"])
+        self.assertEqual(rest["evaluated"], 1)
+
+        resp = self.client.post(self.url, {"rules": self.draft, "sample": 2}, format="json")
+        self.assertEqual(resp.data["evaluated"], 2)
+        self.assertIsNone(resp.data["resume_after"])
+        # Sampling scans ids in keyset chunks, and the time limit applies while scanning.
+        self.assertEqual(simulate_rules(self.transition, self.draft, sample=3, chunk_size=1)["evaluated"], 3)
+        self.assertFalse(simulate_rules(self.transition, self.draft, sample=3, chunk_size=1, time_limit=0)["complete"])
+        resp = self.client.post(
+            self.url, {"rules": [{"name": "x", "condition_type": "nope"}]}, format="json"
+        )
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,112 @@
+import base64
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import AsyncClient, TestCase
+from django.urls import reverse
+
+from workflow.models import AuditLog, Entity, Rule, SchemaVersion, State, Transition, UserProfile, Workflow
+from workflow.profiling import query_stats
+
+
+class AsyncReadViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(username="reader", password="secret")
+        UserProfile.objects.create(user=self.user, role="viewer")
+        self.workflow = Workflow.objects.create(name="Async")
+        schema_version = SchemaVersion.objects.create(workflow=self.workflow, version=1)
+        self.new = State.objects.create(workflow=self.workflow, name="New", is_initial=True)
+        done = State.objects.create(workflow=self.workflow, name="Done", order_index=1)
+        self.transition = Transition.objects.create(
+            workflow=self.workflow, from_state=self.new, to_state=done, name="Finish"
+        )
+        Rule.objects.create(
+            transition=self.transition,
+            name="Needs approver",
+            condition_type="field_present",
+            params_json={"field": "approver"},
+        )
+        self.entities = [
+            Entity.objects.create(
+                workflow=self.workflow,
+                current_state=self.new,
+                schema_version=schema_version,
+                data_json={"amount": amount},
+            )
+            for amount in (5, 50, 500)
+        ]
+        AuditLog.objects.create(entity=self.entities[0], action_type="system")
+
+    def basic_auth(self, password="secret"):
+        token = base64.b64encode(f"reader:{password}".encode()).decode()
+        return {"AUTHORIZATION": f"Basic {token}"}
+
+    async def test_entity_list_matches_sync_endpoint(self):
+        await self.async_client.aforce_login(self.user)
+        params = {"workflow": self.workflow.id, "page_size": 2}
+        resp = await self.async_client.get(reverse("async-entity-list"), params)
+        self.assertEqual(resp.status_code, 200)
+        body = resp.json()
+        self.assertEqual([row["id"] for row in body["results"]], [self.entities[2].id, self.entities[1].id])
+        self.assertIn("cursor=", body["next"])
+
+        resp = await self.async_client.get(reverse("async-entity-list"), {"workflow": "nope"})
+        self.assertEqual(resp.status_code, 400)
+
+        resp = await self.async_client.get(reverse("async-entity-list"), {"cursor": "garbage"})
+        self.assertEqual(resp.status_code, 404)
+        self.assertEqual(resp.json(), {"detail": "Invalid cursor"})
+
+        resp = await self.async_client.get(reverse("async-auditlog-list"), {"stream": "ndjson"})
+        rows = [json.loads(line) async for line in resp.streaming_content]
+        self.assertEqual([row["entity"] for row in rows], [self.entities[0].id])
+
+    async def test_retrieve_and_available_transitions_with_basic_auth(self):
+        resp = await self.async_client.get(
+            reverse("async-entity-detail", kwargs={"pk": self.entities[1].id}), headers=self.basic_auth()
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["data_json"], {"amount": 50})
+
+        resp = await self.async_client.get(
+            reverse("async-entity-available-transitions", kwargs={"pk": self.entities[0].id}),
+            headers=self.basic_auth(),
+        )
+        self.assertEqual(resp.status_code, 200)
+        [transition] = resp.json()
+        self.assertEqual(transition["id"], self.transition.id)
+        self.assertFalse(transition["allowed"])
+
+        resp = await self.async_client.get(
+            reverse("async-entity-detail", kwargs={"pk": 999999}), headers=self.basic_auth()
+        )
+        self.assertEqual(resp.status_code, 404)
+
+    async def test_query_profiling_counts_async_and_streamed_queries(self):
+        query_stats.reset()
+        # Middleware is loaded on a client's first request, so use a fresh
+        # client while profiling is switched on.
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        with self.settings(DEBUG=True, WORKFLOW_QUERY_PROFILING=True):
+            resp = await client.get(reverse("async-entity-list"), {"workflow": self.workflow.id})
+            list_queries = int(resp["X-Query-Count"])
+            self.assertGreater(list_queries, 0)
+
+            resp = await client.get(reverse("async-auditlog-list"), {"stream": "ndjson"})
+            self.assertNotIn("X-Query-Count", resp)
+            self.assertEqual(query_stats.snapshot().get("async-auditlog-list"), None)
+            rows = [line async for line in resp.streaming_content]
+        self.assertEqual(len(rows), 1)
+        stats = query_stats.snapshot()
+        self.assertEqual(stats["async-entity-list"]["queries_max"], list_queries)
+        self.assertGreater(stats["async-auditlog-list"]["queries_max"], 0)
+
+    async def test_requires_valid_credentials(self):
+        resp = await self.async_client.get(reverse("async-entity-list"))
+        self.assertEqual(resp.status_code, 401)
+        resp = await self.async_client.get(reverse("async-entity-list"), headers=self.basic_auth("wrong"))
+        self.assertEqual(resp.status_code, 401)
+        self.assertEqual(resp["WWW-Authenticate"], 'Basic realm="api"')
@@ -0,0 +1,62 @@
+from django.test import TestCase
+
+from workflow.audit import MAX_ROW_ATTEMPTS, BufferedAuditSink, SyncAuditSink
+from workflow.models import AuditLog, Entity, SchemaVersion, State, Workflow
+
+
+class AuditSinkTests(TestCase):
+    def setUp(self):
+        workflow = Workflow.objects.create(name="Sink")
+        sv = SchemaVersion.objects.create(workflow=workflow, version=1)
+        state = State.objects.create(workflow=workflow, name="New", is_initial=True)
+        self.entity = Entity.objects.create(workflow=workflow, current_state=state, schema_version=sv)
+
+    def _rows(self, n):
+        return [AuditLog(entity=self.entity, action_type="system", reason=str(i)) for i in range(n)]
+
+    def test_sync_sink_writes_immediately(self):
+        SyncAuditSink().record_many(self._rows(3))
+        self.assertEqual(AuditLog.objects.count(), 3)
+
+    def test_buffered_sink_waits_for_commit_and_flush(self):
+        sink = BufferedAuditSink(max_batch=2, autostart=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            sink.record_many(self._rows(3))
+            self.assertEqual(sink.metrics()["queue_depth"], 0)
+
+        self.assertEqual(sink.metrics()["queue_depth"], 3)
+        self.assertEqual(AuditLog.objects.count(), 0)
+
+        sink.flush()
+        metrics = sink.metrics()
+        self.assertEqual(AuditLog.objects.count(), 3)
+        self.assertEqual(metrics["queue_depth"], 0)
+        self.assertEqual(metrics["flushes"], 2)
+        self.assertEqual(metrics["flushed_rows"], 3)
+
+    def test_buffered_sink_falls_back_to_sync_when_full(self):
+        sink = BufferedAuditSink(max_queue=2, autostart=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            sink.record_many(self._rows(3))
+
+        self.assertEqual(AuditLog.objects.count(), 3)
+        self.assertEqual(sink.metrics()["sync_fallback_rows"], 3)
+
+    def test_buffered_sink_dead_letters_rows_that_keep_failing(self):
+        sink = BufferedAuditSink(max_batch=4, autostart=False)
+        rows = self._rows(4)
+        rows[2].action_type = None  # NOT NULL violation
+        with self.captureOnCommitCallbacks(execute=True):
+            sink.record_many(rows)
+
+        sink.flush()
+        self.assertEqual(AuditLog.objects.count(), 3)
+        self.assertEqual(sink.metrics()["queue_depth"], 1)
+
+        for _ in range(MAX_ROW_ATTEMPTS - 1):
+            sink.flush()
+        metrics = sink.metrics()
+        self.assertEqual(AuditLog.objects.count(), 3)
+        self.assertEqual(metrics["queue_depth"], 0)
+        self.assertEqual(metrics["flushed_rows"], 3)
+        self.assertEqual(metrics["dead_letter_rows"], 1)
@@ -0,0 +1,85 @@
+import json
+from io import StringIO
+
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from workflow.benchmarking import (
+    STRESS_MODES,
+    percentile,
+    prepare_stress_entities,
+    run_transition_stress,
+)
+from workflow.models import AuditLog, Entity, SchemaVersion, State, StateCounter, Transition, UserProfile, Workflow
+from workflow.profiling import fingerprint
+
+
+class BenchmarkTests(TestCase):
+    def test_percentile_nearest_rank(self):
+        values = [float(v) for v in range(1, 101)]
+        self.assertEqual(percentile(values, 50), 50.0)
+        self.assertEqual(percentile(values, 99), 99.0)
+        self.assertEqual(percentile([], 50), 0.0)
+
+    def test_fingerprint_ignores_literals(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id = 1 AND name = 'a'"),
+            fingerprint("SELECT *  FROM t WHERE id = 42 AND name = 'b'"),
+        )
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s)'),
+            fingerprint('SELECT * FROM t WHERE id IN (%s)'),
+        )
+
+    def test_seed_volume_and_benchmark_report(self):
+        call_command(
+            "seed_sample_data", workflows=1, entities=30, audit_rows=10, stdout=StringIO()
+        )
+        workflow = Workflow.objects.get(name="Benchmark Workflow 1")
+        self.assertEqual(Entity.objects.filter(workflow=workflow).count(), 30)
+        self.assertEqual(AuditLog.objects.filter(entity__workflow=workflow).count(), 10)
+        self.assertEqual(
+            sum(StateCounter.objects.filter(workflow=workflow).values_list("count", flat=True)), 30
+        )
+
+        out = StringIO()
+        call_command("benchmark_api", iterations=3, stdout=out, stderr=StringIO())
+        report = json.loads(out.getvalue())
+
+        self.assertEqual(report["workflow"], workflow.id)
+        self.assertEqual(
+            set(report["scenarios"]),
+            {"entity_list", "entity_retrieve", "audit_log_list", "entity_create", "entity_transition"},
+        )
+        for result in report["scenarios"].values():
+            self.assertEqual(result["requests"], 3)
+            self.assertIn("p99", result["latency_ms"])
+            self.assertGreater(result["queries_per_request"]["max"], 0)
+
+
+@skipUnless(connection.vendor == "postgresql", "Concurrent transitions need Postgres")
+class TransitionStressTests(TransactionTestCase):
+    def test_each_entity_moves_exactly_once_under_contention(self):
+        user = get_user_model().objects.create_user(username="stress", password="x")
+        UserProfile.objects.create(user=user, role="admin")
+        workflow = Workflow.objects.create(name="Stress")
+        schema_version = SchemaVersion.objects.create(workflow=workflow, version=1)
+        start = State.objects.create(workflow=workflow, name="Start", is_initial=True)
+        end = State.objects.create(workflow=workflow, name="End", order_index=1)
+        transition = Transition.objects.create(workflow=workflow, name="Go", from_state=start, to_state=end)
+        Entity.objects.create(workflow=workflow, current_state=start, schema_version=schema_version)
+        transition.refresh_from_db()
+
+        for mode in STRESS_MODES:
+            with self.subTest(mode=mode):
+                entity_ids = prepare_stress_entities(transition, 60)
+                report = run_transition_stress(user, transition, entity_ids, mode=mode, workers=4, chunk_size=10)
+                self.assertTrue(report["consistent"], report)
+                self.assertEqual(report["double_moves"], 0)
+
+        moved = Entity.objects.filter(current_state=end).count()
+        self.assertEqual(StateCounter.objects.get(state=end).count, moved)
@@ -0,0 +1,185 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from workflow import eligibility, jobs
+from workflow.bulk import transition_entities
+from workflow.eligibility import get_dependency_index
+from workflow.models import Entity, Job, Rule, SchemaVersion, State, Transition, UserProfile, Workflow
+
+
+class EligibilityTests(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="board", password="x")
+        UserProfile.objects.create(user=self.user, role="operator")
+        self.client.force_authenticate(self.user)
+        self.workflow = Workflow.objects.create(name="Claims")
+        self.schema_version = SchemaVersion.objects.create(workflow=self.workflow, version=1)
+        self.new = State.objects.create(workflow=self.workflow, name="New", is_initial=True)
+        self.done = State.objects.create(workflow=self.workflow, name="Done", order_index=1)
+        self.approve = Transition.objects.create(
+            workflow=self.workflow, name="approve", from_state=self.new, to_state=self.done
+        )
+        self.close = Transition.objects.create(
+            workflow=self.workflow, name="close", from_state=self.new, to_state=self.done, order_index=1
+        )
+        Rule.objects.create(
+            transition=self.approve, name="Amount", condition_type="field_present", params_json={"field": "amount"}
+        )
+        Rule.objects.create(
+            transition=self.approve,
+            name="Ticket for urgent",
+            condition_type="field_equals",
+            params_json={"field": "priority", "value": "urgent", "requires": "ticket"},
+            eval_order=1,
+        )
+        Rule.objects.create(
+            transition=self.close, name="Reason", condition_type="field_present", params_json={"field": "reason"}
+        )
+
+    def create(self, data):
+        response = self.client.post(
+            reverse("entity-list"),
+            {
+                "workflow": self.workflow.id,
+                "current_state": self.new.id,
+                "schema_version": self.schema_version.id,
+                "data_json": data,
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return Entity.objects.get(pk=response.data["id"])
+
+    def patch(self, entity, data):
+        response = self.client.patch(
+            reverse("entity-detail", args=[entity.id]), {"data_json": data}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        entity.refresh_from_db()
+        return entity.eligible_transitions
+
+    def test_data_updates_reevaluate_only_affected_rules(self):
+        self.workflow.refresh_from_db()
+        index = get_dependency_index(self.workflow.id, self.workflow.definition_revision)
+        self.assertEqual(index.fields(), ["amount", "priority", "reason", "ticket"])
+        self.assertEqual(index.affected(self.approve.id, ["ticket", "note"]), (1,))
+        self.assertEqual(index.affected(self.close.id, ["ticket"]), ())
+
+        entity = self.create({"amount": 5})
+        self.assertEqual(entity.eligible_transitions, 0b01)
+        self.assertEqual(entity.eligibility_revision, self.workflow.definition_revision)
+
+        with mock.patch.object(eligibility, "run_program", wraps=eligibility.run_program) as run:
+            self.assertEqual(self.patch(entity, {"amount": 5, "note": "x"}), 0b01)
+            run.assert_not_called()
+            # Approve was eligible, so only the rule reading "priority" runs.
+            self.assertEqual(self.patch(entity, {"amount": 5, "priority": "urgent"}), 0b00)
+            self.assertEqual([len(call.args[0]) for call in run.call_args_list], [1])
+            run.reset_mock()
+            # Blocked transitions run their whole program again.
+            self.assertEqual(self.patch(entity, {"amount": 5, "priority": "urgent", "ticket": "T-1"}), 0b01)
+            self.assertEqual([len(call.args[0]) for call in run.call_args_list], [2])
+        self.assertEqual(self.patch(entity, {"priority": "urgent", "ticket": "T-1", "reason": "dup"}), 0b10)
+
+    def test_eligible_transition_filter_evaluates_stale_rows(self):
+        ready = self.create({"amount": 1, "reason": "dup"})
+        self.create({"reason": "dup"})
+        imported = Entity.objects.create(
+            workflow=self.workflow,
+            current_state=self.new,
+            schema_version=self.schema_version,
+            data_json={"amount": 2},
+        )
+        self.assertIsNone(imported.eligibility_revision)
+
+        url = reverse("entity-list")
+        response = self.client.get(url, {"eligible_transition": self.approve.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(row["id"] for row in response.data["results"]), [ready.id, imported.id])
+        imported.refresh_from_db()
+        self.assertIsNone(imported.eligibility_revision)
+
+        moved = self.client.post(
+            reverse("entity-transition", args=[ready.id]), {"transition": self.close.id}, format="json"
+        )
+        self.assertEqual(moved.status_code, status.HTTP_200_OK)
+        ready.refresh_from_db()
+        self.assertEqual(ready.eligible_transitions, 0)
+
+        # A rule change bumps the revision, so every row is evaluated again.
+        Rule.objects.filter(name="Amount").get().delete()
+        response = self.client.get(url, {"eligible_transition": self.approve.id})
+        self.assertEqual(len(response.data["results"]), 2)
+
+        bad = self.client.get(url, {"eligible_transition": "nope"})
+        self.assertEqual(bad.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_stale_rows_are_refreshed_by_a_job_not_by_reads(self):
+        entities = [self.create({"amount": n}) for n in range(3)]
+        with self.captureOnCommitCallbacks(execute=True):
+            Rule.objects.filter(name="Amount").get().delete()
+        job = Job.objects.get(kind="refresh_eligibility")
+        self.assertEqual(job.params_json, {"workflow": self.workflow.id})
+
+        # Reads evaluate stale rows in memory and leave them stale.
+        url = reverse("entity-list")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {"eligible_transition": self.approve.id})
+        self.assertEqual(len(response.data["results"]), 3)
+        self.assertFalse([query for query in queries if query["sql"].startswith("UPDATE")])
+
+        jobs.work(worker_id="test")
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result_json), (Job.Status.SUCCEEDED, {"counts": {"refreshed": 3}}))
+        self.assertFalse(Entity.objects.filter(id__in=[entity.id for entity in entities], eligibility_revision=None))
+        response = self.client.get(url, {"eligible_transition": self.approve.id})
+        self.assertEqual(len(response.data["results"]), 3)
+
+    def test_transitions_write_bits_for_the_target_state(self):
+        reopen = Transition.objects.create(
+            workflow=self.workflow, name="reopen", from_state=self.done, to_state=self.new
+        )
+        Rule.objects.create(
+            transition=reopen, name="Reason", condition_type="field_present", params_json={"field": "reason"}
+        )
+        single = self.create({"amount": 1, "reason": "dup"})
+        bulk = self.create({"amount": 2, "reason": "dup"})
+        blocked = self.create({"amount": 3})
+
+        response = self.client.post(
+            reverse("entity-transition", args=[single.id]), {"transition": self.approve.id}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        transition_entities(Transition.objects.get(pk=self.approve.pk), entity_ids=[bulk.id, blocked.id])
+
+        self.workflow.refresh_from_db()
+        for entity, mask in ((single, 0b1), (bulk, 0b1), (blocked, 0b0)):
+            entity.refresh_from_db()
+            self.assertEqual(entity.current_state_id, self.done.id)
+            self.assertEqual(
+                (entity.eligible_transitions, entity.eligibility_revision),
+                (mask, self.workflow.definition_revision),
+            )
+
+        response = self.client.get(reverse("entity-list"), {"eligible_transition": reopen.id})
+        self.assertEqual(sorted(row["id"] for row in response.data["results"]), [single.id, bulk.id])
+
+    def test_saves_outside_the_api_mark_bits_unknown(self):
+        entity = self.create({"amount": 5})
+        self.assertIsNotNone(entity.eligible_transitions)
+        entity.data_json = {}
+        entity.save()
+        entity.refresh_from_db()
+        self.assertIsNone(entity.eligible_transitions)
+
+        entity = self.create({"amount": 5})
+        entity.current_state = self.done
+        entity.save(update_fields=["current_state"])
+        entity.refresh_from_db()
+        self.assertEqual((entity.eligible_transitions, entity.eligibility_revision), (None, None))
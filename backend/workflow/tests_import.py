@@ -0,0 +1,74 @@
+import io
+import json
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from workflow.importing import EntityImporter, iter_ndjson
+from workflow.models import AuditLog, Entity, SchemaField, SchemaVersion, State, StateCounter, UserProfile, Workflow
+
+
+class EntityImportTests(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="importer", password="x")
+        UserProfile.objects.create(user=self.user, role="operator")
+        self.client.force_authenticate(self.user)
+        self.workflow = Workflow.objects.create(name="Import")
+        self.schema_version = SchemaVersion.objects.create(workflow=self.workflow, version=1)
+        SchemaField.objects.create(
+            schema_version=self.schema_version, name="requester", field_type="text", required=True
+        )
+        SchemaField.objects.create(schema_version=self.schema_version, name="amount", field_type="number")
+        self.initial = State.objects.create(workflow=self.workflow, name="New", is_initial=True)
+        State.objects.create(workflow=self.workflow, name="Done", order_index=1)
+
+    def test_csv_upload_maps_columns_and_reports_bad_rows(self):
+        csv_body = "Name,amount,extra\nSam,12,x\n,5,y\nAlex,lots,z\nKim,,\n"
+        resp = self.client.post(
+            reverse("entity-import"),
+            {
+                "file": SimpleUploadedFile("people.csv", csv_body.encode()),
+                "workflow": self.workflow.id,
+                "mapping": json.dumps({"Name": "requester"}),
+            },
+            format="multipart",
+        )
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data["rows"], 4)
+        self.assertEqual(resp.data["created"], 2)
+        self.assertEqual(resp.data["failed"], 2)
+        self.assertEqual([error["row"] for error in resp.data["errors"]], [2, 3])
+        self.assertEqual(resp.data["ignored_columns"], ["extra"])
+
+        imported = Entity.objects.filter(workflow=self.workflow).order_by("id")
+        self.assertEqual([e.data_json for e in imported], [{"requester": "Sam", "amount": 12}, {"requester": "Kim"}])
+        self.assertTrue(all(e.current_state_id == self.initial.id for e in imported))
+        self.assertEqual(StateCounter.objects.get(state=self.initial).count, 2)
+        self.assertEqual(
+            AuditLog.objects.filter(entity__workflow=self.workflow, action_type="system").count(), 2
+        )
+
+    def test_ndjson_import_writes_in_chunks(self):
+        lines = [json.dumps({"requester": f"user{i}", "amount": i}) for i in range(5)]
+        lines.insert(2, "{not json")
+        importer = EntityImporter(self.workflow, actor=self.user, chunk_size=2)
+        report = importer.run(iter_ndjson(io.StringIO("\n".join(lines) + "\n")))
+        self.assertEqual((report["rows"], report["created"], report["failed"]), (6, 5, 1))
+        self.assertEqual(StateCounter.objects.get(state=self.initial).count, 5)
+
+    def test_import_command(self):
+        out = io.StringIO()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "entities.ndjson")
+            with open(path, "w") as handle:
+                handle.write('{"requester": "Sam"}\n{"amount": 3}\n')
+            call_command("import_entities", path, workflow=self.workflow.id, stdout=out, stderr=io.StringIO())
+        report = json.loads(out.getvalue())
+        self.assertEqual((report["created"], report["failed"]), (1, 1))
+        self.assertEqual(report["errors"][0]["errors"], {"requester": "This field is required."})
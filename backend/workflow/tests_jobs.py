@@ -0,0 +1,119 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from workflow import jobs
+from workflow.models import Entity, Job, JobChunk, SchemaVersion, State, Transition, UserProfile, Workflow
+
+_flaky_calls = []
+
+
+@jobs.job_handler("test_flaky")
+def flaky_chunk(job, payload):
+    _flaky_calls.append(payload["n"])
+    if len(_flaky_calls) == 1:
+        raise RuntimeError("transient failure")
+    return {"counts": {"done": payload["n"]}}
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        _flaky_calls.clear()
+
+    def test_failed_chunk_is_retried_with_backoff(self):
+        job = jobs.enqueue_job("test_flaky", {}, [{"n": 2}, {"n": 3}])
+        self.assertEqual(job.total_chunks, 2)
+
+        self.assertEqual(jobs.work(worker_id="w1"), 2)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.RUNNING)
+        retry = JobChunk.objects.get(job=job, index=0)
+        self.assertEqual(retry.status, JobChunk.Status.PENDING)
+        self.assertGreater(retry.run_after, timezone.now())
+        self.assertIn("transient failure", retry.error)
+
+        # Not runnable until the backoff has passed.
+        self.assertEqual(jobs.work(worker_id="w1"), 0)
+        JobChunk.objects.filter(pk=retry.pk).update(run_after=timezone.now())
+        self.assertEqual(jobs.work(worker_id="w1"), 1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.SUCCEEDED)
+        self.assertEqual(job.result_json, {"counts": {"done": 5}})
+        self.assertEqual(jobs.progress(job)["percent"], 100.0)
+
+    def test_stale_running_chunks_are_requeued(self):
+        job = jobs.enqueue_job("test_flaky", {}, [{"n": 1}])
+        chunk = jobs.claim_chunk("dead-worker")
+        JobChunk.objects.filter(pk=chunk.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(jobs.requeue_stale_chunks(lease_seconds=60), 1)
+        self.assertEqual(JobChunk.objects.get(job=job).status, JobChunk.Status.PENDING)
+
+    def test_chunk_that_keeps_losing_its_worker_fails(self):
+        job = jobs.enqueue_job("test_flaky", {}, [{"n": 1}])
+        for _ in range(jobs.MAX_ATTEMPTS):
+            JobChunk.objects.filter(job=job).update(run_after=timezone.now())
+            chunk = jobs.claim_chunk("dying-worker")
+            JobChunk.objects.filter(pk=chunk.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+            jobs.requeue_stale_chunks(lease_seconds=60)
+        chunk = JobChunk.objects.get(job=job)
+        self.assertEqual((chunk.status, chunk.attempts), (JobChunk.Status.FAILED, jobs.MAX_ATTEMPTS))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.failed_chunks), (Job.Status.FAILED, 1))
+
+    def test_only_the_lease_holder_records_completion(self):
+        _flaky_calls.append(0)  # skip the handler's first-call failure
+        job = jobs.enqueue_job("test_flaky", {}, [{"n": 4}])
+        slow = jobs.claim_chunk("slow-worker")
+        JobChunk.objects.filter(pk=slow.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+        jobs.requeue_stale_chunks(lease_seconds=60)
+        JobChunk.objects.filter(job=job).update(run_after=timezone.now())
+        fast = jobs.claim_chunk("fast-worker")
+
+        jobs.run_chunk(fast)
+        jobs.run_chunk(slow)  # finishes late, after losing its lease
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.done_chunks), (Job.Status.SUCCEEDED, 1))
+        self.assertEqual(job.result_json, {"counts": {"done": 4}})
+
+
+class BackgroundBulkTransitionTests(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="jobs", password="x")
+        UserProfile.objects.create(user=self.user, role="operator")
+        self.client.force_authenticate(self.user)
+        workflow = Workflow.objects.create(name="Jobs")
+        schema_version = SchemaVersion.objects.create(workflow=workflow, version=1)
+        self.start = State.objects.create(workflow=workflow, name="Start", is_initial=True)
+        self.end = State.objects.create(workflow=workflow, name="End", order_index=1)
+        self.transition = Transition.objects.create(
+            workflow=workflow, name="Go", from_state=self.start, to_state=self.end
+        )
+        self.entities = [
+            Entity.objects.create(workflow=workflow, current_state=self.start, schema_version=schema_version)
+            for _ in range(3)
+        ]
+
+    def test_background_bulk_transition_runs_as_job(self):
+        resp = self.client.post(
+            reverse("entity-bulk-transition"),
+            {"transition": self.transition.id, "filter": {}, "background": True},
+            format="json",
+        )
+        self.assertEqual(resp.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(resp.data["status"], Job.Status.PENDING)
+        self.assertEqual(Entity.objects.filter(current_state=self.end).count(), 0)
+
+        jobs.work(worker_id="test")
+
+        resp = self.client.get(reverse("job-detail", kwargs={"pk": resp.data["id"]}))
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data["status"], Job.Status.SUCCEEDED)
+        self.assertEqual(resp.data["progress"]["done_chunks"], 1)
+        self.assertEqual(resp.data["result_json"]["counts"]["moved"], 3)
+        self.assertEqual(Entity.objects.filter(current_state=self.end).count(), 3)
@@ -0,0 +1,88 @@
+import gzip
+import json
+import tempfile
+from datetime import date, timedelta
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from workflow import partitioning
+from workflow.models import AuditLog, Entity, SchemaVersion, State, UserProfile, Workflow
+
+
+def _entity():
+    workflow = Workflow.objects.create(name="Audit")
+    sv = SchemaVersion.objects.create(workflow=workflow, version=1)
+    state = State.objects.create(workflow=workflow, name="New", is_initial=True)
+    return Entity.objects.create(workflow=workflow, current_state=state, schema_version=sv)
+
+
+class PartitionHelperTests(TestCase):
+    def test_month_ranges(self):
+        ranges = list(partitioning.month_ranges(date(2025, 11, 15), date(2026, 1, 1)))
+        self.assertEqual(
+            ranges,
+            [
+                (date(2025, 11, 1), date(2025, 12, 1)),
+                (date(2025, 12, 1), date(2026, 1, 1)),
+                (date(2026, 1, 1), date(2026, 2, 1)),
+            ],
+        )
+        self.assertEqual(partitioning.partition_name(date(2026, 1, 1)), "workflow_auditlog_p202601")
+
+    def test_archive_rows_exports_then_deletes(self):
+        entity = _entity()
+        old = AuditLog.objects.create(entity=entity, action_type="system", reason="old")
+        AuditLog.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=400))
+        recent = AuditLog.objects.create(entity=entity, action_type="system", reason="recent")
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            [path] = partitioning.archive_rows(timezone.now() - timedelta(days=365), output_dir, batch_size=1)
+            with gzip.open(path, "rt") as archived:
+                rows = [json.loads(line) for line in archived]
+
+        self.assertEqual([row["id"] for row in rows], [old.id])
+        self.assertEqual(list(AuditLog.objects.values_list("id", flat=True)), [recent.id])
+
+
+@skipUnless(connection.vendor == "postgresql", "Audit log partitioning needs Postgres")
+class ConvertToPartitionedTests(TestCase):
+    def test_ids_continue_after_legacy_table_is_dropped(self):
+        entity = _entity()
+        before = AuditLog.objects.create(entity=entity, action_type="system")
+
+        partitioning.convert_to_partitioned(months_ahead=1, keep_legacy=True)
+        self.assertTrue(partitioning.is_partitioned())
+        first = AuditLog.objects.create(entity=entity, action_type="system")
+        self.assertGreater(first.id, before.id)
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE "{partitioning.TABLE}_legacy"')
+        second = AuditLog.objects.create(entity=entity, action_type="system")
+        self.assertGreater(second.id, first.id)
+        self.assertEqual(
+            list(AuditLog.objects.order_by("id").values_list("id", flat=True)), [before.id, first.id, second.id]
+        )
+
+
+class AuditLogDateFilterTests(APITestCase):
+    def test_filter_by_created_at_range(self):
+        user = get_user_model().objects.create_user(username="auditor", password="x")
+        UserProfile.objects.create(user=user, role="viewer")
+        self.client.force_authenticate(user)
+        entity = _entity()
+        old = AuditLog.objects.create(entity=entity, action_type="system")
+        AuditLog.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=40))
+        recent = AuditLog.objects.create(entity=entity, action_type="system")
+
+        since = (timezone.now() - timedelta(days=7)).isoformat()
+        resp = self.client.get(reverse("auditlog-list"), {"created_at__gte": since})
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual([row["id"] for row in resp.data["results"]], [recent.id])
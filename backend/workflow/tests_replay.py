@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from workflow.models import (
+    AuditLog,
+    Entity,
+    EntityTombstone,
+    ReplayCheckpoint,
+    SchemaVersion,
+    State,
+    UserProfile,
+    Workflow,
+)
+from workflow.replay import build_checkpoints, entity_state_at, fold_window, workflow_counts_at
+
+T0 = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def hours(n):
+    return T0 + timedelta(hours=n)
+
+
+class ReplayTests(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="historian", password="x")
+        UserProfile.objects.create(user=self.user, role="viewer")
+        self.client.force_authenticate(self.user)
+        self.workflow = Workflow.objects.create(name="History")
+        Workflow.objects.filter(pk=self.workflow.pk).update(created_at=T0)
+        self.workflow.refresh_from_db()
+        sv = SchemaVersion.objects.create(workflow=self.workflow, version=1)
+        self.a = State.objects.create(workflow=self.workflow, name="A", is_initial=True)
+        self.b = State.objects.create(workflow=self.workflow, name="B", order_index=1)
+        self.c = State.objects.create(workflow=self.workflow, name="C", order_index=2)
+
+        def entity(created, current):
+            obj = Entity.objects.create(
+                workflow=self.workflow, current_state=current, schema_version=sv, data_json={}
+            )
+            Entity.objects.filter(pk=obj.pk).update(created_at=created)
+            obj.refresh_from_db()
+            return obj
+
+        def event(obj, at, action_type, from_state, to_state):
+            AuditLog.objects.create(
+                entity=obj, action_type=action_type, from_state=from_state, to_state=to_state, created_at=at
+            )
+
+        self.e1 = entity(hours(1), self.c)
+        event(self.e1, hours(3), "state_change", self.a, self.b)
+        event(self.e1, hours(5), "state_change", self.b, self.c)
+        self.e2 = entity(hours(2), self.a)
+        event(self.e2, hours(3), "rule_block", self.a, self.b)
+        self.e3 = entity(hours(4), self.b)
+        event(self.e3, hours(4), "system", None, self.a)
+        event(self.e3, hours(6), "state_change", self.a, self.b)
+
+    def counts(self, at):
+        return workflow_counts_at(self.workflow.id, at).counts
+
+    def test_entity_state_at(self):
+        self.assertFalse(entity_state_at(self.e1, hours(0)).existed)
+        self.assertEqual(entity_state_at(self.e1, hours(2)).state_id, self.a.id)
+        self.assertEqual(entity_state_at(self.e1, hours(4)).state_id, self.b.id)
+        self.assertEqual(entity_state_at(self.e2, hours(9)).state_id, self.a.id)
+        self.assertEqual(entity_state_at(self.e3, hours(5)).state_id, self.a.id)
+
+        resp = self.client.get(
+            reverse("entity-as-of", kwargs={"pk": self.e1.id}), {"at": hours(5).isoformat()}
+        )
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual((resp.data["state"], resp.data["state_name"]), (self.c.id, "C"))
+        resp = self.client.get(reverse("entity-as-of", kwargs={"pk": self.e1.id}), {"at": "yesterday"})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_workflow_counts_match_with_and_without_checkpoints(self):
+        expected = {
+            hours(3.5): {self.a.id: 1, self.b.id: 1},
+            hours(5.5): {self.a.id: 2, self.c.id: 1},
+            hours(7): {self.a.id: 1, self.b.id: 1, self.c.id: 1},
+        }
+        for at, counts in expected.items():
+            self.assertEqual(self.counts(at), counts)
+
+        written = build_checkpoints(self.workflow, timedelta(hours=1), now=hours(6) + timedelta(minutes=30))
+        self.assertEqual(written, 5)
+        self.assertEqual(
+            ReplayCheckpoint.objects.get(workflow=self.workflow, as_of=hours(4)).counts_json,
+            {str(self.a.id): 2, str(self.b.id): 1},
+        )
+        for at, counts in expected.items():
+            self.assertEqual(self.counts(at), counts)
+        snapshot = workflow_counts_at(self.workflow.id, hours(7))
+        self.assertEqual(snapshot.checkpoint, hours(5))
+        self.assertEqual(snapshot.replayed_events, 1)
+
+        # A later run continues from the last checkpoint.
+        self.assertEqual(build_checkpoints(self.workflow, timedelta(hours=1), now=hours(8)), 2)
+        resp = self.client.get(
+            reverse("workflow-as-of", kwargs={"pk": self.workflow.id}), {"at": hours(7).isoformat()}
+        )
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data["total"], 3)
+        self.assertEqual(resp.data["replayed_events"], 0)
+        self.assertEqual([row["name"] for row in resp.data["states"]], ["A", "B", "C"])
+
+    def test_deleted_entities_drop_out_of_checkpoints(self):
+        build_checkpoints(self.workflow, timedelta(hours=1), now=hours(8))
+        deleted_id = self.e3.id
+        self.e3.delete()
+        self.assertEqual(EntityTombstone.objects.get().entity_id, deleted_id)
+
+        for at in (hours(4.5), hours(5.5), hours(7)):
+            replayed = {}
+            fold_window(self.workflow.id, replayed, None, at)
+            self.assertEqual(self.counts(at), {k: v for k, v in replayed.items() if v})
+        self.assertEqual(self.counts(hours(7)), {self.a.id: 1, self.c.id: 1})
+
+        # Later checkpoints continue from corrected counts.
+        self.assertEqual(build_checkpoints(self.workflow, timedelta(hours=1), now=hours(10)), 2)
+        self.assertEqual(
+            ReplayCheckpoint.objects.get(workflow=self.workflow, as_of=hours(9)).counts_json,
+            {str(self.a.id): 1, str(self.c.id): 1},
+        )
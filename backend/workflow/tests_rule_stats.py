@@ -0,0 +1,91 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from workflow import rule_stats
+from workflow.models import Entity, Rule, RuleStats, SchemaVersion, State, Transition, UserProfile, Workflow
+from workflow.programs import CompiledRule
+from workflow.rule_stats import order_by_selectivity, recorder
+
+
+def compiled(rule_id):
+    return CompiledRule(rule_id, f"r{rule_id}", None, "field_present", {})
+
+
+class RuleStatsTests(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="tuner", password="x")
+        UserProfile.objects.create(user=self.user, role="admin")
+        self.client.force_authenticate(self.user)
+        self.workflow = Workflow.objects.create(name="Orders")
+        self.schema_version = SchemaVersion.objects.create(workflow=self.workflow, version=1)
+        self.new = State.objects.create(workflow=self.workflow, name="New", is_initial=True)
+        self.done = State.objects.create(workflow=self.workflow, name="Done", order_index=1)
+        self.ship = Transition.objects.create(
+            workflow=self.workflow, name="ship", from_state=self.new, to_state=self.done
+        )
+        self.address = Rule.objects.create(
+            transition=self.ship, name="Address", condition_type="field_present", params_json={"field": "address"}
+        )
+        self.paid = Rule.objects.create(
+            transition=self.ship,
+            name="Paid",
+            condition_type="field_equals",
+            params_json={"field": "paid", "value": True},
+            eval_order=1,
+        )
+        recorder.flush()
+        rule_stats.clear_rule_orders()
+
+    def attempt(self, data):
+        entity = Entity.objects.create(
+            workflow=self.workflow, current_state=self.new, schema_version=self.schema_version, data_json=data
+        )
+        return self.client.post(
+            reverse("entity-transition", args=[entity.id]), {"transition": self.ship.id}, format="json"
+        )
+
+    def test_order_by_selectivity(self):
+        program = (compiled(1), compiled(2), compiled(3))
+        stats = {
+            1: (100, 1, 100 * 1000),  # rarely blocks
+            2: (100, 90, 100 * 1000),  # usually blocks, same cost
+            3: (100, 90, 100 * 50000),  # usually blocks, expensive
+        }
+        self.assertEqual([rule.rule_id for rule in order_by_selectivity(program, stats)], [2, 1, 3])
+        # Without stats the declared order is kept.
+        self.assertEqual([rule.rule_id for rule in order_by_selectivity(program, {})], [1, 2, 3])
+
+    def test_instrumentation_and_adaptive_order(self):
+        with mock.patch.object(rule_stats, "RULE_STATS_ENABLED", True):
+            for _ in range(3):
+                self.assertEqual(self.attempt({"address": "Main St"}).status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(self.attempt({"address": "Main St", "paid": True}).status_code, status.HTTP_200_OK)
+            # Blocked by the first rule, so "Paid" does not run.
+            self.attempt({"paid": True})
+        self.assertEqual(recorder.flush(), 2)
+
+        stats = {row.rule_id: row for row in RuleStats.objects.all()}
+        self.assertEqual((stats[self.address.id].evaluations, stats[self.address.id].failures), (5, 1))
+        self.assertEqual((stats[self.paid.id].evaluations, stats[self.paid.id].failures), (4, 3))
+
+        response = self.client.get(reverse("rule-stats", args=[self.paid.id]))
+        self.assertEqual(response.data["failure_rate"], 0.75)
+        self.assertIsNotNone(response.data["mean_cost_us"])
+        self.assertNotIn("ETag", response)
+        listed = self.client.get(reverse("rule-list"), {"transition": self.ship.id})
+        self.assertEqual(len(listed.data), 2)
+
+        # Declared order reports the address rule; adaptive order runs "Paid"
+        # first (equal costs here, so only the failure rates decide).
+        RuleStats.objects.update(total_ns=F("evaluations") * 1000)
+        self.assertEqual(self.attempt({}).data["rule"], self.address.id)
+        response = self.client.patch(
+            reverse("transition-detail", args=[self.ship.id]), {"rules_order_independent": True}, format="json"
+        )
+        self.assertTrue(response.data["rules_order_independent"])
+        self.assertEqual(self.attempt({}).data["rule"], self.paid.id)
@@ -1,6 +1,9 @@
 from django.test import TestCase
 
-from workflow.rules import evaluate_rule
+from workflow.batch import evaluate_batch
+from workflow.models import Rule, State, Transition, Workflow
+from workflow.programs import CompiledRule, clear_programs, get_transition_program, run_program
+from workflow.rules import compile_rule, evaluate_rule
 
 
 class RuleEvaluatorTests(TestCase):
@@ -77,3 +80,129 @@ class RuleEvaluatorTests(TestCase):
         passed, reason = evaluate_rule("unknown", {}, {})
         self.assertFalse(passed)
         self.assertEqual(reason, "Unsupported condition type: unknown")
+
+
+class RuleProgramTests(TestCase):
+    def setUp(self):
+        clear_programs()
+        self.workflow = Workflow.objects.create(name="Programs")
+        state_a = State.objects.create(workflow=self.workflow, name="A", is_initial=True)
+        state_b = State.objects.create(workflow=self.workflow, name="B", order_index=1)
+        self.transition = Transition.objects.create(
+            workflow=self.workflow, name="A->B", from_state=state_a, to_state=state_b
+        )
+        Rule.objects.create(
+            transition=self.transition,
+            name="Amount ceiling",
+            condition_type="field_lte",
+            params_json={"field": "amount", "value": 100},
+            eval_order=1,
+        )
+        Rule.objects.create(
+            transition=self.transition,
+            name="Known department",
+            condition_type="field_in",
+            params_json={"field": "dept", "values": ["HR", "IT"]},
+            eval_order=0,
+        )
+
+    def _revision(self):
+        self.workflow.refresh_from_db()
+        return self.workflow.definition_revision
+
+    def test_program_runs_in_eval_order(self):
+        program = get_transition_program(self.transition.id, self._revision())
+        self.assertEqual([rule.name for rule in program], ["Known department", "Amount ceiling"])
+
+        rule, reason = run_program(program, {"dept": "Sales", "amount": 500})
+        self.assertEqual(rule.name, "Known department")
+        self.assertEqual(reason, "dept must be one of ['HR', 'IT']")
+        rule, reason = run_program(program, {"dept": "HR", "amount": 500})
+        self.assertEqual(reason, "amount must be <= 100")
+        self.assertIsNone(run_program(program, {"dept": "HR", "amount": "50"}))
+
+    def test_program_cached_until_revision_changes(self):
+        revision = self._revision()
+        program = get_transition_program(self.transition.id, revision)
+        with self.assertNumQueries(0):
+            self.assertIs(get_transition_program(self.transition.id, revision), program)
+
+        Rule.objects.filter(name="Amount ceiling").get().delete()
+        self.assertGreater(self._revision(), revision)
+        program = get_transition_program(self.transition.id, self._revision())
+        self.assertEqual([rule.name for rule in program], ["Known department"])
+
+    def test_stale_workflow_save_keeps_revision(self):
+        stale = Workflow.objects.get(pk=self.workflow.pk)
+        Rule.objects.filter(name="Amount ceiling").get().delete()
+        revision = self._revision()
+        stale.name = "Renamed"
+        stale.save()
+        self.assertEqual(self._revision(), revision)
+        self.assertEqual(self.workflow.name, "Renamed")
+
+    def test_moving_a_rule_bumps_both_workflows(self):
+        other = Workflow.objects.create(name="Other")
+        state = State.objects.create(workflow=other, name="X", is_initial=True)
+        target = Transition.objects.create(workflow=other, name="X->X", from_state=state, to_state=state)
+        revision = self._revision()
+        other.refresh_from_db()
+        other_revision = other.definition_revision
+
+        rule = Rule.objects.get(name="Amount ceiling")
+        rule.transition = target
+        rule.save()
+        other.refresh_from_db()
+        self.assertGreater(self._revision(), revision)
+        self.assertGreater(other.definition_revision, other_revision)
+
+    def test_compiled_rule_handles_unhashable_values(self):
+        check = compile_rule("field_in", {"field": "tags", "values": [["a"], ["b"]]})
+        self.assertEqual(check({"tags": ["a"]})[0], True)
+        check = compile_rule("field_in", {"field": "tags", "values": ["a", "b"]})
+        self.assertEqual(check({"tags": ["a"]})[0], False)
+
+
+class BatchEvaluatorTests(TestCase):
+    def _program(self, *rules):
+        return tuple(
+            CompiledRule(index, name, compile_rule(condition_type, params), condition_type, params)
+            for index, (name, condition_type, params) in enumerate(rules)
+        )
+
+    def test_matches_scalar_evaluation(self):
+        program = self._program(
+            ("present", "field_present", {"field": "requester"}),
+            ("dept", "field_in", {"field": "dept", "values": ["HR", "IT"]}),
+            ("approval", "field_equals", {"field": "priority", "value": "High", "requires": "ok"}),
+            ("amount", "field_gte", {"field": "amount", "value": "10"}),
+            ("broken", "field_lt", {"field": "amount", "value": "n/a"}),
+        )
+        payloads = [
+            {},
+            {"requester": ""},
+            {"requester": "A", "dept": "Sales"},
+            {"requester": "A", "dept": ["HR"]},
+            {"requester": "A", "dept": "HR", "priority": "High"},
+            {"requester": "A", "dept": "HR", "priority": "High", "ok": True},
+            {"requester": "A", "dept": "IT", "priority": "Low", "amount": "abc"},
+            {"requester": "A", "dept": "IT", "amount": 9.5},
+            {"requester": "A", "dept": "IT", "amount": True},
+            {"requester": "A", "dept": "IT", "amount": "12"},
+        ]
+
+        result = evaluate_batch(program, payloads)
+
+        for index, payload in enumerate(payloads):
+            expected = run_program(program, payload)
+            if expected is None:
+                self.assertTrue(result.passed[index])
+                self.assertEqual(result.blocking[index], -1)
+                continue
+            self.assertFalse(result.passed[index])
+            self.assertEqual(program[result.blocking[index]], expected[0])
+            self.assertEqual(result.reason(program, index, payload), expected[1])
+
+    def test_empty_program_passes_everything(self):
+        result = evaluate_batch((), [{}, {"a": 1}])
+        self.assertEqual(result.passed.tolist(), [True, True])
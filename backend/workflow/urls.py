@@ -1,9 +1,18 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from .async_views import (
+    AsyncAuditLogListView,
+    AsyncAvailableTransitionsView,
+    AsyncEntityDetailView,
+    AsyncEntityListView,
+)
 from .views import (
     AuditLogViewSet,
     EntityViewSet,
+    ExportView,
+    JobViewSet,
+    QueryStatsView,
     RuleViewSet,
     SchemaFieldViewSet,
     SchemaVersionViewSet,
@@ -22,8 +31,19 @@ router.register(r"schema-versions", SchemaVersionViewSet)
 router.register(r"schema-fields", SchemaFieldViewSet)
 router.register(r"entities", EntityViewSet)
 router.register(r"audit-logs", AuditLogViewSet)
+router.register(r"jobs", JobViewSet)
 router.register(r"user-profiles", UserProfileViewSet)
 
 urlpatterns = [
+    path("query-stats/", QueryStatsView.as_view(), name="query-stats"),
+    path("exports/<str:dataset>/", ExportView.as_view(), name="export"),
+    path("async/entities/", AsyncEntityListView.as_view(), name="async-entity-list"),
+    path("async/entities/<int:pk>/", AsyncEntityDetailView.as_view(), name="async-entity-detail"),
+    path(
+        "async/entities/<int:pk>/available-transitions/",
+        AsyncAvailableTransitionsView.as_view(),
+        name="async-entity-available-transitions",
+    ),
+    path("async/audit-logs/", AsyncAuditLogListView.as_view(), name="async-auditlog-list"),
     path("", include(router.urls)),
 ]
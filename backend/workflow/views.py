@@ -1,12 +1,23 @@
+import io
+from datetime import timedelta
+
 from django.db import transaction
-from rest_framework import status, viewsets
+from django.db.models import F
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import filters, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
 from .models import (
     AuditLog,
     Entity,
+    Job,
     Rule,
+    RuleStats,
     SchemaField,
     SchemaVersion,
     State,
@@ -14,12 +25,34 @@ from .models import (
     UserProfile,
     Workflow,
 )
-from .permissions import RolePermission
-from .rules import evaluate_rule
+from .analytics import GRANULARITIES, default_granularity, workflow_analytics
+from .audit import get_audit_sink
+from .caching import DefinitionETagMixin
+from .counters import move_state_count
+from .eligibility import EligibleTransitionFilterBackend, eligibility_fields
+from .availability import ENTITY_ROW_FIELDS, EntityRow, available_transitions
+from .bulk import BULK_CHUNK_SIZE, transition_entities
+from .exporting import ExportError, ExportSpec, parse_cursor, stream_export
+from .filters import DataFieldFilterBackend
+from .graph import get_workflow_graph
+from .importing import EntityImportError, import_entities
+from .jobs import enqueue_job, id_chunks
+from .pagination import CreatedAtCursorPagination, NDJSONStreamMixin
+from .permissions import RolePermission, role_cache_stats
+from .profiling import query_stats
+from .programs import get_transition_program
+from .replay import entity_state_at, snapshot_data, workflow_counts_at
+from .rule_stats import adaptive_program, evaluate_rules
+from .simulation import simulate_rules
 from .serializers import (
     AuditLogSerializer,
+    BulkTransitionSerializer,
+    EntityImportSerializer,
     EntitySerializer,
+    JobSerializer,
     RuleSerializer,
+    RuleSimulationSerializer,
+    RuleStatsSerializer,
     SchemaFieldSerializer,
     SchemaVersionSerializer,
     StateSerializer,
@@ -29,15 +62,153 @@ from .serializers import (
 )
 
 
-class WorkflowViewSet(viewsets.ModelViewSet):
+def _edge_data(graph, edge):
+    return {
+        "id": edge.id,
+        "name": edge.name,
+        "from_state": edge.from_state_id,
+        "to_state": edge.to_state_id,
+        "to_state_name": graph.states[edge.to_state_id].name,
+    }
+
+
+def _state_data(state):
+    return {"id": state.id, "name": state.name}
+
+
+def _as_of(request):
+    """Parse the ``at`` query param; naive values are in the server time zone."""
+    try:
+        at = parse_datetime(request.query_params.get("at", ""))
+    except ValueError:
+        return None
+    if at is not None and timezone.is_naive(at):
+        at = timezone.make_aware(at)
+    return at
+
+
+def _datetime_param(request, name):
+    """Parse an optional datetime query param like ``_as_of``; raises ``ValueError`` if malformed."""
+    raw = request.query_params.get(name)
+    if raw is None:
+        return None
+    at = parse_datetime(raw)
+    if at is None:
+        raise ValueError(f"{name} is not an ISO 8601 datetime")
+    return timezone.make_aware(at) if timezone.is_naive(at) else at
+
+
+class WorkflowViewSet(DefinitionETagMixin, viewsets.ModelViewSet):
     queryset = Workflow.objects.all()
     serializer_class = WorkflowSerializer
+    workflow_path = ""
+    # state_counts follows entities, not the definition, so it is left out.
+    etag_actions = ("list", "retrieve", "shortest_path", "graph_analysis")
     permission_classes = [RolePermission]
-    role_permissions = {"*": ["admin"]}
+    role_permissions = {
+        "*": ["admin"],
+        "state_counts": ["admin", "operator", "viewer"],
+        "shortest_path": ["admin", "operator", "viewer"],
+        "graph_analysis": ["admin", "operator", "viewer"],
+        "as_of": ["admin", "operator", "viewer"],
+        "analytics": ["admin", "operator", "viewer"],
+    }
     filterset_fields = ["is_active", "name"]
 
+    @action(detail=True, methods=["get"], url_path="state-counts")
+    def state_counts(self, request, pk=None):
+        workflow = self.get_object()
+        states = (
+            State.objects.filter(workflow=workflow)
+            .order_by("order_index", "id")
+            .values_list("id", "name", "counter__count")
+        )
+        return Response(
+            [
+                {"state": state_id, "name": name, "count": count or 0}
+                for state_id, name, count in states
+            ],
+            status=status.HTTP_200_OK,
+        )
+
+    @action(detail=True, methods=["get"], url_path="shortest-path")
+    def shortest_path(self, request, pk=None):
+        workflow = self.get_object()
+        try:
+            from_state_id = int(request.query_params["from_state"])
+            to_state_id = int(request.query_params["to_state"])
+        except (KeyError, ValueError):
+            return Response(
+                {"detail": "Provide integer from_state and to_state."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        graph = get_workflow_graph(workflow.id, workflow.definition_revision)
+        if from_state_id not in graph.states or to_state_id not in graph.states:
+            return Response(
+                {"detail": "State does not belong to this workflow."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        path = graph.shortest_path(from_state_id, to_state_id)
+        if path is None:
+            return Response(
+                {"detail": "Target state is not reachable."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        return Response(
+            {
+                "from_state": from_state_id,
+                "to_state": to_state_id,
+                "length": len(path),
+                "transitions": [_edge_data(graph, edge) for edge in path],
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    @action(detail=True, methods=["get"], url_path="graph-analysis")
+    def graph_analysis(self, request, pk=None):
+        workflow = self.get_object()
+        graph = get_workflow_graph(workflow.id, workflow.definition_revision)
+        return Response(
+            {
+                "initial_states": [_state_data(graph.states[i]) for i in graph.initial_state_ids],
+                "unreachable_states": [_state_data(state) for state in graph.unreachable_states()],
+                "dead_end_states": [_state_data(state) for state in graph.dead_end_states()],
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    @action(detail=True, methods=["get"], url_path="as-of")
+    def as_of(self, request, pk=None):
+        workflow = self.get_object()
+        at = _as_of(request)
+        if at is None:
+            return Response({"at": "Provide an ISO 8601 datetime."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(snapshot_data(workflow_counts_at(workflow.id, at)), status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=["get"])
+    def analytics(self, request, pk=None):
+        workflow = self.get_object()
+        params = request.query_params
+        parsed = {}
+        for name in ("since", "until"):
+            try:
+                parsed[name] = _datetime_param(request, name)
+            except ValueError:
+                return Response({name: "Must be an ISO 8601 datetime."}, status=status.HTTP_400_BAD_REQUEST)
+        until = parsed["until"] or timezone.now()
+        since = parsed["since"] or until - timedelta(days=30)
+        granularity = params.get("granularity") or default_granularity(since, until)
+        if granularity not in GRANULARITIES:
+            return Response(
+                {"granularity": f"Choose one of: {', '.join(GRANULARITIES)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(
+            workflow_analytics(workflow.id, since, until, granularity), status=status.HTTP_200_OK
+        )
 
-class StateViewSet(viewsets.ModelViewSet):
+
+class StateViewSet(DefinitionETagMixin, viewsets.ModelViewSet):
     queryset = State.objects.select_related("workflow").all()
     serializer_class = StateSerializer
     permission_classes = [RolePermission]
@@ -45,23 +216,40 @@ class StateViewSet(viewsets.ModelViewSet):
     filterset_fields = ["workflow", "is_initial", "name"]
 
 
-class TransitionViewSet(viewsets.ModelViewSet):
+class TransitionViewSet(DefinitionETagMixin, viewsets.ModelViewSet):
     queryset = Transition.objects.select_related("workflow", "from_state", "to_state").all()
     serializer_class = TransitionSerializer
     permission_classes = [RolePermission]
     role_permissions = {"*": ["admin"]}
     filterset_fields = ["workflow", "from_state", "to_state", "name"]
 
+    @action(detail=True, methods=["post"])
+    def simulate(self, request, pk=None):
+        transition = self.get_object()
+        serializer = RuleSimulationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        report = simulate_rules(transition, **serializer.validated_data)
+        return Response(report, status=status.HTTP_200_OK)
+
 
-class RuleViewSet(viewsets.ModelViewSet):
+class RuleViewSet(DefinitionETagMixin, viewsets.ModelViewSet):
     queryset = Rule.objects.select_related("transition").all()
     serializer_class = RuleSerializer
+    workflow_path = "transition__workflow"
     permission_classes = [RolePermission]
     role_permissions = {"*": ["admin"]}
     filterset_fields = ["transition", "is_active", "condition_type"]
 
+    # Stats change without a definition revision bump, so they are served
+    # here rather than in the ETag-cached rule payload.
+    @action(detail=True, methods=["get"])
+    def stats(self, request, pk=None):
+        rule = self.get_object()
+        stats = RuleStats.objects.filter(rule=rule).first() or RuleStats(rule=rule)
+        return Response(RuleStatsSerializer(stats).data, status=status.HTTP_200_OK)
 
-class SchemaVersionViewSet(viewsets.ModelViewSet):
+
+class SchemaVersionViewSet(DefinitionETagMixin, viewsets.ModelViewSet):
     queryset = SchemaVersion.objects.select_related("workflow").all()
     serializer_class = SchemaVersionSerializer
     permission_classes = [RolePermission]
@@ -69,19 +257,27 @@ class SchemaVersionViewSet(viewsets.ModelViewSet):
     filterset_fields = ["workflow", "version"]
 
 
-class SchemaFieldViewSet(viewsets.ModelViewSet):
+class SchemaFieldViewSet(DefinitionETagMixin, viewsets.ModelViewSet):
     queryset = SchemaField.objects.select_related("schema_version").all()
     serializer_class = SchemaFieldSerializer
+    workflow_path = "schema_version__workflow"
     permission_classes = [RolePermission]
     role_permissions = {"*": ["admin"]}
     filterset_fields = ["schema_version", "name", "field_type"]
 
 
-class EntityViewSet(viewsets.ModelViewSet):
+class EntityViewSet(NDJSONStreamMixin, viewsets.ModelViewSet):
     queryset = Entity.objects.select_related(
         "workflow", "current_state", "schema_version", "parent", "created_by"
     ).all()
     serializer_class = EntitySerializer
+    pagination_class = CreatedAtCursorPagination
+    filter_backends = [
+        DjangoFilterBackend,
+        filters.OrderingFilter,
+        DataFieldFilterBackend,
+        EligibleTransitionFilterBackend,
+    ]
     permission_classes = [RolePermission]
     role_permissions = {
         "list": ["admin", "operator", "viewer"],
@@ -91,9 +287,55 @@ class EntityViewSet(viewsets.ModelViewSet):
         "partial_update": ["admin", "operator"],
         "destroy": ["admin"],
         "transition": ["admin", "operator"],
+        "bulk_transition": ["admin", "operator"],
+        "available_transitions": ["admin", "operator", "viewer"],
+        "batch_available_transitions": ["admin", "operator", "viewer"],
+        "import_entities": ["admin", "operator"],
+        "as_of": ["admin", "operator", "viewer"],
     }
     filterset_fields = ["workflow", "current_state", "parent", "schema_version"]
-    ordering_fields = ["created_at", "updated_at"]
+    ordering_fields = ["created_at"]
+    # Upper bounds enforced by QueryBudgetMixin tests, counted with cold role
+    # and schema caches and including test-transaction savepoints.
+    query_budgets = {
+        "list": 2,
+        "retrieve": 2,
+        "create": 9,
+        # +3 for the graph and rule programs behind the eligibility bits,
+        # cached per definition revision after the first write.
+        "partial_update": 10,
+        "transition": 11,
+        "available_transitions": 5,
+        "batch_available_transitions": 5,
+    }
+
+    # Entity writes also maintain StateCounter rows (see signals), so keep
+    # both in one transaction.
+    @transaction.atomic
+    def perform_create(self, serializer):
+        data = serializer.validated_data
+        serializer.save(
+            **eligibility_fields(data["workflow"], data["current_state"].id, data.get("data_json", {}))
+        )
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        entity = serializer.instance
+        data = serializer.validated_data
+        state = data.get("current_state", entity.current_state)
+        eligibility = eligibility_fields(
+            data.get("workflow", entity.workflow),
+            state.id,
+            data.get("data_json", entity.data_json),
+            previous=entity,
+        )
+        entity._eligibility_current = True
+        instance = serializer.save(version=F("version") + 1, **eligibility)
+        instance.refresh_from_db(fields=["version"])
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        instance.delete()
 
     @action(detail=True, methods=["post"])
     def transition(self, request, pk=None):
@@ -107,73 +349,267 @@ class EntityViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        if transition_id:
-            transition = Transition.objects.filter(id=transition_id).first()
-        else:
-            transition = Transition.objects.filter(
-                workflow=entity.workflow,
-                from_state=entity.current_state,
-                to_state_id=to_state_id,
-            ).first()
+        graph = get_workflow_graph(entity.workflow_id, entity.workflow.definition_revision)
+        try:
+            if transition_id:
+                edge = graph.transition(int(transition_id))
+            else:
+                edge = graph.find_transition(entity.current_state_id, int(to_state_id))
+        except (TypeError, ValueError):
+            edge = None
 
-        if not transition or transition.workflow_id != entity.workflow_id:
+        if edge is None:
             return Response(
                 {"detail": "Invalid transition."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        if transition.from_state_id != entity.current_state_id:
+        if edge.from_state_id != entity.current_state_id:
             return Response(
                 {"detail": "Transition does not match entity state."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        rules = (
-            Rule.objects.filter(transition=transition, is_active=True)
-            .order_by("eval_order", "id")
-            .all()
-        )
+        program = get_transition_program(edge.id, entity.workflow.definition_revision)
+        if edge.rules_order_independent:
+            program = adaptive_program(edge.id, entity.workflow.definition_revision, program)
 
         with transaction.atomic():
-            for rule in rules:
-                passed, reason = evaluate_rule(rule.condition_type, rule.params_json, entity.data_json)
-                if not passed:
-                    AuditLog.objects.create(
+            blocked = evaluate_rules(program, entity.data_json)
+            if blocked is not None:
+                rule, reason = blocked
+                get_audit_sink().record(
+                    AuditLog(
                         entity=entity,
                         actor=request.user if request.user.is_authenticated else None,
                         action_type="rule_block",
-                        from_state=entity.current_state,
-                        to_state=transition.to_state,
-                        rule=rule,
+                        from_state_id=entity.current_state_id,
+                        to_state_id=edge.to_state_id,
+                        rule_id=rule.rule_id,
                         reason=reason or "Rule blocked transition",
                     )
-                    return Response(
-                        {"detail": "Rule blocked transition", "rule": rule.id, "reason": reason},
-                        status=status.HTTP_400_BAD_REQUEST,
-                    )
+                )
+                return Response(
+                    {"detail": "Rule blocked transition", "rule": rule.rule_id, "reason": reason},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
 
-            from_state = entity.current_state
-            entity.current_state = transition.to_state
-            entity.save(update_fields=["current_state", "updated_at"])
-
-            AuditLog.objects.create(
-                entity=entity,
-                actor=request.user if request.user.is_authenticated else None,
-                action_type="state_change",
-                from_state=from_state,
-                to_state=transition.to_state,
-                reason=f"Transitioned via {transition.name}",
+            # Optimistic check: only move the row if neither its state nor its
+            # data changed since it was read, instead of locking it up front.
+            from_state_id = entity.current_state_id
+            updated_at = timezone.now()
+            eligibility = eligibility_fields(entity.workflow, edge.to_state_id, entity.data_json)
+            moved = Entity.objects.filter(
+                pk=entity.pk, current_state_id=from_state_id, version=entity.version
+            ).update(
+                current_state_id=edge.to_state_id,
+                version=F("version") + 1,
+                updated_at=updated_at,
+                **eligibility,
+            )
+            if not moved:
+                return Response(
+                    {"detail": "Entity was modified concurrently; reload and retry."},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            move_state_count(entity.workflow_id, from_state_id, edge.to_state_id)
+            entity.current_state_id = edge.to_state_id
+            entity._loaded_state_id = edge.to_state_id
+            entity.version += 1
+            entity.updated_at = updated_at
+            entity.eligible_transitions = eligibility["eligible_transitions"]
+            entity.eligibility_revision = eligibility["eligibility_revision"]
+
+            get_audit_sink().record(
+                AuditLog(
+                    entity=entity,
+                    actor=request.user if request.user.is_authenticated else None,
+                    action_type="state_change",
+                    from_state_id=from_state_id,
+                    to_state_id=edge.to_state_id,
+                    reason=f"Transitioned via {edge.name}",
+                )
             )
 
         return Response(self.get_serializer(entity).data, status=status.HTTP_200_OK)
 
+    @action(detail=True, methods=["get"], url_path="available-transitions")
+    def available_transitions(self, request, pk=None):
+        entity = self.get_object()
+        row = EntityRow(
+            entity.id,
+            entity.workflow_id,
+            entity.workflow.definition_revision,
+            entity.current_state_id,
+            entity.data_json,
+        )
+        return Response(available_transitions([row])[entity.id], status=status.HTTP_200_OK)
 
-class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
+    @action(detail=True, methods=["get"], url_path="as-of")
+    def as_of(self, request, pk=None):
+        entity = self.get_object()
+        at = _as_of(request)
+        if at is None:
+            return Response({"at": "Provide an ISO 8601 datetime."}, status=status.HTTP_400_BAD_REQUEST)
+        snapshot = entity_state_at(entity, at)
+        state_name = None
+        if snapshot.state_id is not None:
+            state_name = State.objects.filter(pk=snapshot.state_id).values_list("name", flat=True).first()
+        return Response(
+            {
+                "entity": entity.id,
+                "at": at,
+                "existed": snapshot.existed,
+                "state": snapshot.state_id,
+                "state_name": state_name,
+                "event": snapshot.event_id,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="available-transitions",
+        url_name="batch-available-transitions",
+    )
+    def batch_available_transitions(self, request):
+        try:
+            ids = [int(value) for value in request.query_params.get("ids", "").split(",") if value]
+        except ValueError:
+            return Response(
+                {"ids": "Provide a comma-separated list of entity ids."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not ids or len(ids) > BULK_CHUNK_SIZE:
+            return Response(
+                {"ids": f"Provide between 1 and {BULK_CHUNK_SIZE} entity ids."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        rows = [
+            EntityRow(*row)
+            for row in Entity.objects.filter(id__in=ids).values_list(*ENTITY_ROW_FIELDS)
+        ]
+        report = available_transitions(rows)
+        states = {row.id: row.current_state_id for row in rows}
+        return Response(
+            {
+                "results": [
+                    {
+                        "entity": entity_id,
+                        "current_state": states[entity_id],
+                        "transitions": report[entity_id],
+                    }
+                    for entity_id in dict.fromkeys(ids)
+                    if entity_id in report
+                ],
+                "not_found": [entity_id for entity_id in dict.fromkeys(ids) if entity_id not in report],
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    @action(detail=False, methods=["post"], url_path="bulk-transition")
+    def bulk_transition(self, request):
+        serializer = BulkTransitionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        transition = serializer.validated_data["transition"]
+
+        entities = None
+        if "filter" in serializer.validated_data:
+            filterset_class = DjangoFilterBackend().get_filterset_class(self, self.queryset)
+            filterset = filterset_class(
+                data=serializer.validated_data["filter"],
+                queryset=Entity.objects.filter(current_state_id=transition.from_state_id),
+                request=request,
+            )
+            if not filterset.is_valid():
+                return Response({"filter": filterset.errors}, status=status.HTTP_400_BAD_REQUEST)
+            entities = filterset.qs
+
+        if serializer.validated_data["background"]:
+            if entities is not None:
+                ids = entities.filter(workflow_id=transition.workflow_id).order_by("id")
+                ids = ids.values_list("id", flat=True).iterator(chunk_size=BULK_CHUNK_SIZE)
+            else:
+                ids = sorted(set(serializer.validated_data["entities"]))
+            job = enqueue_job(
+                "bulk_transition",
+                {"transition": transition.id, "lock": serializer.validated_data["lock"]},
+                ({"entities": chunk} for chunk in id_chunks(ids, BULK_CHUNK_SIZE)),
+                user=request.user,
+            )
+            return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+        report = transition_entities(
+            transition,
+            entities=entities,
+            entity_ids=serializer.validated_data.get("entities"),
+            actor=request.user,
+            lock=serializer.validated_data["lock"],
+        )
+        return Response(report, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["post"], url_path="import", url_name="import")
+    def import_entities(self, request):
+        serializer = EntityImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        upload = data["file"]
+        # Uploads above Django's memory threshold are spooled to a temporary
+        # file, so wrapping it keeps parsing streaming.
+        stream = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+        try:
+            report = import_entities(
+                stream,
+                data["format"],
+                data["workflow"],
+                schema_version=data.get("schema_version"),
+                mapping=data.get("mapping"),
+                actor=request.user,
+                source=upload.name,
+            )
+        except EntityImportError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        except UnicodeDecodeError:
+            return Response({"file": "File must be UTF-8 encoded."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_200_OK)
+
+
+class AuditLogViewSet(NDJSONStreamMixin, viewsets.ReadOnlyModelViewSet):
     queryset = AuditLog.objects.select_related("entity", "actor", "rule").all()
     serializer_class = AuditLogSerializer
+    pagination_class = CreatedAtCursorPagination
     permission_classes = [RolePermission]
-    role_permissions = {"list": ["admin", "operator", "viewer"], "retrieve": ["admin", "operator", "viewer"]}
-    filterset_fields = ["entity", "action_type", "rule"]
+    role_permissions = {
+        "list": ["admin", "operator", "viewer"],
+        "retrieve": ["admin", "operator", "viewer"],
+        "sink_metrics": ["admin"],
+    }
+    # Bounding created_at lets Postgres prune to the matching monthly
+    # partitions when the table is partitioned (see workflow.partitioning).
+    filterset_fields = {
+        "entity": ["exact"],
+        "action_type": ["exact"],
+        "rule": ["exact"],
+        "created_at": ["gte", "lt"],
+    }
     ordering_fields = ["created_at"]
+    query_budgets = {"list": 2, "retrieve": 2}
+
+    @action(detail=False, methods=["get"], url_path="sink-metrics")
+    def sink_metrics(self, request):
+        return Response(get_audit_sink().metrics(), status=status.HTTP_200_OK)
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = Job.objects.all().order_by("-id")
+    serializer_class = JobSerializer
+    permission_classes = [RolePermission]
+    role_permissions = {
+        "list": ["admin", "operator", "viewer"],
+        "retrieve": ["admin", "operator", "viewer"],
+    }
+    filterset_fields = ["kind", "status", "created_by"]
 
 
 class UserProfileViewSet(viewsets.ModelViewSet):
@@ -181,3 +617,74 @@ class UserProfileViewSet(viewsets.ModelViewSet):
     serializer_class = UserProfileSerializer
     permission_classes = [RolePermission]
     role_permissions = {"*": ["admin"]}
+
+    @action(detail=False, methods=["get"], url_path="role-cache-stats")
+    def role_cache_stats(self, request):
+        return Response(role_cache_stats.snapshot(), status=status.HTTP_200_OK)
+
+
+class QueryStatsView(APIView):
+    """Aggregated per-view query counts recorded by QueryProfilingMiddleware."""
+
+    permission_classes = [RolePermission]
+    role_permissions = {"*": ["admin"]}
+
+    def get(self, request):
+        return Response(query_stats.snapshot(), status=status.HTTP_200_OK)
+
+
+class ExportView(APIView):
+    """Stream ``entities`` or ``audit_logs`` as CSV or NDJSON in ``(created_at, id)`` order.
+
+    Query params: ``output`` (``csv``/``ndjson``), ``workflow``,
+    ``created_at__gte``, ``created_at__lt`` and ``after`` (the last row's
+    ``"<created_at>,<id>"``, to resume an interrupted download).
+    """
+
+    permission_classes = [RolePermission]
+    role_permissions = {"*": ["admin"]}
+    content_types = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+    def get(self, request, dataset):
+        params = request.query_params
+        output = params.get("output", "ndjson")
+        errors, bounds = {}, {}
+        for key in ("created_at__gte", "created_at__lt"):
+            if params.get(key):
+                try:
+                    bounds[key] = _datetime_param(request, key)
+                except ValueError:
+                    errors[key] = "Must be an ISO 8601 datetime."
+        workflow = params.get("workflow")
+        if workflow and not workflow.isdigit():
+            errors["workflow"] = "Must be an integer."
+        after = None
+        if params.get("after"):
+            try:
+                after = parse_cursor(params["after"])
+            except ExportError as exc:
+                errors["after"] = str(exc)
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            spec = ExportSpec(
+                dataset,
+                workflow_id=int(workflow) if workflow else None,
+                created_gte=bounds.get("created_at__gte"),
+                created_lt=bounds.get("created_at__lt"),
+                after=after,
+            )
+            rows = stream_export(spec, output)
+            # Surface spec errors (unknown dataset) before streaming starts.
+            first = next(rows)
+        except ExportError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        def body():
+            yield first
+            yield from rows
+
+        response = StreamingHttpResponse(body(), content_type=self.content_types[output])
+        response["Content-Disposition"] = f'attachment; filename="{dataset}.{output}"'
+        return response